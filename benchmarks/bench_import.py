@@ -0,0 +1,92 @@
+"""
+Benchmarks how long it takes a fresh interpreter to import the mats modules.
+
+Each module is imported in a new process, as a fixture worker would, and the
+import time and the heavy dependencies it pulled in are reported.  Results are
+written as JSON so they can be compared release over release.
+
+    python -m benchmarks.bench_import --runs 20 --output import.json
+"""
+
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+from mats.version import __version__
+
+DEFAULT_MODULES = ["mats", "mats.test", "mats.test_sequence", "mats.cli", "mats.tkwidgets"]
+
+# dependencies which should only be imported when actually used
+HEAVY = ["tkinter", "serial", "sigfig", "coloredlogs", "asyncio", "numpy", "mariadb"]
+
+_CHILD = """
+import json, sys
+from time import perf_counter
+started = perf_counter()
+import {module}
+elapsed = perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def time_import(module, runs):
+    """
+    Imports ``module`` in ``runs`` fresh interpreters.
+
+    :return: ``dict`` of results
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = _CHILD.format(module=module, heavy=HEAVY)
+
+    samples = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code], cwd=root, check=True,
+            capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        samples.append(result["seconds"])
+        loaded = result["loaded"]
+
+    return {
+        "module": module,
+        "runs": runs,
+        "median_ms": statistics.median(samples) * 1000,
+        "min_ms": min(samples) * 1000,
+        "max_ms": max(samples) * 1000,
+        "heavy_modules_loaded": loaded,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per module")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to")
+    args = parser.parse_args(argv)
+
+    report = {
+        "benchmark": "import",
+        "mats_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "datetime": str(datetime.now()),
+        "results": [time_import(module, args.runs) for module in args.modules],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
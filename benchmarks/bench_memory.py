@@ -0,0 +1,96 @@
+"""
+Benchmarks the memory held by a long test sequence and allocated by polling it.
+
+A sequence of ``--tests`` configured command tests is built, as a soak run
+would, and the bytes held per test are measured with tracemalloc, along with
+the bytes allocated by each poll of the properties a display reads.  Results
+are written as JSON so they can be compared release over release.
+
+    python -m benchmarks.bench_memory --tests 20000 --output memory.json
+"""
+
+import argparse
+from datetime import datetime
+import json
+import logging
+import platform
+import sys
+import tracemalloc
+
+from mats.config import build_tests, compile_config
+from mats.test_sequence import TestSequence
+from mats.version import __version__
+
+
+class _DeviceInfo:
+    pid = 0
+    manufacturer = "benchmark"
+
+
+def _poll(sequence):
+    return sequence.tests, sequence.test_names, sequence.progress
+
+
+def measure(tests, polls):
+    """
+    Builds a sequence of ``tests`` command tests and polls it ``polls`` times.
+
+    :return: ``dict`` of results
+    """
+    config = compile_config({
+        "terminator": "\x03",
+        "cli_tests": [[f"echo {i}\n", f"{i}\x03", f"echo {i}"] for i in range(tests)],
+    })
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sequence = TestSequence(
+        device_info=_DeviceInfo(),
+        sequence=build_tests(config, None, loglevel=logging.WARNING),
+        loglevel=logging.WARNING,
+    )
+    held = tracemalloc.get_traced_memory()[0] - before
+
+    _poll(sequence)
+    tracemalloc.reset_peak()
+    current = tracemalloc.get_traced_memory()[0]
+    for _ in range(polls):
+        _poll(sequence)
+    per_poll = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    sequence.close()
+
+    return {
+        "tests": tests,
+        "bytes_per_test": held / tests,
+        "bytes_per_poll": per_poll,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tests", type=int, default=20000, help="tests in the sequence")
+    parser.add_argument("--polls", type=int, default=100, help="polls of the sequence properties")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to")
+    args = parser.parse_args(argv)
+
+    report = {
+        "benchmark": "memory",
+        "mats_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "datetime": str(datetime.now()),
+        "results": [measure(args.tests, args.polls)],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
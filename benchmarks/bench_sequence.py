@@ -0,0 +1,215 @@
+"""
+Benchmarks end-to-end ``TestSequence`` throughput against a simulated device.
+
+For each sequence size, reports units per hour, the per-test latency
+distribution, harness overhead versus time spent waiting on the device, the
+cost of building and updating ``MatsFrame`` (when a display is available) and
+the memory used by the sequence.  Results are written as JSON so they can be
+compared release over release.
+
+    python -m benchmarks.bench_sequence --sizes 10 100 1000 --output bench.json
+"""
+
+import argparse
+import contextlib
+from datetime import datetime
+import json
+import logging
+import os
+import platform
+import sys
+from threading import Event
+from time import perf_counter
+import tracemalloc
+
+from mats.metrics import _percentile
+from mats.test import Test
+from mats.test_sequence import TestSequence
+from mats.version import __version__
+from py.serial_connection import SerialConnection
+from py.simulated_device import SimulatedDevice, SimulatedSerial
+
+
+class _DeviceInfo:
+    def __init__(self, pid, manufacturer):
+        self.pid = pid
+        self.manufacturer = manufacturer
+
+
+class _EchoTest(Test):
+    # like main.py's test_setup: send a command, expect an exact response
+    def __init__(self, ser, cmd, resp):
+        self.ser = ser
+        self.cmd = cmd
+        super().__init__(moniker=cmd, pass_if=resp, description=cmd, loglevel=logging.WARNING)
+
+
+def _connect(latency, jitter, baudrate):
+    device = SimulatedDevice(
+        latency=latency,
+        jitter=jitter,
+        baudrate=baudrate,
+        terminator="\x03",
+        command_terminator="\n",
+        seed=0,
+    )
+    # the connection prints the device's banner, which mustn't end up in the report on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        return SerialConnection(terminator="\x03", deadline=1.0,
+                                transport=SimulatedSerial(device, timeout=0.01))
+
+
+def _build(ser, size):
+    return [_EchoTest(ser, f"echo {i}\n", f"{i}\x03") for i in range(size)]
+
+
+def _gui_cost(sequence):
+    """
+    Times building a MatsFrame and redrawing it after every test changes.
+    """
+    try:
+        import tkinter
+
+        from mats.tkwidgets import MatsFrame
+
+        window = tkinter.Tk()
+    except Exception as e:
+        return {"skipped": str(e)}
+
+    try:
+        started = perf_counter()
+        frame = MatsFrame(window, sequence, loglevel=logging.WARNING)
+        window.update()
+        build = perf_counter() - started
+
+        for test in sequence.tests:
+            test._notify()
+        started = perf_counter()
+        frame._pump()
+        window.update()
+        update = perf_counter() - started
+
+        frame.destroy()
+    finally:
+        window.destroy()
+
+    return {"build_s": build, "update_all_s": update}
+
+
+def run_size(size, runs, latency, jitter, baudrate, pipeline_window, gui):
+    """
+    Benchmarks one sequence size.
+
+    :return: ``dict`` of results
+    """
+    ser = _connect(latency, jitter, baudrate)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tests = _build(ser, size)
+    results = []
+    done = Event()
+
+    def collect(data):
+        results.append(data)
+        if len(results) >= runs:
+            done.set()
+
+    sequence = TestSequence(
+        device_info=_DeviceInfo(ser.getPID(), ser.getManufacturer()),
+        sequence=tests,
+        callback=collect,
+        pipeline_window=pipeline_window,
+        loglevel=logging.WARNING,
+    )
+    built = tracemalloc.take_snapshot()
+    memory = sum(stat.size_diff for stat in built.compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    started = perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        sequence._auto_run = runs
+        sequence.start()
+        done.wait()
+    wall = perf_counter() - started
+
+    executes = []
+    responses = []
+    overheads = []
+    for data in results:
+        per_test = data["timing"]["per_test"]
+        device = sum(t.get("response", 0.0) for t in per_test.values())
+        overheads.append(data["timing"]["tests"] - device)
+        for timing in per_test.values():
+            executes.append(timing["execute"])
+            responses.append(timing.get("response", 0.0))
+
+    executes.sort()
+    responses.sort()
+    result = {
+        "size": size,
+        "runs": runs,
+        "passed": sum(1 for data in results if data["pass"]),
+        "wall_s": wall,
+        "units_per_hour": runs / wall * 3600,
+        "test_latency_s": {
+            "p50": _percentile(executes, 50),
+            "p95": _percentile(executes, 95),
+            "p99": _percentile(executes, 99),
+        },
+        "device_time_s": sum(responses) / runs,
+        "harness_overhead_s": sum(overheads) / runs,
+        "harness_overhead_per_test_s": sum(overheads) / runs / size,
+        "sequence_memory_bytes": memory,
+        "memory_per_test_bytes": memory / size,
+    }
+    if gui:
+        result["gui"] = _gui_cost(sequence)
+
+    sequence.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--runs", type=int, default=3, help="sequence runs per size")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated device latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="simulated latency jitter, seconds")
+    parser.add_argument("--baudrate", type=int, default=None, help="simulated line rate")
+    parser.add_argument("--pipeline-window", type=int, default=None)
+    parser.add_argument("--no-gui", action="store_true", help="skip the MatsFrame measurements")
+    parser.add_argument("--output", default=None, help="file to write the JSON results to")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    report = {
+        "benchmark": "sequence",
+        "mats_version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "datetime": str(datetime.now()),
+        "parameters": {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "baudrate": args.baudrate,
+            "pipeline_window": args.pipeline_window,
+        },
+        "results": [
+            run_size(size, args.runs, args.latency, args.jitter, args.baudrate,
+                     args.pipeline_window, not args.no_gui)
+            for size in args.sizes
+        ],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
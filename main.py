@@ -1,10 +1,13 @@
 import logging
 import json
 import tkinter as tk
+from py.capture import CaptureWriter
+from py.connection_manager import ConnectionManager, DeviceRule
 from py.serial_connection import SerialConnection
 
-import coloredlogs
-from mats.test import Test
+from mats.config import build_tests, connection_kwargs, load_config, sequence_kwargs
+from mats.result_sink import MariaDBResultSink, SQLiteResultSink
+from mats.structured_log import configure_logging
 from mats.test_sequence import TestSequence
 from mats.tkwidgets import MatsFrame
 
@@ -20,14 +23,15 @@ def test_complete_callback(data, string):
     print(f'added some other string: {string}')
 
 
-class test_setup(Test):
-    # contructor; set cmd, resp as local variables
-    def __init__(self, ser, cmd, resp, desc, loglevel=logging.INFO):
-        self.ser = ser
-        self.cmd = cmd
-        self.resp = resp
-        self.desc = desc
-        super().__init__(moniker=cmd, pass_if=self.resp, description=self.desc, loglevel=loglevel)
+def close_outputs(*outputs):
+    """
+    writes out and closes the result sink, history and capture once the window is closed; their writer
+    threads are daemons, so anything still queued would otherwise be lost when the program exits
+    """
+    for output in outputs:
+        if output is not None:
+            output.close()
+
 
 #get the device information
 class device_info():
@@ -37,34 +41,73 @@ class device_info():
         
 if __name__ == '__main__':
 
-    # instance serial connection
-    ser = SerialConnection()
+    configure_logging("log.json", level=logging.DEBUG)
+    # validate and compile the json file; reused from the cache until the file changes
+    config = load_config("test_config.json")
+    settings = config.settings
+
+    # the terminator, expected_bytes and deadline of the serial connection
+    serial_kwargs = connection_kwargs(config)
+
+    # with "capture_dir", the raw serial traffic of every run is recorded there, indexed by test
+    capture = None
+    if settings.get("capture_dir") is not None:
+        capture = CaptureWriter(settings["capture_dir"])
+        serial_kwargs["capture"] = capture
+
+    # with "device_rules" (e.g. [{"vid": "0x0403", "pid": 24577}]) devices are watched for and kept open,
+    # so "Connect Device" hands over the next DUT without reopening the port
+    connections = None
+    if settings.get("device_rules") is not None:
+        connections = ConnectionManager([DeviceRule.from_config(rule) for rule in settings["device_rules"]],
+                                        connection_kwargs=serial_kwargs).start()
+        # wait for the first DUT for up to "device_timeout" seconds rather than hanging with no window
+        device_timeout = settings.get("device_timeout", 60)
+        print(f"SERIAL: waiting up to {device_timeout}s for a device matching device_rules")
+        ser = connections.acquire(timeout=device_timeout)
+        if ser is None:
+            connections.close()
+            raise SystemExit(f"SERIAL ERROR: no device matching device_rules was found within {device_timeout}s")
+    else:
+        # instance serial connection
+        try:
+            ser = SerialConnection(**serial_kwargs)
+        except OSError as e:
+            raise SystemExit(f"SERIAL ERROR: {e}")
     # print(ser)
 
-    coloredlogs.install(level=logging.DEBUG)
-    # instantiate the json file
-    config = json.load(open("test_config.json"))
+    device_info = device_info(ser.getPID(), ser.getManufacturer())
 
-    # create new variable of just a list of lists from the json dictionary
-    cli_tests = config['cli_tests']
+    # results go to MariaDB when configured, or to a local SQLite file for testing
+    result_sink = None
+    if settings.get("mariadb") is not None:
+        result_sink = MariaDBResultSink(**settings["mariadb"])
+    elif settings.get("sqlite") is not None:
+        result_sink = SQLiteResultSink(settings["sqlite"])
 
-    device_info = device_info(ser.getPID(), ser.getManufacturer())
+    # with "history_dir", the values and verdicts of every run are kept there for yield and Cpk analysis
+    history = None
+    if settings.get("history_dir") is not None:
+        from mats.history import ResultHistory
 
-    sequence = []
-    # loop through cli_tests list and pass commands/responses to test functions, then add that function to the sequence
-    for a in cli_tests:
-        cmd = a[0]
-        resp = a[1]
-        desc = a[2]
-        test_obj = test_setup(ser, cmd, resp, desc)
-        sequence.append(test_obj)
+        history = ResultHistory(settings["history_dir"], unit_field=settings.get("unit_field"))
+
+    # a test per "cli_tests" entry, plus the "cli_groups" sharing one command response
+    sequence = build_tests(config, ser)
 
     ts = TestSequence(teardown=lambda: teardown(),
                       device_info=device_info,
                       sequence=sequence,
                       callback=lambda data: test_complete_callback(
                           data, 'my string!'),
-                      loglevel=logging.DEBUG)
+                      on_close=lambda: close_outputs(result_sink, history, capture, connections),
+                      result_sink=result_sink,
+                      connections=connections,
+                      ser=ser,
+                      capture=capture,
+                      history=history,
+                      loglevel=logging.DEBUG,
+                      **sequence_kwargs(config))
     # instantiate gui
     window = tk.Tk()
 
@@ -72,3 +115,7 @@ if __name__ == '__main__':
     tkate_frame.grid(sticky='news')
 
     window.mainloop()
+
+    # the window is closed: stop any run in progress and write out its results
+    ts.abort()
+    ts.close()
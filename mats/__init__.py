@@ -1,15 +1,42 @@
-import coloredlogs
+import importlib
 import logging
 
-
-from mats.test import Test
-from mats.test_sequence import TestSequence
-from mats.tkwidgets import MatsFrame
 from mats.version import __version__
 
-__all__ = ["Test", "TestSequence",
-           "ArchiveManager", "MatsFrame", "__version__"]
+__all__ = ["Test", "TestSequence", "MatsFrame", "__version__"]
 
-coloredlogs.install(level="DEBUG")
+# the modules behind each public name, imported on first use so that
+# ``import mats`` pulls in neither tkinter nor the serial or rounding
+# libraries until they are needed
+_lazy = {
+    "Test": "mats.test",
+    "TestSequence": "mats.test_sequence",
+    "MatsFrame": "mats.tkwidgets",
+}
 
 logger = logging.getLogger(__name__)
+
+
+def __getattr__(name):
+    if name in _lazy:
+        value = getattr(importlib.import_module(_lazy[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_lazy))
+
+
+def install_coloredlogs(level="DEBUG"):
+    """
+    Logs to the console in colour, as importing ``mats`` used to do.  \
+    See also ``mats.structured_log.configure_logging()``.
+
+    :param level: the logging level
+    :return: None
+    """
+    import coloredlogs
+
+    coloredlogs.install(level=level)
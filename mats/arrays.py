@@ -0,0 +1,126 @@
+"""
+Helpers for tests whose value is an array of measurements, such as a sweep \
+of RSSI per channel or an ADC capture.  Requires NumPy, which is only \
+imported once a test uses an array.
+"""
+
+import base64
+
+import numpy as np
+
+
+def parse_array(text: str, sep: str = ",", dtype=float):
+    """
+    Parses a list of numbers, such as a sweep printed by the device as \
+    "-71, -68, -70".
+
+    :param text: the list
+    :param sep: the separator between the numbers
+    :param dtype: the type of the numbers, such as `float` or `int`; \
+    integers are decimal, zero-padded or not
+    :return: ``numpy.ndarray``
+    :raises ValueError: if an element is not a number
+    """
+    text = text.strip()
+    if not text:
+        return np.empty(0, dtype=dtype)
+    if np.dtype(dtype).kind in "iu":
+        # int() rather than the array's own conversion, which rejects surrounding spaces
+        return np.array([int(element) for element in text.split(sep)], dtype=dtype)
+    return np.array(text.split(sep), dtype=dtype)
+
+
+def limit_vector(limit):
+    """
+    Converts a limit to a form which can be compared with an array: a \
+    scalar stays as it is, and a sequence becomes an array with NaN in \
+    place of each `None`, so that those elements are not limited.
+
+    :param limit: the limit, a sequence of limits, or `None`
+    :return: the limit, as a `float` or a ``numpy.ndarray``
+    """
+    if limit is None:
+        return np.nan
+    if isinstance(limit, (list, tuple, np.ndarray)):
+        return np.array([np.nan if element is None else element for element in limit], dtype=float)
+    return float(limit)
+
+
+def round_significant(values, figures: int):
+    """
+    Rounds every element of an array to a number of significant figures, \
+    as ``sigfig.round()`` does to a single number.  Integer arrays, such as \
+    ADC counts, are returned as they are.
+
+    :param values: the array
+    :param figures: the number of significant figures
+    :return: the rounded array
+    """
+    values = np.asarray(values)
+    if values.dtype.kind != "f":
+        return values
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        scale = 10.0 ** (figures - 1 - np.floor(np.log10(np.abs(values))))
+        rounded = np.round(values * scale) / scale
+    # zero, infinite and NaN elements have no scale to round to
+    return np.where(np.isfinite(rounded), rounded, values)
+
+
+def check_limits(values, low=None, high=None, mask=None):
+    """
+    Compares every element of an array with its limits.
+
+    :param values: the array
+    :param low: the minimum, for every element or per element; NaN elements \
+    of the vector are not limited
+    :param high: the maximum, likewise
+    :param mask: ``bool`` per element, `False` where the element is not \
+    checked
+    :return: tuple of the indices of the elements below the minimum and of \
+    those above the maximum
+    :raises ValueError: if the limits or the mask don't match the array
+    """
+    values = np.asarray(values)
+    checked = np.ones(values.shape, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+    low = limit_vector(low)
+    high = limit_vector(high)
+
+    for name, vector in (("mask", checked), ("minimum", low), ("maximum", high)):
+        if np.ndim(vector) and np.shape(vector) != values.shape:
+            raise ValueError(
+                f"{values.size} elements do not match the {np.size(vector)} of the {name}")
+
+    # comparisons with NaN are false, so unlimited elements never fail
+    below = np.flatnonzero(checked & (values < low))
+    above = np.flatnonzero(checked & (values > high))
+    return below, above
+
+
+def encode_array(values):
+    """
+    Encodes an array compactly for storage, as its raw bytes rather than \
+    its printed form.
+
+    :param values: the array
+    :return: ``dict`` with the "dtype", "shape" and base64 "data"
+    """
+    values = np.ascontiguousarray(values)
+    return {
+        "dtype": values.dtype.str,
+        "shape": list(values.shape),
+        "data": base64.b64encode(values.tobytes()).decode("ascii"),
+    }
+
+
+def decode_array(encoded: dict, copy: bool = True):
+    """
+    Decodes an array encoded by ``encode_array()``.
+
+    :param encoded: the encoded array
+    :param copy: if `False`, the array is a read-only view of the decoded bytes
+    :return: ``numpy.ndarray``
+    """
+    values = np.frombuffer(base64.b64decode(encoded["data"]), dtype=np.dtype(encoded["dtype"]))
+    values = values.reshape(encoded["shape"])
+    return values.copy() if copy else values
@@ -0,0 +1,109 @@
+import asyncio
+from time import perf_counter
+from typing import List
+
+from mats.test_sequence import SequenceState, TestSequence
+
+
+class AsyncTestSequence(TestSequence):
+
+    """
+    A ``TestSequence`` driven by an asyncio event loop rather than its own \
+    background thread, so that many devices can be tested from one loop.
+
+    Accepts the same parameters as ``TestSequence``, with the exception of \
+    ``pipeline_window``; tests should share an ``AsyncSerialConnection``. \
+    Nothing executes until ``run()`` is awaited, which executes the \
+    sequence ``auto_run`` times (once if not given).  Calling ``abort()``, \
+    from any thread, cancels the test currently awaiting the device.
+    """
+
+    def _start_worker(self):
+        self._loop = None
+        self._test_task = None
+
+    def abort(self):
+        """
+        Abort the current test sequence, cancelling the executing test.
+
+        :return: None
+        """
+        super().abort()
+
+        task = self._test_task
+        if task is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+
+    async def run(self):
+        """
+        Executes the test sequence and returns the data of the last run.
+
+        :return: the test data ``dict``
+        """
+        if self.in_progress:
+            self._logger.warning(
+                "cannot begin another test when test is " "currently in progress"
+            )
+            return None
+
+        self._loop = asyncio.get_running_loop()
+        runs = self._auto_run or 1
+
+        while runs and self._transition(SequenceState.STARTING):
+            self._sequence_setup()
+            await self._sequence_executing_tests_async()
+            self._sequence_teardown()
+
+            runs -= 1
+            with self._condition:
+                if self.is_aborted:
+                    self._transition(SequenceState.ABORTED)
+                    break
+
+                self._transition(SequenceState.COMPLETE)
+
+        return self._test_data
+
+    async def _sequence_executing_tests_async(self):
+        if not self._transition(SequenceState.EXECUTING_TESTS):
+            return
+
+        started = perf_counter()
+
+        for i, test in enumerate(self._sequence):
+            begun = self._begin_test(i, test)
+            if begun is None:
+                break
+            if not begun:
+                continue
+
+            self._test_task = asyncio.ensure_future(
+                test._execute_async(is_passing=self.is_passing))
+            try:
+                await self._test_task
+            except asyncio.CancelledError:
+                if not self.is_aborted:
+                    raise
+                self._logger.warning(
+                    f'"{test.moniker}" cancelled by abort')
+                test.fail()
+                break
+            except Exception as e:
+                self._test_error(test, "execution", e)
+            finally:
+                self._test_task = None
+
+            if not self._finish_test(test):
+                break
+
+        self._end_tests(started)
+
+
+async def run_sequences(sequences: List[AsyncTestSequence]):
+    """
+    Executes several sequences concurrently on the running event loop.
+
+    :param sequences: the sequences to execute, typically one per device
+    :return: list of the test data of each sequence, in the same order
+    """
+    return await asyncio.gather(*(sequence.run() for sequence in sequences))
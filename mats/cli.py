@@ -0,0 +1,273 @@
+"""
+Runs test sequences from the command line, without a display.
+
+    python -m mats run test_config.json --devices /dev/ttyUSB0 /dev/ttyUSB1 \\
+        --repeat 10 --output results.jsonl
+
+The exit status is 0 if every run passed, 1 if any run failed and 2 if any \
+run was aborted, a device could not be tested or none were found.
+
+    python -m mats replay test_config.json captures/
+    python -m mats history history/ --last 10000
+
+Replays runs recorded with ``--capture`` through the tests of a \
+configuration.  The exit status is 0 if no verdict changed, 1 if any did \
+and 2 if the configuration is invalid.  ``history`` reports the first-pass \
+yield, failure Pareto and capability of the runs recorded with ``--history``.
+"""
+
+import argparse
+from datetime import datetime
+from functools import partial
+import json
+import logging
+import os
+import sys
+
+from mats.config import ConfigError, build_tests, connection_kwargs, load_config, sequence_kwargs
+from mats.fixture_runner import FixtureRunner
+
+EXIT_PASS = 0
+EXIT_FAIL = 1
+EXIT_ERROR = 2
+
+
+def report_progress(data: dict, stream=None):
+    """
+    Prints a single line summarizing a run.
+
+    :param data: the test data of the run, including its "port"
+    :param stream: the stream to print to; stdout by default
+    :return: None
+    """
+    verdict = {True: "PASS", False: "FAIL", None: "ABORT"}[data.get("pass")]
+    timing = data.get("timing", {})
+    seconds = sum(v for k, v in timing.items() if k != "per_test" and v is not None)
+
+    line = f'{data.get("port", "-")}  {verdict}  {seconds:.2f}s'
+    if data.get("failed"):
+        line += "  failed: " + ", ".join(data["failed"])
+    if data.get("error"):
+        line += "  error: " + data["error"]
+
+    print(line, file=stream or sys.stdout, flush=True)
+
+
+def exit_status(results: dict):
+    """
+    Returns the exit status matching the results of ``FixtureRunner.run()``
+
+    :param results: ``dict`` of device path to the test data of each run
+    :return: ``EXIT_PASS``, ``EXIT_FAIL`` or ``EXIT_ERROR``
+    """
+    runs = [data for device_runs in results.values() for data in device_runs]
+    if not runs or any(data.get("pass") is None for data in runs):
+        return EXIT_ERROR
+    if any(data.get("pass") is False for data in runs):
+        return EXIT_FAIL
+    return EXIT_PASS
+
+
+def run(args):
+    """
+    Executes the ``run`` command.
+
+    :param args: the parsed arguments
+    :return: the exit status
+    """
+    try:
+        config = load_config(args.config, cache=not args.no_cache)
+    except ConfigError as e:
+        print(f"invalid configuration: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    kwargs = sequence_kwargs(config)
+    kwargs["callback"] = report_progress
+    kwargs["loglevel"] = args.loglevel
+
+    history_dir = args.history or config.settings.get("history_dir")
+    if history_dir is not None:
+        if args.executor == "process":
+            print("--history needs the thread executor", file=sys.stderr)
+            return EXIT_ERROR
+        from mats.history import ResultHistory
+
+        kwargs["history"] = ResultHistory(history_dir, unit_field=config.settings.get("unit_field"))
+
+    runner = FixtureRunner(
+        partial(build_tests, config, loglevel=args.loglevel),
+        ports=args.devices,
+        max_workers=args.workers,
+        executor=args.executor,
+        connection_kwargs=connection_kwargs(config),
+        sequence_kwargs=kwargs,
+        capture_dir=args.capture or config.settings.get("capture_dir"),
+        loglevel=args.loglevel,
+    )
+    results = runner.run(repeat=args.repeat)
+
+    # devices which could not be tested at all have no port in their data yet
+    for port, device_runs in results.items():
+        for data in device_runs:
+            if "error" in data:
+                data["port"] = port
+                report_progress(data)
+
+    if args.output:
+        with open(args.output, "a") as f:
+            for device_runs in results.values():
+                for data in device_runs:
+                    f.write(json.dumps(data, default=str) + "\n")
+
+    if history_dir is not None:
+        kwargs["history"].close()
+
+    summary = FixtureRunner.summary(results)
+    for port, counts in summary.items():
+        print(f'{port}: {counts["passed"]} passed, {counts["failed"]} failed, '
+              f'{counts["aborted"]} aborted')
+    if not results:
+        print("no devices found", file=sys.stderr)
+
+    return exit_status(results)
+
+
+def replay_captures(args):
+    """
+    Executes the ``replay`` command.
+
+    :param args: the parsed arguments
+    :return: the exit status
+    """
+    from mats.replay import replay, summary
+
+    try:
+        config = load_config(args.config, cache=not args.no_cache)
+    except ConfigError as e:
+        print(f"invalid configuration: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    results = replay(config, args.captures, max_workers=args.workers)
+
+    for result in results:
+        if result["changed"] or result["errors"]:
+            line = f'{result["run_id"]}  {result["path"]}'
+            for moniker, (recorded, replayed) in result["changed"].items():
+                line += f'  {moniker.strip()}: {"PASS" if recorded else "FAIL"} -> {"PASS" if replayed else "FAIL"}'
+            for moniker, error in result["errors"].items():
+                line += f"  {moniker.strip()}: {error}"
+            print(line)
+
+    if args.output:
+        with open(args.output, "a") as f:
+            for result in results:
+                f.write(json.dumps(result, default=str) + "\n")
+
+    totals = summary(results)
+    for moniker, counts in sorted(totals["monikers"].items()):
+        print(f'{moniker.strip()}: {counts["now_failing"]} now failing, {counts["now_passing"]} now passing')
+    print(f'{totals["runs"]} runs replayed: {len(totals["now_failing"])} units now fail, '
+          f'{len(totals["now_passing"])} now pass')
+
+    return EXIT_FAIL if any(result["changed"] for result in results) else EXIT_PASS
+
+
+def report_history(args):
+    """
+    Executes the ``history`` command.
+
+    :param args: the parsed arguments
+    :return: the exit status
+    """
+    from mats.history import ResultHistory
+
+    if not os.path.exists(os.path.join(args.directory, "history.json")):
+        print(f"no history in {args.directory}", file=sys.stderr)
+        return EXIT_ERROR
+
+    history = ResultHistory(args.directory, loglevel=args.loglevel)
+    window = {"last": args.last, "since": args.since, "until": args.until}
+    summary = history.summary(**window)
+
+    fpy = summary["first_pass_yield"]
+    print(f'{summary["runs"]} runs, first-pass yield: {"-" if fpy is None else f"{fpy:.2%}"}')
+
+    if summary["pareto"]:
+        print("failures:")
+        for moniker, failures in summary["pareto"][:args.top]:
+            print(f"  {failures:8d}  {moniker.strip()}")
+
+    print("capability:")
+    for moniker, field, stats in summary["statistics"]:
+        if not stats["count"]:
+            continue
+        name = moniker.strip() if field is None else f"{moniker.strip()}.{field}"
+        cpk = "-" if stats["cpk"] is None else f'{stats["cpk"]:.2f}'
+        print(f'  {name}: n={stats["count"]} mean={stats["mean"]:.4g} std={stats["std"]:.4g} '
+              f'lsl={stats["lsl"]} usl={stats["usl"]} cpk={cpk}')
+
+    history.close()
+    return EXIT_PASS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m mats", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the sequence of a configuration file")
+    run_parser.add_argument("config", help="the configuration file, e.g. test_config.json")
+    run_parser.add_argument("--devices", nargs="+", default=None,
+                            help="device paths to test; every attached fixture by default")
+    run_parser.add_argument("--repeat", type=int, default=1, help="runs per device")
+    run_parser.add_argument("--output", default=None,
+                            help="file to append the test data of each run to, as JSON lines")
+    run_parser.add_argument("--workers", type=int, default=None,
+                            help="devices tested at once; all of them by default")
+    run_parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    run_parser.add_argument("--capture", default=None, metavar="DIR",
+                            help="directory to record the raw serial traffic of each run to")
+    run_parser.add_argument("--history", default=None, metavar="DIR",
+                            help="directory to append the values and verdicts of each run to")
+    run_parser.add_argument("--no-cache", action="store_true",
+                            help="compile the configuration afresh, without the cache")
+    run_parser.add_argument("--log", default=None, help="file to write JSON log lines to")
+    run_parser.add_argument("--verbose", "-v", action="store_true", help="log at INFO level")
+    run_parser.set_defaults(handler=run)
+
+    replay_parser = commands.add_parser("replay", help="re-evaluate captured runs against a configuration")
+    replay_parser.add_argument("config", help="the configuration file, e.g. test_config.json")
+    replay_parser.add_argument("captures", nargs="+",
+                               help="capture files, or directories of them, recorded with --capture")
+    replay_parser.add_argument("--workers", type=int, default=None,
+                               help="processes to replay with; every core by default")
+    replay_parser.add_argument("--output", default=None,
+                               help="file to append the result of each run to, as JSON lines")
+    replay_parser.add_argument("--no-cache", action="store_true",
+                               help="compile the configuration afresh, without the cache")
+    replay_parser.add_argument("--log", default=None, help="file to write JSON log lines to")
+    replay_parser.add_argument("--verbose", "-v", action="store_true", help="log at INFO level")
+    replay_parser.set_defaults(handler=replay_captures)
+
+    history_parser = commands.add_parser("history", help="report yield, failures and capability of past runs")
+    history_parser.add_argument("directory", help="the directory given to --history")
+    history_parser.add_argument("--last", type=int, default=None, help="only the most recent runs")
+    history_parser.add_argument("--since", type=datetime.fromisoformat, default=None,
+                                help="only runs started at or after this date and time")
+    history_parser.add_argument("--until", type=datetime.fromisoformat, default=None,
+                                help="only runs started at or before this date and time")
+    history_parser.add_argument("--top", type=int, default=10, help="the number of failing tests listed")
+    history_parser.add_argument("--log", default=None, help="file to write JSON log lines to")
+    history_parser.add_argument("--verbose", "-v", action="store_true", help="log at INFO level")
+    history_parser.set_defaults(handler=report_history)
+
+    args = parser.parse_args(argv)
+    args.loglevel = logging.INFO if args.verbose else logging.WARNING
+
+    if args.log:
+        from mats.structured_log import configure_logging
+
+        configure_logging(args.log, level=args.loglevel, console=args.verbose)
+    else:
+        logging.basicConfig(level=args.loglevel)
+
+    return args.handler(args)
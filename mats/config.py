@@ -0,0 +1,427 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+from string import Template
+from typing import List, Union
+
+from mats.matchers import compile_matchers
+from mats.shared_command import SharedCommand
+from mats.test import Test
+from mats.version import __version__
+
+# bumped whenever the layout of ``CompiledConfig`` changes, invalidating caches
+_CACHE_FORMAT = 4
+
+# lists which are concatenated, rather than replaced, when a file is included
+_MERGED_LISTS = ("cli_tests", "cli_groups", "device_rules")
+
+# the type of each known top-level setting
+_SETTINGS = {
+    "terminator": str,
+    "terminator_regex": str,
+    "expected_bytes": int,
+    "deadline": (int, float),
+    "pipeline_window": int,
+    "fail_fast": bool,
+    "max_failures": int,
+    "retest_failures": bool,
+    "device_rules": list,
+    "device_timeout": (int, float),
+    "mariadb": dict,
+    "sqlite": str,
+    "capture_dir": str,
+    "history_dir": str,
+    "unit_field": str,
+    "variables": dict,
+}
+
+
+class _Template(Template):
+    # only ${name} is substituted, so that a lone "$" can still anchor a regex
+    pattern = r"\$(?:\{(?P<braced>[_a-z][_a-z0-9]*)\}|(?P<escaped>(?!))|(?P<named>(?!))|(?P<invalid>(?!)))"
+
+
+class ConfigError(ValueError):
+
+    """
+    Raised when a configuration file is invalid, before any test is run.
+    """
+
+
+class CommandTest(Test):
+
+    """
+    A test which sends a command to the device and checks the response, \
+    as described by one entry of the "cli_tests" configuration.
+
+    :param ser: the connection to send the command on
+    :param cmd: the command, as a `str` or already encoded `bytes`; it \
+    is held encoded so that it is not encoded again on every run
+    :param resp: the exact response required to pass, if defined
+    :param desc: the description of the test
+    :param matchers: matchers applied to the response, see \
+    ``mats.matchers.compile_matcher()``
+    :param shared: a ``SharedCommand`` whose response is evaluated in \
+    place of sending ``cmd``
+    :param moniker: the moniker; defaults to the command
+    :param loglevel: the logging level to apply such as `logging.INFO`
+    """
+
+    __slots__ = ("ser", "cmd")
+
+    def __init__(self, ser, cmd, resp, desc, matchers=None, shared=None, moniker=None,
+                 loglevel=logging.INFO):
+        if moniker is None:
+            moniker = cmd.decode("utf-8") if isinstance(cmd, bytes) else cmd
+
+        self.ser = ser
+        self.cmd = cmd.encode("utf-8") if isinstance(cmd, str) else cmd
+        super().__init__(moniker=moniker, pass_if=resp, description=desc,
+                         matchers=matchers, shared=shared, loglevel=loglevel)
+
+    @property
+    def resp(self):
+        return self._pass_if
+
+    @property
+    def desc(self):
+        return self.description
+
+
+class CompiledConfig:
+
+    """
+    A validated configuration, with its commands encoded and its matchers \
+    compiled, ready to build tests from.  Returned by ``load_config()``.
+
+    :param settings: the top-level settings, such as "terminator", after \
+    includes and templating
+    :param tests: a tuple of (moniker, command bytes, resp, desc, \
+    matchers) per "cli_tests" entry
+    :param groups: a tuple of (command bytes, list of (moniker, matchers, \
+    desc)) per "cli_groups" entry
+    :param sources: the path and SHA-256 of every file read
+    """
+
+    def __init__(self, settings: dict, tests: list, groups: list, sources: list):
+        self.settings = settings
+        self.tests = tests
+        self.groups = groups
+        self.sources = sources
+
+    def __len__(self):
+        return len(self.tests) + sum(len(members) for _, members in self.groups)
+
+
+def load_config(path: str, cache: bool = True) -> CompiledConfig:
+    """
+    Loads, validates and compiles a configuration file.
+
+    A configuration may "include" other files, given relative to itself; \
+    their settings are overridden by the including file and their \
+    "cli_tests", "cli_groups" and "device_rules" come first.  Every \
+    string may refer to the "variables" as ``${name}``, for instance to \
+    describe a family of devices once and each member by its variables.
+
+    The compiled configuration is cached in a ``__pycache__`` directory \
+    beside the file, keyed by the SHA-256 of the file, and reused for as \
+    long as neither it nor anything it includes changes.
+
+    :param path: the configuration file, e.g. "test_config.json"
+    :param cache: if False, neither read nor write the cache
+    :return: the ``CompiledConfig``
+    :raises ConfigError: if the configuration is invalid
+    """
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except OSError as e:
+        raise ConfigError(f"{path}: {e}") from e
+
+    digest = hashlib.sha256(content).hexdigest()
+    cache_path = _cache_path(path, digest)
+
+    if cache:
+        compiled = _read_cache(cache_path)
+        if compiled is not None:
+            return compiled
+
+    sources = []
+    config = _read(path, content, sources, ())
+    compiled = compile_config(config, path)
+    compiled.sources = sources
+
+    if cache:
+        _write_cache(cache_path, compiled)
+
+    return compiled
+
+
+def compile_config(config: dict, name: str = "config") -> CompiledConfig:
+    """
+    Validates and compiles an already parsed configuration, applying its \
+    "variables" to every string.
+
+    :param config: the configuration
+    :param name: how to refer to the configuration in errors
+    :return: the ``CompiledConfig``
+    :raises ConfigError: if the configuration is invalid
+    """
+    if not isinstance(config, dict):
+        raise ConfigError(f"{name}: must be a JSON object")
+
+    variables = config.get("variables", {})
+    if not isinstance(variables, dict):
+        raise ConfigError(f'{name}: "variables" must be an object')
+    config = {key: (value if key == "variables" else _substitute(value, variables, f"{name}: {key}"))
+              for key, value in config.items()}
+
+    settings = {key: value for key, value in config.items()
+                if key not in ("cli_tests", "cli_groups", "include")}
+    for key, expected in _SETTINGS.items():
+        value = settings.get(key)
+        if value is not None and (not isinstance(value, expected) or
+                                  (expected is int and isinstance(value, bool))):
+            raise ConfigError(f'{name}: "{key}" has the wrong type')
+    if settings.get("terminator_regex") is not None:
+        try:
+            re.compile(settings["terminator_regex"])
+        except re.error as e:
+            raise ConfigError(f'{name}: "terminator_regex": {e}') from e
+
+    monikers = set()
+
+    def unique(moniker, where):
+        if moniker in monikers:
+            raise ConfigError(f'{where}: moniker "{moniker}" is used more than once')
+        monikers.add(moniker)
+
+    tests = []
+    for i, entry in enumerate(_list(config, "cli_tests", name)):
+        where = f"{name}: cli_tests[{i}]"
+        if not isinstance(entry, list) or len(entry) not in (3, 4):
+            raise ConfigError(f"{where}: must be [cmd, resp, desc] or [cmd, resp, desc, matchers]")
+        cmd, resp, desc = entry[:3]
+        _check(isinstance(cmd, str) and cmd != "", where, "the command must be a non-empty string")
+        _check(resp is None or isinstance(resp, str), where, "the response must be a string or null")
+        _check(isinstance(desc, str), where, "the description must be a string")
+        unique(cmd, where)
+        tests.append((cmd, cmd.encode("utf-8"), resp, desc,
+                      _matchers(entry[3] if len(entry) > 3 else None, where)))
+
+    groups = []
+    for i, group in enumerate(_list(config, "cli_groups", name)):
+        where = f"{name}: cli_groups[{i}]"
+        _check(isinstance(group, dict) and isinstance(group.get("cmd"), str) and
+               isinstance(group.get("tests"), list), where,
+               'must be {"cmd": ..., "tests": [[moniker, matchers, desc], ...]}')
+        members = []
+        for j, member in enumerate(group["tests"]):
+            member_where = f"{where}.tests[{j}]"
+            _check(isinstance(member, list) and len(member) == 3, member_where,
+                   "must be [moniker, matchers, desc]")
+            moniker, matchers, desc = member
+            _check(isinstance(moniker, str), member_where, "the moniker must be a string")
+            _check(isinstance(desc, str), member_where, "the description must be a string")
+            unique(moniker, member_where)
+            members.append((moniker, _matchers(matchers, member_where), desc))
+        groups.append((group["cmd"].encode("utf-8"), members))
+
+    return CompiledConfig(settings, tests, groups, [])
+
+
+def _read(path, content, sources, including):
+    """
+    Parses a file and merges in the files it includes.
+    """
+    path = os.path.abspath(path)
+    if path in including:
+        raise ConfigError(f"{path}: included by itself")
+    sources.append((path, hashlib.sha256(content).hexdigest()))
+
+    try:
+        config = json.loads(content)
+    except ValueError as e:
+        raise ConfigError(f"{path}: {e}") from e
+    if not isinstance(config, dict):
+        raise ConfigError(f"{path}: must be a JSON object")
+
+    includes = config.pop("include", [])
+    if isinstance(includes, str):
+        includes = [includes]
+
+    merged = {}
+    for include in includes:
+        include_path = os.path.join(os.path.dirname(path), include)
+        try:
+            with open(include_path, "rb") as f:
+                included = _read(include_path, f.read(), sources, including + (path,))
+        except OSError as e:
+            raise ConfigError(f"{path}: include: {e}") from e
+        _merge(merged, included)
+
+    _merge(merged, config)
+    return merged
+
+
+def _merge(into, config):
+    for key, value in config.items():
+        if key in _MERGED_LISTS and isinstance(into.get(key), list) and isinstance(value, list):
+            into[key] = into[key] + value
+        elif key == "variables" and isinstance(into.get(key), dict) and isinstance(value, dict):
+            into[key] = {**into[key], **value}
+        else:
+            into[key] = value
+
+
+def _substitute(value, variables, where):
+    if isinstance(value, str):
+        try:
+            return _Template(value).substitute(variables)
+        except KeyError as e:
+            raise ConfigError(f"{where}: undefined variable {e}") from None
+        except ValueError as e:
+            raise ConfigError(f"{where}: {e}") from None
+    if isinstance(value, list):
+        return [_substitute(v, variables, where) for v in value]
+    if isinstance(value, dict):
+        return {k: _substitute(v, variables, where) for k, v in value.items()}
+    return value
+
+
+def _list(config, key, name):
+    value = config.get(key, [])
+    if not isinstance(value, list):
+        raise ConfigError(f'{name}: "{key}" must be a list')
+    return value
+
+
+def _check(condition, where, message):
+    if not condition:
+        raise ConfigError(f"{where}: {message}")
+
+
+def _matchers(specs, where):
+    try:
+        return compile_matchers(specs)
+    except (ValueError, TypeError, re.error) as e:
+        raise ConfigError(f"{where}: {e}") from e
+
+
+def _cache_path(path, digest):
+    directory = os.path.join(os.path.dirname(os.path.abspath(path)), "__pycache__")
+    return os.path.join(directory, f"{os.path.basename(path)}.{digest[:16]}.pickle")
+
+
+def _read_cache(cache_path):
+    """
+    Returns the cached configuration, or None if there is none or \
+    anything it was built from has changed.
+    """
+    try:
+        with open(cache_path, "rb") as f:
+            version, compiled = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError, ImportError):
+        return None
+    if version != (_CACHE_FORMAT, __version__):
+        return None
+
+    # the included files are not part of the key, so check them too
+    for source, digest in compiled.sources[1:]:
+        try:
+            with open(source, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != digest:
+                    return None
+        except OSError:
+            return None
+
+    return compiled
+
+
+def _write_cache(cache_path, compiled):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}"
+        with open(temporary, "wb") as f:
+            pickle.dump(((_CACHE_FORMAT, __version__), compiled), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, cache_path)
+    except OSError as e:
+        logging.getLogger(__name__).debug(f"could not cache the configuration: {e}")
+
+
+def _settings(config):
+    return config.settings if isinstance(config, CompiledConfig) else config
+
+
+def connection_kwargs(config: Union[CompiledConfig, dict]):
+    """
+    Returns the ``SerialConnection`` keyword arguments of a configuration.
+
+    :param config: the ``CompiledConfig``, or a parsed configuration
+    :return: ``dict`` of keyword arguments
+    """
+    config = _settings(config)
+
+    # responses end at the terminator (or regex) instead of waiting out the port timeout
+    terminator = config.get("terminator")
+    if config.get("terminator_regex") is not None:
+        terminator = re.compile(config["terminator_regex"])
+
+    return {
+        "terminator": terminator,
+        "expected_bytes": config.get("expected_bytes"),
+        "deadline": config.get("deadline", 1.0),
+    }
+
+
+def sequence_kwargs(config: Union[CompiledConfig, dict]):
+    """
+    Returns the ``TestSequence`` keyword arguments of a configuration.
+
+    :param config: the ``CompiledConfig``, or a parsed configuration
+    :return: ``dict`` of keyword arguments
+    """
+    config = _settings(config)
+    return {
+        "pipeline_window": config.get("pipeline_window"),
+        "fail_fast": config.get("fail_fast", False),
+        "max_failures": config.get("max_failures"),
+        "retest_failures": config.get("retest_failures", False),
+    }
+
+
+def build_tests(config: Union[CompiledConfig, dict], ser, loglevel=logging.INFO) -> List[Test]:
+    """
+    Builds the tests described by a configuration.
+
+    Each "cli_tests" entry is ``[cmd, resp, desc]`` with an optional \
+    fourth entry of matchers, in which case ``resp`` may be null.  Each \
+    "cli_groups" entry is ``{"cmd": ..., "tests": [[moniker, matchers, \
+    desc], ...]}``, the command being sent once per run for the whole \
+    group.
+
+    :param config: the ``CompiledConfig``, or a parsed configuration, \
+    which is compiled first
+    :param ser: the connection the tests send their commands on
+    :param loglevel: the logging level of the tests
+    :return: list of ``Test``
+    """
+    if not isinstance(config, CompiledConfig):
+        config = compile_config(config)
+
+    tests = [
+        CommandTest(ser, data, resp, desc, matchers, moniker=moniker, loglevel=loglevel)
+        for moniker, data, resp, desc, matchers in config.tests
+    ]
+
+    for data, members in config.groups:
+        shared = SharedCommand(ser, data, loglevel=loglevel)
+        for moniker, matchers, desc in members:
+            tests.append(CommandTest(ser, None, None, desc, matchers, shared=shared,
+                                     moniker=moniker, loglevel=loglevel))
+
+    return tests
+
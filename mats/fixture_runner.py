@@ -0,0 +1,208 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import copy
+import logging
+from threading import Event
+import traceback
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from mats.test import Test
+from mats.test_sequence import TestSequence
+
+if TYPE_CHECKING:
+    from py.serial_connection import SerialConnection
+
+DeviceInfo = namedtuple("DeviceInfo", ["pid", "manufacturer"])
+
+
+class FixtureRunner:
+
+    """
+    Executes the same tests on every attached fixture at once, with one \
+    independent ``TestSequence`` per device.
+
+    Each device gets its own ``SerialConnection`` and its own ``Test`` \
+    instances, built by calling ``build_sequence`` with the connection; \
+    the parsed test definitions themselves are shared.  When using the \
+    ``"process"`` executor, ``build_sequence`` and the keyword arguments \
+    must be picklable, e.g. a module-level function wrapped in \
+    ``functools.partial``.
+
+    :param build_sequence: function accepting a ``SerialConnection`` and \
+    returning the list of ``Test`` objects to execute on it
+    :param ports: the device paths to test; if not given, every attached \
+    fixture is used
+    :param max_workers: how many devices may be tested concurrently; \
+    defaults to all of them
+    :param executor: ``"thread"`` or ``"process"``
+    :param connection_kwargs: keyword arguments for each ``SerialConnection``
+    :param sequence_kwargs: keyword arguments for each ``TestSequence``, \
+    such as ``teardown`` or ``pipeline_window``
+    :param capture_dir: if given, the bytes exchanged with each device are \
+    recorded into this directory, one capture file per run (see \
+    py/capture.py)
+    :param loglevel: the logging level
+    """
+
+    def __init__(
+        self,
+        build_sequence: Callable[["SerialConnection"], List[Test]],
+        ports: Optional[List[str]] = None,
+        max_workers: Optional[int] = None,
+        executor: str = "thread",
+        connection_kwargs: Optional[dict] = None,
+        sequence_kwargs: Optional[dict] = None,
+        capture_dir: Optional[str] = None,
+        loglevel=logging.INFO,
+    ):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(loglevel)
+
+        if executor not in ("thread", "process"):
+            raise ValueError('executor must be "thread" or "process"')
+
+        self._build_sequence = build_sequence
+        self._ports = ports
+        self._max_workers = max_workers
+        self._executor = executor
+        self._connection_kwargs = connection_kwargs or {}
+        self._sequence_kwargs = sequence_kwargs or {}
+        self._capture_dir = capture_dir
+
+    @property
+    def ports(self):
+        """
+        Returns the device paths that will be tested
+
+        :return: list of device paths
+        """
+        if self._ports is not None:
+            return list(self._ports)
+
+        from py.serial_connection import SerialConnection
+
+        return SerialConnection.find_ports()
+
+    def run(self, repeat: int = 1):
+        """
+        Executes the test sequence ``repeat`` times on every device and \
+        blocks until all of them are finished.
+
+        :param repeat: the number of times to run the sequence per device
+        :return: ``dict`` of device path to the list of test data \
+        collected for each run on that device
+        """
+        ports = self.ports
+        if not ports:
+            self._logger.warning("no fixtures found")
+            return {}
+
+        self._logger.info(f"testing {len(ports)} fixture(s)")
+
+        pool_type = ThreadPoolExecutor if self._executor == "thread" else ProcessPoolExecutor
+        workers = self._max_workers or len(ports)
+
+        results = {}
+        with pool_type(max_workers=workers) as pool:
+            futures = {
+                port: pool.submit(
+                    _run_fixture,
+                    port,
+                    self._build_sequence,
+                    repeat,
+                    self._connection_kwargs,
+                    self._sequence_kwargs,
+                    self._capture_dir,
+                )
+                for port in ports
+            }
+            for port, future in futures.items():
+                try:
+                    results[port] = future.result()
+                # a worker calling exit() must not end the run of the other devices
+                except (Exception, SystemExit) as e:
+                    self._logger.critical(
+                        f'critical error while testing "{port}": {e}')
+                    results[port] = [{"pass": None, "error": str(e)}]
+
+        return results
+
+    @staticmethod
+    def summary(results: dict):
+        """
+        Aggregates the results returned by ``run()``.
+
+        :param results: the results returned by ``run()``
+        :return: ``dict`` of device path to counts of passed, failed and \
+        aborted runs, along with the monikers that failed
+        """
+        summary = {}
+        for port, runs in results.items():
+            failed = []
+            for data in runs:
+                failed.extend(m for m in data.get("failed", []) if m not in failed)
+            summary[port] = {
+                "passed": sum(1 for data in runs if data.get("pass") is True),
+                "failed": sum(1 for data in runs if data.get("pass") is False),
+                "aborted": sum(1 for data in runs if data.get("pass") is None),
+                "failed_tests": failed,
+            }
+
+        return summary
+
+
+def _run_fixture(port, build_sequence, repeat, connection_kwargs, sequence_kwargs, capture_dir=None):
+    """
+    Worker for a single device: connects, runs the sequence ``repeat`` \
+    times and returns the test data of each run.
+    """
+    sequence_kwargs = dict(sequence_kwargs)
+    user_callback = sequence_kwargs.pop("callback", None)
+
+    from py.serial_connection import SerialConnection
+
+    # each worker writes its own captures, since a writer can't cross processes
+    capture = None
+    if capture_dir is not None:
+        from py.capture import CaptureWriter
+
+        capture = CaptureWriter(capture_dir)
+        sequence_kwargs["capture"] = capture
+
+    ser = SerialConnection(port=port, capture=capture, **connection_kwargs)
+    results = []
+    done = Event()
+
+    def collect(data):
+        if done.is_set():
+            return
+        # a copy, since the sequence reuses its test data, labelled with the device
+        result = copy.deepcopy(data)
+        result["port"] = port
+        results.append(result)
+        if user_callback is not None:
+            user_callback(result)
+        # an aborted run stops auto-run, so there will be no more results
+        if len(results) >= repeat or data.get("pass") is None:
+            done.set()
+
+    try:
+        sequence = TestSequence(
+            device_info=DeviceInfo(ser.getPID(), ser.getManufacturer()),
+            sequence=build_sequence(ser),
+            auto_run=repeat,
+            callback=collect,
+            **sequence_kwargs,
+        )
+        done.wait()
+        sequence.close()
+    except Exception:
+        logging.getLogger(FixtureRunner.__name__).critical(
+            str(traceback.format_exc()))
+        raise
+    finally:
+        ser.close()
+        if capture is not None:
+            capture.close()
+
+    return results
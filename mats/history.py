@@ -0,0 +1,448 @@
+from datetime import datetime
+from hashlib import blake2b
+import json
+import logging
+from numbers import Number
+import os
+from threading import Lock
+from typing import Optional, Union
+
+import numpy as np
+
+# verdicts, as stored
+PASS = 1
+FAIL = 0
+NOT_RUN = -1
+
+# no unit was identified for the run
+NO_UNIT = -1
+
+_FORMAT = 1
+
+
+class _Column:
+    """
+    One appendable, memory-mapped array, stored as a raw file of ``dtype``.
+    """
+
+    def __init__(self, path, dtype, fill, capacity):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.fill = fill
+
+        if not os.path.exists(path):
+            with open(path, "wb"):
+                pass
+        self.map = None
+        self.array = None
+        self.resize(capacity)
+
+    def resize(self, capacity):
+        size = os.path.getsize(self.path) // self.dtype.itemsize
+        if size < capacity:
+            self.close()
+            with open(self.path, "r+b") as f:
+                f.truncate(capacity * self.dtype.itemsize)
+        if self.map is None:
+            self.map = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity,))
+            # a plain view of the map, since setting items through a memmap is several times slower
+            self.array = self.map.view(np.ndarray)
+            self.array[size:] = self.fill
+
+    def flush(self):
+        if self.map is not None:
+            self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.map = None
+        self.array = None
+
+
+class ResultHistory:
+
+    """
+    Keeps the results of every run in a directory of columns, one per \
+    test verdict and per numeric value or field, so that yield, failure \
+    and capability figures over any number of runs are computed with \
+    vectorized NumPy operations rather than row by row.
+
+    Each column is a raw array file, memory-mapped and grown in steps of \
+    ``grow`` rows, with "history.json" naming the columns and holding \
+    the limits of each.  Values which are not numbers are not kept.  A \
+    single process may write to the directory at a time; a single \
+    instance may be shared by several ``TestSequence`` objects.
+
+    Windows are given to the queries as ``last`` (the runs most recently \
+    recorded), or ``since`` and ``until`` (a ``datetime``, or seconds \
+    since the epoch), which are compared with the time each run started. \
+    Runs are recorded as they finish, so when several devices share a \
+    history they are not in the order they started.
+
+    :param directory: where the columns are kept; created if missing
+    :param unit_field: the name of a field, extracted by the matchers of \
+    any test, which identifies the unit, such as its serial number; \
+    without it, every run counts as a different unit for the first-pass \
+    yield
+    :param grow: the number of rows added to each column at a time
+    :param loglevel: the logging level
+    """
+
+    def __init__(self, directory: str = "history", unit_field: Optional[str] = None,
+                 grow: int = 65536, loglevel=logging.INFO):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(loglevel)
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._meta_path = os.path.join(directory, "history.json")
+        self._grow = grow
+        self._lock = Lock()
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta.get("format") != _FORMAT:
+                raise ValueError(f"{self._meta_path} is not a history of this version")
+        else:
+            meta = {"format": _FORMAT, "capacity": grow, "unit_field": unit_field,
+                    "tests": [], "values": [], "limits": []}
+
+        self.unit_field = unit_field if unit_field is not None else meta["unit_field"]
+        self._capacity = meta["capacity"]
+        self._tests = meta["tests"]
+        self._values = [tuple(key) for key in meta["values"]]
+        self._limits = {(moniker, field): (low, high) for moniker, field, low, high in meta["limits"]}
+
+        self._time = self._column("time.f8", np.float64, np.nan)
+        self._pass = self._column("pass.i1", np.int8, NOT_RUN)
+        self._unit = self._column("unit.i8", np.int64, NO_UNIT)
+        self._verdicts = {moniker: self._column(f"t{i}.i1", np.int8, NOT_RUN)
+                          for i, moniker in enumerate(self._tests)}
+        self._columns = {key: self._column(f"v{i}.f8", np.float64, np.nan)
+                         for i, key in enumerate(self._values)}
+
+        # the time of a run is written last, so a run only counts once it is complete
+        unset = np.flatnonzero(np.isnan(self._time.array))
+        self._rows = int(unset[0]) if len(unset) else self._capacity
+
+        self._save_meta()
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def monikers(self):
+        """
+        Returns the monikers of every test recorded
+
+        :return: list of monikers
+        """
+        return list(self._tests)
+
+    @property
+    def columns(self):
+        """
+        Returns the numeric columns recorded
+
+        :return: list of (moniker, field), the field being `None` for \
+        the value of the test itself
+        """
+        return list(self._values)
+
+    def set_limits(self, tests):
+        """
+        Stores the limits of each test, against which the capability is \
+        calculated, see ``Test.limits``.  ``TestSequence`` does this for \
+        the tests of its sequence.
+
+        :param tests: the tests
+        :return: None
+        """
+        with self._lock:
+            for test in tests:
+                for field, limits in test.limits.items():
+                    self._limits[(test.moniker, field)] = limits
+            self._save_meta()
+
+    def record_run(self, test_data: dict, results: list):
+        """
+        Appends one run.
+
+        :param test_data: the test data ``dict`` of a ``TestSequence`` run
+        :param results: a ``dict`` per test with the keys "moniker", \
+        "value", "pass" and "fields", see ``TestSequence._test_results()``
+        :return: None
+        """
+        started = test_data.get("datetime")
+        timestamp = datetime.fromisoformat(started).timestamp() if started else datetime.now().timestamp()
+
+        with self._lock:
+            if self._rows == self._capacity:
+                self._resize(self._capacity + self._grow)
+            row = self._rows
+
+            unit = NO_UNIT
+            for result in results:
+                moniker = result["moniker"]
+                verdicts = self._verdicts.get(moniker)
+                if verdicts is None:
+                    verdicts = self._add_test(moniker)
+                verdicts.array[row] = _verdict(result.get("pass"))
+
+                self._set(moniker, None, result.get("value"), row)
+                for field, value in (result.get("fields") or {}).items():
+                    if field == self.unit_field:
+                        unit = _unit_id(value)
+                    else:
+                        self._set(moniker, field, value, row)
+
+            self._unit.array[row] = unit
+            self._pass.array[row] = _verdict(test_data.get("pass"))
+            self._time.array[row] = timestamp
+            self._rows += 1
+
+    def flush(self):
+        """
+        Writes the columns out to disk.
+
+        :return: None
+        """
+        with self._lock:
+            for column in self._all_columns():
+                column.flush()
+
+    def close(self):
+        """
+        Flushes and releases the columns.
+
+        :return: None
+        """
+        with self._lock:
+            for column in self._all_columns():
+                column.close()
+
+    def times(self, **window):
+        """
+        Returns the start times of the runs in a window, in seconds since \
+        the epoch.
+
+        :return: read-only ``numpy.ndarray``
+        """
+        return self._view(self._time, self._window(**window))
+
+    def values(self, moniker: str, field: Optional[str] = None, **window):
+        """
+        Returns the values of a test, or of one of its fields, for the \
+        runs in a window; NaN where it was not recorded.
+
+        :param moniker: the test moniker
+        :param field: the field, or `None` for the value of the test itself
+        :return: read-only ``numpy.ndarray``
+        """
+        column = self._columns.get((moniker, field))
+        rows = self._window(**window)
+        if column is None:
+            return np.full(_count(rows), np.nan)
+        return self._view(column, rows)
+
+    def verdicts(self, moniker: Optional[str] = None, **window):
+        """
+        Returns the verdicts of a test, or of the runs, in a window: \
+        ``PASS``, ``FAIL`` or ``NOT_RUN``.
+
+        :param moniker: the test moniker, or `None` for the runs
+        :return: read-only ``numpy.ndarray``
+        """
+        column = self._pass if moniker is None else self._verdicts.get(moniker)
+        rows = self._window(**window)
+        if column is None:
+            return np.full(_count(rows), NOT_RUN, dtype=np.int8)
+        return self._view(column, rows)
+
+    def first_pass_yield(self, **window):
+        """
+        Returns the fraction of the units in a window which passed the \
+        first time they were tested in it.  Aborted runs are not counted.
+
+        :return: the yield, from 0 to 1, or `None` if no unit was tested
+        """
+        rows = self._window(**window)
+        verdicts = self._view(self._pass, rows)
+        units = self._view(self._unit, rows)
+        times = self._view(self._time, rows)
+
+        completed = verdicts != NOT_RUN
+        verdicts, units, times = verdicts[completed], units[completed], times[completed]
+
+        # a unit's first run is the one which started first, not the first recorded
+        identified = units != NO_UNIT
+        order = np.argsort(times[identified], kind="stable")
+        _, first = np.unique(units[identified][order], return_index=True)
+        first_verdicts = np.concatenate((verdicts[identified][order][first], verdicts[~identified]))
+        if not len(first_verdicts):
+            return None
+        return float(np.count_nonzero(first_verdicts == PASS)) / len(first_verdicts)
+
+    def pareto(self, **window):
+        """
+        Returns the tests which failed in a window, most frequent first.
+
+        :return: list of (moniker, failures), omitting tests which never \
+        failed
+        """
+        rows = self._window(**window)
+        counts = [(moniker, int(np.count_nonzero(self._view(column, rows) == FAIL)))
+                  for moniker, column in self._verdicts.items()]
+        return sorted((c for c in counts if c[1]), key=lambda c: c[1], reverse=True)
+
+    def statistics(self, moniker: str, field: Optional[str] = None,
+                   min_value: Optional[Number] = None, max_value: Optional[Number] = None, **window):
+        """
+        Returns the distribution of a test's value, or of one of its \
+        fields, in a window, and its process capability against its limits.
+
+        :param moniker: the test moniker
+        :param field: the field, or `None` for the value of the test itself
+        :param min_value: the lower limit; the test's own by default
+        :param max_value: the upper limit; the test's own by default
+        :return: ``dict`` with "count", "mean", "std", "min", "max", \
+        "lsl", "usl" and "cpk"; "cpk" is `None` without limits or \
+        variation, and one-sided if only one limit is set
+        """
+        values = self.values(moniker, field, **window)
+        values = values[~np.isnan(values)]
+
+        low, high = self._limits.get((moniker, field), (None, None))
+        low = min_value if min_value is not None else low
+        high = max_value if max_value is not None else high
+
+        stats = {"count": len(values), "mean": None, "std": None, "min": None, "max": None,
+                 "lsl": low, "usl": high, "cpk": None}
+        if not len(values):
+            return stats
+
+        mean = float(values.mean())
+        std = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+        stats.update(mean=mean, std=std, min=float(values.min()), max=float(values.max()))
+
+        sides = []
+        if high is not None:
+            sides.append(high - mean)
+        if low is not None:
+            sides.append(mean - low)
+        if sides and std > 0:
+            stats["cpk"] = min(sides) / (3 * std)
+
+        return stats
+
+    def summary(self, **window):
+        """
+        Returns the first-pass yield, the failure Pareto and the \
+        statistics of every numeric column in a window.
+
+        :return: ``dict`` with "runs", "first_pass_yield", "pareto" and \
+        "statistics", the last a list of (moniker, field, statistics)
+        """
+        rows = self._window(**window)
+        return {
+            "runs": _count(rows),
+            "first_pass_yield": self.first_pass_yield(**window),
+            "pareto": self.pareto(**window),
+            "statistics": [(moniker, field, self.statistics(moniker, field, **window))
+                           for moniker, field in self._values],
+        }
+
+    def _window(self, last: Optional[int] = None, since: Union[datetime, float, None] = None,
+                until: Union[datetime, float, None] = None):
+        """
+        :return: the rows in the window, as a ``slice``, or as an array of \
+        their indices if limited by time, since the times are not in order
+        """
+        if since is None and until is None:
+            start = 0 if last is None else max(0, self._rows - last)
+            return slice(start, self._rows)
+
+        times = self._time.array[:self._rows]
+        selected = np.ones(self._rows, dtype=bool)
+        if since is not None:
+            selected &= times >= (since.timestamp() if isinstance(since, datetime) else since)
+        if until is not None:
+            selected &= times <= (until.timestamp() if isinstance(until, datetime) else until)
+        rows = np.flatnonzero(selected)
+        if last is not None:
+            rows = rows[max(0, len(rows) - last):]
+        return rows
+
+    @staticmethod
+    def _view(column, rows):
+        view = column.array[rows]
+        view.flags.writeable = False
+        return view
+
+    def _set(self, moniker, field, value, row):
+        # only numbers are kept; True and False are verdicts, not values
+        if not isinstance(value, Number) or isinstance(value, bool):
+            return
+        column = self._columns.get((moniker, field))
+        if column is None:
+            column = self._add_value(moniker, field)
+        column.array[row] = value
+
+    def _add_test(self, moniker):
+        column = self._column(f"t{len(self._tests)}.i1", np.int8, NOT_RUN)
+        self._tests.append(moniker)
+        self._verdicts[moniker] = column
+        self._save_meta()
+        return column
+
+    def _add_value(self, moniker, field):
+        column = self._column(f"v{len(self._values)}.f8", np.float64, np.nan)
+        self._values.append((moniker, field))
+        self._columns[(moniker, field)] = column
+        self._save_meta()
+        return column
+
+    def _column(self, name, dtype, fill):
+        return _Column(os.path.join(self.directory, name), dtype, fill, self._capacity)
+
+    def _all_columns(self):
+        return [self._time, self._pass, self._unit, *self._verdicts.values(), *self._columns.values()]
+
+    def _resize(self, capacity):
+        self._logger.debug("growing history to %d rows", capacity)
+        for column in self._all_columns():
+            column.resize(capacity)
+        self._capacity = capacity
+        self._save_meta()
+
+    def _save_meta(self):
+        meta = {
+            "format": _FORMAT,
+            "capacity": self._capacity,
+            "unit_field": self.unit_field,
+            "tests": self._tests,
+            "values": self._values,
+            "limits": [[moniker, field, low, high] for (moniker, field), (low, high) in self._limits.items()],
+        }
+        with open(self._meta_path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+
+def _count(rows):
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+
+def _verdict(passing):
+    if passing is None:
+        return NOT_RUN
+    return PASS if passing else FAIL
+
+
+def _unit_id(value):
+    """
+    A non-negative 63-bit id for the value identifying a unit
+    """
+    digest = blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") >> 1
@@ -0,0 +1,390 @@
+import re
+from typing import List, Optional, Union
+
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+def _hex(text):
+    return int(text, 16)
+
+
+# "int" is decimal, so that zero-padded values such as "007" parse; "hex" takes an optional "0x"
+_TYPES = {"float": float, "int": int, "hex": _hex, "str": str}
+
+# the type a field defaults to when "equals" is given without one
+_EQUALS_TYPES = {int: "int", float: "float", str: "str"}
+
+
+class Matcher:
+
+    """
+    A single criterion applied to the response of a ``Test``.  Matchers \
+    are compiled once, when the test is constructed, and then applied to \
+    every response.
+    """
+
+    _regex = None
+
+    def __getstate__(self):
+        # a pickled pattern is compiled again as soon as it is loaded; keep
+        # its source instead, so that a cached configuration of thousands of
+        # tests loads quickly and each pattern is compiled on first use
+        state = self.__dict__.copy()
+        if isinstance(self._regex, re.Pattern):
+            state["_regex"] = (self._regex.pattern, self._regex.flags)
+        return state
+
+    def _compiled(self):
+        if isinstance(self._regex, tuple):
+            self._regex = re.compile(*self._regex)
+        return self._regex
+
+    def match(self, response: str):
+        """
+        Checks the response.
+
+        :param response: the response to check
+        :return: tuple of (passed, fields extracted from the response, \
+        list of the reasons for failing)
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        """
+        Returns a short description of the criterion, for display.
+        """
+        raise NotImplementedError
+
+    def limits(self):
+        """
+        Returns the numeric limits applied to the extracted fields.
+
+        :return: ``dict`` of field name to (min, max), either of which \
+        may be `None`
+        """
+        return {}
+
+
+class ContainsMatcher(Matcher):
+
+    """
+    Passes if the response contains ``text``.
+
+    :param text: the text to look for
+    """
+
+    def __init__(self, text: str):
+        self._text = text
+
+    def match(self, response):
+        if self._text in response:
+            return True, {}, []
+        return False, {}, [f'"{self._text}" not found']
+
+    def describe(self):
+        return f"contains={self._text}"
+
+
+class StartsWithMatcher(Matcher):
+
+    """
+    Passes if the response starts with ``text``.
+
+    :param text: the expected start of the response
+    """
+
+    def __init__(self, text: str):
+        self._text = text
+
+    def match(self, response):
+        if response.startswith(self._text):
+            return True, {}, []
+        return False, {}, [f'response does not start with "{self._text}"']
+
+    def describe(self):
+        return f"startswith={self._text}"
+
+
+class _Field:
+    """
+    The limits applied to one extracted value.
+    """
+
+    def __init__(self, name, spec):
+        spec = spec or {}
+        self.name = name
+        self.min = spec.get("min")
+        self.max = spec.get("max")
+        self.equals = spec.get("equals")
+
+        if "type" in spec:
+            type_name = spec["type"]
+        elif self.equals is not None:
+            type_name = _EQUALS_TYPES.get(type(self.equals), "str")
+        elif self.min is not None or self.max is not None:
+            type_name = "float"
+        else:
+            type_name = "str"
+        if type_name not in _TYPES:
+            raise ValueError(f'unknown type "{type_name}" for field "{name}"')
+        self.convert = _TYPES[type_name]
+
+        # compared with the converted value, so "equals" is converted alike
+        if isinstance(self.equals, str) and type_name != "str":
+            try:
+                self.equals = self.convert(self.equals)
+            except ValueError:
+                raise ValueError(f'"equals" of field "{name}" is not a valid {type_name}') from None
+
+    def check(self, text):
+        """
+        :return: tuple of (converted value, list of reasons for failing)
+        """
+        try:
+            value = self.convert(text)
+        except ValueError:
+            return text, [f'{self.name}="{text}" is not a valid number']
+
+        reasons = []
+        if self.equals is not None and value != self.equals:
+            reasons.append(f'{self.name}="{value}" != "{self.equals}"')
+        if self.min is not None and value < self.min:
+            reasons.append(f'{self.name}="{value}" is below the minimum "{self.min}"')
+        if self.max is not None and value > self.max:
+            reasons.append(f'{self.name}="{value}" is above the maximum "{self.max}"')
+
+        return value, reasons
+
+    def describe(self):
+        limits = []
+        if self.equals is not None:
+            limits.append(f"=={self.equals}")
+        if self.min is not None:
+            limits.append(f">={self.min}")
+        if self.max is not None:
+            limits.append(f"<={self.max}")
+        return self.name + "".join(limits)
+
+
+class RegexMatcher(Matcher):
+
+    """
+    Searches the response with a regular expression.  Each named group \
+    becomes a field of the test, and may be converted and checked \
+    against its own limits.
+
+    :param pattern: the regular expression, with named groups
+    :param fields: ``dict`` of group name to limits: "type" ("float", \
+    "int", "hex" or "str"), "min", "max" and "equals".  The type defaults \
+    to that of "equals", else to "float" if "min" or "max" is given; \
+    groups without limits are extracted as strings
+    :param flags: ``re`` flags
+    """
+
+    def __init__(self, pattern: str, fields: Optional[dict] = None, flags: int = 0):
+        self._regex = re.compile(pattern, flags)
+        self._pattern = pattern
+        fields = fields or {}
+
+        unknown = set(fields) - set(self._regex.groupindex)
+        if unknown:
+            raise ValueError(
+                f'fields {sorted(unknown)} are not named groups of "{pattern}"')
+
+        self._fields = [_Field(name, fields.get(name)) for name in self._regex.groupindex]
+
+    def match(self, response):
+        found = self._compiled().search(response)
+        if found is None:
+            return False, {}, [f'"{self._pattern}" not found']
+
+        values = {}
+        reasons = []
+        for field in self._fields:
+            text = found.group(field.name)
+            if text is None:
+                reasons.append(f'"{field.name}" not found')
+                continue
+            values[field.name], failures = field.check(text)
+            reasons.extend(failures)
+
+        return not reasons, values, reasons
+
+    def limits(self):
+        return {f.name: (f.min, f.max) for f in self._fields if f.min is not None or f.max is not None}
+
+    def describe(self):
+        limited = [f.describe() for f in self._fields if f.describe() != f.name]
+        return f"regex={self._pattern}" + (f"({','.join(limited)})" if limited else "")
+
+
+class NumberMatcher(Matcher):
+
+    """
+    Extracts the first number in the response (or the one following \
+    ``after``) and checks it against ``min``/``max``.
+
+    :param name: the name of the extracted field
+    :param after: text which the number follows, such as "Voltage:"
+    :param min: the minimum value to pass, if defined
+    :param max: the maximum value to pass, if defined
+    """
+
+    def __init__(self, name: str = "value", after: Optional[str] = None,
+                 min: Optional[float] = None, max: Optional[float] = None):
+        prefix = re.escape(after) + r"\s*" if after is not None else ""
+        self._regex = re.compile(prefix + "(" + _NUMBER.pattern + ")")
+        self._field = _Field(name, {"min": min, "max": max, "type": "float"})
+
+    def match(self, response):
+        found = self._compiled().search(response)
+        if found is None:
+            return False, {}, [f'no number found for "{self._field.name}"']
+
+        value, reasons = self._field.check(found.group(1))
+        return not reasons, {self._field.name: value}, reasons
+
+    def limits(self):
+        return {self._field.name: (self._field.min, self._field.max)}
+
+    def describe(self):
+        return f"number:{self._field.describe()}"
+
+
+class ArrayMatcher(Matcher):
+
+    """
+    Extracts a list of numbers from the response (the line following \
+    ``after``, or the first line), such as a sweep printed as \
+    "RSSI: -71,-68,-70", and checks every element against its limits.  \
+    The field is a NumPy array; NumPy is imported when the matcher is \
+    constructed.
+
+    :param name: the name of the extracted field
+    :param after: text which the list follows, such as "RSSI:"
+    :param sep: the separator between the numbers
+    :param type: "float" or "int"
+    :param length: the number of elements required, if defined
+    :param min: the minimum for every element, or a list with one per \
+    element, `None` where the element is not limited
+    :param max: the maximum, likewise
+    :param mask: a list of ``bool``, one per element, `False` where the \
+    element is not checked
+    """
+
+    def __init__(self, name: str = "values", after: Optional[str] = None, sep: str = ",",
+                 type: str = "float", length: Optional[int] = None,
+                 min=None, max=None, mask=None):
+        import numpy as np
+
+        from mats.arrays import limit_vector
+
+        if type not in ("float", "int"):
+            raise ValueError(f'unknown type "{type}" for field "{name}"')
+
+        prefix = re.escape(after) + r"[ \t]*" if after is not None else ""
+        self._regex = re.compile(prefix + r"([^\r\n\x03]*)")
+        self._name = name
+        self._sep = sep
+        self._dtype = float if type == "float" else np.int64
+        self._length = length
+        self._limits = (min, max)
+        self._low = limit_vector(min)
+        self._high = limit_vector(max)
+        self._mask = None if mask is None else np.asarray(mask, dtype=bool)
+
+    def match(self, response):
+        from mats.arrays import check_limits, parse_array
+
+        found = self._compiled().search(response)
+        if found is None:
+            return False, {}, [f'no list found for "{self._name}"']
+
+        try:
+            values = parse_array(found.group(1), self._sep, self._dtype)
+        except ValueError as e:
+            return False, {}, [f'"{self._name}": {e}']
+
+        if self._length is not None and values.size != self._length:
+            return False, {self._name: values}, [
+                f'"{self._name}" has {values.size} elements, not {self._length}']
+
+        try:
+            below, above = check_limits(values, self._low, self._high, self._mask)
+        except ValueError as e:
+            return False, {self._name: values}, [f'"{self._name}": {e}']
+
+        reasons = []
+        if len(below):
+            reasons.append(f'{self._name}{below.tolist()} are below the minimum')
+        if len(above):
+            reasons.append(f'{self._name}{above.tolist()} are above the maximum')
+
+        return not reasons, {self._name: values}, reasons
+
+    def limits(self):
+        low, high = self._limits
+        if isinstance(low, (list, tuple)) or isinstance(high, (list, tuple)):
+            return {}
+        if low is None and high is None:
+            return {}
+        return {self._name: (low, high)}
+
+    def describe(self):
+        limits = []
+        if self._limits[0] is not None:
+            limits.append(f">={self._limits[0]}")
+        if self._limits[1] is not None:
+            limits.append(f"<={self._limits[1]}")
+        length = "" if self._length is None else str(self._length)
+        return f"array:{self._name}[{length}]" + "".join(limits)
+
+
+def compile_matcher(spec: Union[Matcher, dict, str]):
+    """
+    Builds a ``Matcher`` from its configuration, for instance::
+
+        {"regex": "V=(?P<volts>[\\d.]+)", "fields": {"volts": {"min": 3.2}}}
+        {"number": {"after": "Temp:", "max": 85}}
+        {"array": {"name": "rssi", "after": "RSSI:", "length": 16, "min": -90}}
+        {"contains": "OK"}
+        {"startswith": "UNIT TEST LIST"}
+
+    A plain string is treated as "contains".
+
+    :param spec: the configuration, or an existing ``Matcher``
+    :return: the ``Matcher``
+    """
+    if isinstance(spec, Matcher):
+        return spec
+    if isinstance(spec, str):
+        return ContainsMatcher(spec)
+    if not isinstance(spec, dict) or len(spec.keys() - {"fields", "flags"}) != 1:
+        raise ValueError(f"invalid matcher: {spec!r}")
+
+    if "regex" in spec:
+        return RegexMatcher(spec["regex"], spec.get("fields"), spec.get("flags", 0))
+    if "number" in spec:
+        return NumberMatcher(**(spec["number"] or {}))
+    if "array" in spec:
+        return ArrayMatcher(**(spec["array"] or {}))
+    if "contains" in spec:
+        return ContainsMatcher(spec["contains"])
+    if "startswith" in spec:
+        return StartsWithMatcher(spec["startswith"])
+
+    raise ValueError(f"invalid matcher: {spec!r}")
+
+
+def compile_matchers(specs) -> List[Matcher]:
+    """
+    Builds a list of ``Matcher`` from one configuration or a list of them.
+
+    :param specs: a matcher configuration, or a list of them
+    :return: list of ``Matcher``
+    """
+    if specs is None:
+        return []
+    if not isinstance(specs, (list, tuple)):
+        specs = [specs]
+    return [compile_matcher(spec) for spec in specs]
@@ -0,0 +1,179 @@
+from bisect import bisect_left
+from collections import deque
+import json
+import math
+from threading import Lock
+from typing import Optional, Sequence
+
+# upper bounds, in seconds, of the histogram buckets
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# the name under which whole-sequence phases are recorded
+SEQUENCE = "_sequence"
+
+
+class _Series:
+    """
+    The histogram and recent samples of a single (moniker, phase) pair.
+    """
+
+    def __init__(self, buckets, max_samples):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, buckets, seconds):
+        self.counts[bisect_left(buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.samples.append(seconds)
+
+
+class Metrics:
+
+    """
+    Collects the time spent in each phase of each test and of the test \
+    sequence as a whole, and summarizes it as histograms and percentiles.
+
+    A single instance may be shared by several ``TestSequence`` objects, \
+    for example one per fixture.
+
+    :param buckets: the upper bounds, in seconds, of the histogram buckets
+    :param max_samples: the number of most recent samples per series kept \
+    for calculating percentiles
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, max_samples: int = 10000):
+        self._buckets = tuple(sorted(buckets))
+        self._max_samples = max_samples
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, moniker: str, phase: str, seconds: Optional[float]):
+        """
+        Records one duration.
+
+        :param moniker: the test moniker, or ``SEQUENCE`` for the sequence
+        :param phase: the phase, such as "write" or "teardown"
+        :param seconds: the duration; ignored if `None`
+        :return: None
+        """
+        if seconds is None:
+            return
+
+        with self._lock:
+            series = self._series.get((moniker, phase))
+            if series is None:
+                series = _Series(self._buckets, self._max_samples)
+                self._series[(moniker, phase)] = series
+            series.observe(self._buckets, seconds)
+
+    def record_run(self, test_data: dict):
+        """
+        Records every duration in the "timing" of a run's test data.
+
+        :param test_data: the test data ``dict`` of a ``TestSequence`` run
+        :return: None
+        """
+        timing = test_data.get("timing", {})
+        for phase, seconds in timing.items():
+            if phase != "per_test":
+                self.observe(SEQUENCE, phase, seconds)
+        for moniker, phases in timing.get("per_test", {}).items():
+            for phase, seconds in phases.items():
+                self.observe(moniker, phase, seconds)
+
+    def percentile(self, moniker: str, phase: str, percent: float):
+        """
+        Returns a percentile of the recent samples of a series.
+
+        :param moniker: the test moniker, or ``SEQUENCE``
+        :param phase: the phase
+        :param percent: the percentile, from 0 to 100
+        :return: the duration in seconds, or `None` if nothing was recorded
+        """
+        with self._lock:
+            series = self._series.get((moniker, phase))
+            samples = sorted(series.samples) if series is not None else []
+
+        return _percentile(samples, percent)
+
+    def summary(self):
+        """
+        Returns the count, total, mean and p50/p95/p99 of every series.
+
+        :return: ``dict`` of moniker to ``dict`` of phase to statistics
+        """
+        with self._lock:
+            snapshot = {
+                key: (series.count, series.sum, sorted(series.samples))
+                for key, series in self._series.items()
+            }
+
+        summary = {}
+        for (moniker, phase), (count, total, samples) in sorted(snapshot.items()):
+            summary.setdefault(moniker, {})[phase] = {
+                "count": count,
+                "sum": total,
+                "mean": total / count,
+                "p50": _percentile(samples, 50),
+                "p95": _percentile(samples, 95),
+                "p99": _percentile(samples, 99),
+            }
+
+        return summary
+
+    def to_json(self, indent: Optional[int] = None):
+        """
+        Returns the summary as a JSON string.
+
+        :param indent: passed to ``json.dumps``
+        :return: JSON string
+        """
+        return json.dumps(self.summary(), indent=indent)
+
+    def to_prometheus(self):
+        """
+        Returns the histograms in the Prometheus text exposition format.
+
+        :return: the exposition text
+        """
+        lines = [
+            "# HELP mats_phase_seconds Time spent in each phase of a test or test sequence.",
+            "# TYPE mats_phase_seconds histogram",
+        ]
+
+        with self._lock:
+            snapshot = {
+                key: (list(series.counts), series.count, series.sum)
+                for key, series in self._series.items()
+            }
+
+        for (moniker, phase), (counts, count, total) in sorted(snapshot.items()):
+            labels = f'moniker="{_escape(moniker)}",phase="{_escape(phase)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self._buckets, counts):
+                cumulative += bucket_count
+                lines.append(
+                    f'mats_phase_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'mats_phase_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"mats_phase_seconds_sum{{{labels}}} {total}")
+            lines.append(f"mats_phase_seconds_count{{{labels}}} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _percentile(samples, percent):
+    # nearest-rank percentile of already sorted samples
+    if not samples:
+        return None
+    rank = max(0, min(len(samples) - 1, math.ceil(percent / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,244 @@
+"""
+Re-evaluates the criteria of a configuration against device responses \
+recorded by ``py.capture.CaptureWriter``, without a device, to find out \
+how tightening a ``pass_if`` or a limit would have changed past verdicts.
+
+    python -m mats replay test_config.json captures/ --workers 8
+"""
+
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import logging
+import os
+from typing import List, Optional, Union
+
+from mats.config import CompiledConfig, build_tests, connection_kwargs, load_config
+from py.capture import TX, CaptureReader, find_runs
+from py.serial_connection import _compile_terminator, _encode, _frame_end
+
+
+class ReplayConnection:
+
+    """
+    Stands in for a ``SerialConnection``, answering each command with \
+    the response recorded for it in a capture.
+
+    Responses are framed as the connection framed them, so they are \
+    paired with their commands in order even when the commands were \
+    pipelined.  A command sent several times in a run is answered with \
+    each of its recorded responses in turn.
+
+    :param terminator: marks the end of a response, as for \
+    ``SerialConnection``; if neither this nor `expected_bytes` is given, \
+    a response is everything received until the next command
+    :param expected_bytes: the length of a response
+    :param deadline: ignored, accepted so that the keyword arguments of \
+    a ``SerialConnection`` can be passed
+    """
+
+    def __init__(self, terminator=None, expected_bytes=None, deadline=None):
+        self._terminator = _compile_terminator(terminator)
+        self._expected_bytes = expected_bytes
+        self._responses = {}
+
+        self.last_timing = {}
+
+    def load(self, reader: CaptureReader):
+        """
+        Replaces the responses with those of a captured run.
+
+        :param reader: the ``CaptureReader`` of the run
+        :return: None
+        """
+        commands = []
+        received = []
+        for _, direction, data in reader.records():
+            if direction == TX:
+                commands.append(data)
+                received.append(bytearray())
+            elif commands:
+                # anything received before the first command is not a response
+                received[-1] += data
+
+        if self._terminator is None and self._expected_bytes is None:
+            frames = [bytes(data) for data in received]
+        else:
+            frames = []
+            buf = bytearray().join(received)
+            for _ in commands:
+                end = _frame_end(buf, self._terminator, self._expected_bytes)
+                if end is None:
+                    # the deadline passed before the end of the frame
+                    end = len(buf)
+                frames.append(bytes(buf[:end]))
+                del buf[:end]
+
+        self._responses = defaultdict(deque)
+        for command, frame in zip(commands, frames):
+            self._responses[command].append(frame.decode("utf-8", "replace"))
+
+    def sendRec(self, userIn, terminator=None, expected_bytes=None, deadline=None):
+        """
+        Returns the next recorded response to a command.
+
+        :param userIn: the command, as a `str` or `bytes`
+        :return: the response
+        :raises LookupError: if no response to the command was recorded
+        """
+        responses = self._responses.get(_encode(userIn))
+        if not responses:
+            raise LookupError(f"no response to {userIn!r} was captured")
+        return responses.popleft()
+
+    def getPID(self):
+        return None
+
+    def getManufacturer(self):
+        return None
+
+    def close(self):
+        pass
+
+
+# the connection and tests of each worker process, built once by _init_worker()
+_worker = None
+
+
+def _init_worker(config: CompiledConfig, loglevel):
+    global _worker
+
+    ser = ReplayConnection(**connection_kwargs(config))
+    tests = build_tests(config, ser, loglevel=loglevel)
+    _worker = (ser, {test.moniker: test for test in tests})
+
+
+def _replay_run(path: str):
+    """
+    Replays one captured run through the tests of the worker.
+
+    :param path: the capture, or its index
+    :return: the result of the run, see ``replay()``
+    """
+    ser, tests = _worker
+
+    with CaptureReader(path) as reader:
+        ser.load(reader)
+
+        result = {
+            "run_id": reader.run_id,
+            "device": reader.device,
+            "path": os.path.splitext(path)[0] + ".cap",
+            "pass": reader.verdict(),
+            "replayed": None,
+            "changed": {},
+            "missing": [],
+            "errors": {},
+        }
+
+        # all at once, as a run does, since resetting a test resets its shared command
+        for moniker in reader.monikers:
+            if moniker in tests:
+                tests[moniker].reset()
+            else:
+                result["missing"].append(moniker)
+
+        is_passing = True
+        # the tests print every response they receive
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for moniker in reader.monikers:
+                test = tests.get(moniker)
+                recorded = reader.verdict(moniker)
+                if test is None or recorded is None:
+                    continue
+
+                try:
+                    test._execute(is_passing=is_passing)
+                    test._teardown(is_passing=is_passing)
+                except Exception as e:
+                    result["errors"][moniker] = str(e)
+                    continue
+
+                verdict = bool(test._test_is_passing)
+                is_passing = is_passing and verdict
+                if verdict != recorded:
+                    result["changed"][moniker] = [recorded, verdict]
+
+        if result["pass"] is not None:
+            result["replayed"] = is_passing
+
+    return result
+
+
+def replay(
+    config: Union[CompiledConfig, str],
+    captures: List[str],
+    max_workers: Optional[int] = None,
+    loglevel=logging.ERROR,
+):
+    """
+    Replays captured runs through the tests of a configuration.
+
+    Only the tests recorded in a capture are replayed; their recorded \
+    verdicts are compared with the verdicts the configuration gives the \
+    same responses.  Runs are spread over ``max_workers`` processes.
+
+    :param config: the ``CompiledConfig``, or the path of the \
+    configuration file
+    :param captures: capture files, their indexes, or directories of them
+    :param max_workers: the number of processes; every core by default. \
+    With 1, runs are replayed in this process
+    :param loglevel: the logging level of the tests
+    :return: list with a ``dict`` per run: its "run_id", "device", \
+    "path", recorded "pass", "replayed" verdict (None for an aborted \
+    run), "changed" monikers mapped to their [recorded, replayed] \
+    verdicts, monikers "missing" from the configuration and the \
+    "errors" of tests which could not be replayed
+    """
+    if not isinstance(config, CompiledConfig):
+        config = load_config(config)
+
+    paths = []
+    for capture in captures:
+        if os.path.isdir(capture):
+            paths.extend(find_runs(capture))
+        else:
+            paths.append(capture)
+
+    if not paths:
+        return []
+
+    workers = min(max_workers or os.cpu_count() or 1, len(paths))
+    if workers == 1:
+        _init_worker(config, loglevel)
+        return [_replay_run(path) for path in paths]
+
+    # big chunks, since each run takes about as long to replay as to hand over
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config, loglevel)) as pool:
+        return list(pool.map(_replay_run, paths, chunksize=chunksize))
+
+
+def summary(results: list):
+    """
+    Summarizes the results of ``replay()``.
+
+    :param results: the results
+    :return: ``dict`` with the number of "runs", the run ids "now_failing" \
+    and "now_passing", and per moniker the number of runs it changed \
+    verdict in, as "monikers": {moniker: {"now_failing": n, \
+    "now_passing": n}}
+    """
+    monikers = {}
+    for result in results:
+        for moniker, (_, verdict) in result["changed"].items():
+            counts = monikers.setdefault(moniker, {"now_failing": 0, "now_passing": 0})
+            counts["now_passing" if verdict else "now_failing"] += 1
+
+    return {
+        "runs": len(results),
+        "now_failing": [r["run_id"] for r in results if r["pass"] is True and r["replayed"] is False],
+        "now_passing": [r["run_id"] for r in results if r["pass"] is False and r["replayed"] is True],
+        "monikers": monikers,
+    }
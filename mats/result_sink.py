@@ -0,0 +1,321 @@
+import json
+import logging
+from queue import Empty, Full, Queue
+from threading import Thread
+from time import sleep
+from typing import Optional
+
+from mats.test import _is_array
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS runs ("
+    "run_id VARCHAR(36) PRIMARY KEY, "
+    "datetime VARCHAR(32), "
+    "pid VARCHAR(16), "
+    "manufacturer VARCHAR(64), "
+    "pass INTEGER, "
+    "failed TEXT)",
+    "CREATE TABLE IF NOT EXISTS results ("
+    "run_id VARCHAR(36), "
+    "moniker VARCHAR(255), "
+    "value TEXT, "
+    "pass INTEGER, "
+    "status VARCHAR(16))",
+)
+
+_RUN_COLUMNS = ("run_id", "datetime", "pid", "manufacturer", "pass", "failed")
+_RESULT_COLUMNS = ("run_id", "moniker", "value", "pass", "status")
+
+# stop one statement from exceeding the database's parameter limit
+_MAX_ROWS_PER_INSERT = 100
+
+
+class ResultSink:
+
+    """
+    Stores the results of each test sequence run in a database without \
+    holding up the test thread.
+
+    Results handed to ``submit()`` are placed on a bounded queue; a \
+    background thread collects them into batches and writes each batch \
+    with multi-row inserts, retrying on failure.  Subclasses supply the \
+    database connection.
+
+    :param batch_size: the maximum number of runs written at once
+    :param flush_interval: the longest time, in seconds, that a run waits \
+    in the queue for a batch to fill
+    :param max_queue: the number of runs that may be waiting; further \
+    runs are dropped, with an error logged, rather than stall the line
+    :param retries: the number of times a failed batch is retried
+    :param retry_delay: seconds before the first retry, doubling each time
+    :param loglevel: the logging level
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_queue: int = 10000,
+        retries: int = 3,
+        retry_delay: float = 0.5,
+        loglevel=logging.INFO,
+    ):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(loglevel)
+
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._retries = retries
+        self._retry_delay = retry_delay
+
+        self._queue = Queue(maxsize=max_queue)
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, test_data: dict, results: list, device_info: Optional[dict] = None):
+        """
+        Queues the results of one run to be written.
+
+        :param test_data: the test data ``dict`` of the run
+        :param results: a ``dict`` per test with the keys "moniker", \
+        "value", "pass" and "status"
+        :param device_info: a ``dict`` with the keys "pid" and "manufacturer"
+        :return: True if queued, False if the queue was full
+        """
+        device_info = device_info or {}
+        run_id = test_data.get("run_id")
+        run = (
+            run_id,
+            test_data.get("datetime"),
+            device_info.get("pid"),
+            device_info.get("manufacturer"),
+            _to_int(test_data.get("pass")),
+            json.dumps(test_data.get("failed", [])),
+        )
+        rows = [
+            (
+                run_id,
+                result["moniker"],
+                _to_text(result.get("value")),
+                _to_int(result.get("pass")),
+                result.get("status"),
+            )
+            for result in results
+        ]
+
+        try:
+            self._queue.put_nowait((run, rows))
+        except Full:
+            self._logger.error(
+                f'result queue full, dropping results of run "{run_id}"')
+            return False
+
+        return True
+
+    def flush(self):
+        """
+        Blocks until every queued run has been written (or given up on).
+
+        :return: None
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes whatever is queued, then stops the background thread.
+
+        :return: None
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _connect(self):
+        """
+        Returns a DB-API connection using "?" parameters; implemented by \
+        subclasses.
+        """
+        raise NotImplementedError
+
+    def _release(self, connection):
+        """
+        Called once the connection is no longer needed, or is broken.
+        """
+        connection.close()
+
+    def _run(self):
+        connection = None
+        closing = False
+
+        while not closing:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except Empty:
+                continue
+
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=self._flush_interval)
+                except Empty:
+                    break
+            else:
+                closing = True
+
+            if batch:
+                connection = self._write_with_retry(connection, batch)
+
+            for _ in range(len(batch) + closing):
+                self._queue.task_done()
+
+        if connection is not None:
+            self._release(connection)
+
+    def _write_with_retry(self, connection, batch):
+        for attempt in range(self._retries + 1):
+            try:
+                if connection is None:
+                    connection = self._connect()
+                    self._create_tables(connection)
+                self._write(connection, batch)
+                return connection
+            except Exception as e:
+                self._logger.warning(
+                    f"writing {len(batch)} run(s) failed "
+                    f"(attempt {attempt + 1}): {e}"
+                )
+                if connection is not None:
+                    try:
+                        self._release(connection)
+                    except Exception:
+                        pass
+                    connection = None
+                if attempt < self._retries:
+                    sleep(self._retry_delay * 2 ** attempt)
+
+        self._logger.error(
+            f"giving up on {len(batch)} run(s): "
+            f"{[run[0] for run, _ in batch]}"
+        )
+        return None
+
+    @staticmethod
+    def _create_tables(connection):
+        cursor = connection.cursor()
+        for statement in _SCHEMA:
+            cursor.execute(statement)
+        connection.commit()
+
+    @staticmethod
+    def _write(connection, batch):
+        runs = [run for run, _ in batch]
+        results = [row for _, rows in batch for row in rows]
+
+        cursor = connection.cursor()
+        try:
+            _insert(cursor, "runs", _RUN_COLUMNS, runs)
+            _insert(cursor, "results", _RESULT_COLUMNS, results)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+
+class SQLiteResultSink(ResultSink):
+
+    """
+    A ``ResultSink`` writing to a local SQLite file with the same schema \
+    as the MariaDB database, for development and local testing.
+
+    :param path: the path of the database file
+    """
+
+    def __init__(self, path: str = "results.db", **kwargs):
+        self._path = path
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        import sqlite3
+
+        return sqlite3.connect(self._path)
+
+
+class MariaDBResultSink(ResultSink):
+
+    """
+    A ``ResultSink`` writing to MariaDB through a connection pool.  \
+    Requires the ``mariadb`` package.
+
+    :param host: the database host
+    :param user: the database user
+    :param password: the database password
+    :param database: the database name
+    :param port: the database port
+    :param pool_size: the number of pooled connections
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        database: str,
+        port: int = 3306,
+        pool_size: int = 2,
+        **kwargs,
+    ):
+        try:
+            import mariadb
+        except ImportError:
+            raise ImportError(
+                'the "mariadb" package is required for MariaDBResultSink')
+
+        self._pool = mariadb.ConnectionPool(
+            pool_name=f"mats_{id(self)}",
+            pool_size=pool_size,
+            host=host,
+            user=user,
+            password=password,
+            database=database,
+            port=port,
+        )
+        super().__init__(**kwargs)
+
+    def _connect(self):
+        return self._pool.get_connection()
+
+    def _release(self, connection):
+        # returns the connection to the pool
+        connection.close()
+
+
+def _insert(cursor, table, columns, rows):
+    placeholders = "(" + ", ".join("?" * len(columns)) + ")"
+    for start in range(0, len(rows), _MAX_ROWS_PER_INSERT):
+        chunk = rows[start:start + _MAX_ROWS_PER_INSERT]
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+            + ", ".join([placeholders] * len(chunk)),
+            [value for row in chunk for value in row],
+        )
+
+
+def _to_int(value):
+    return None if value is None else int(bool(value))
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=_to_json)
+
+
+def _to_json(value):
+    # arrays, such as sweeps, are stored as their raw bytes rather than their abbreviated printed form
+    if _is_array(value):
+        from mats.arrays import encode_array
+
+        return encode_array(value)
+    return str(value)
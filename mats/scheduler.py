@@ -0,0 +1,173 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+import logging
+from typing import List
+
+from mats.test import Test
+
+
+class TestScheduler:
+
+    """
+    Runs the tests of a sequence concurrently wherever their declared \
+    resources and dependencies allow.
+
+    * a test which declares no ``resources`` runs on its own, after \
+      every earlier test has finished and before any later test starts
+    * tests sharing a resource run one at a time, in sequence order; the \
+      serial connection of a test (its ``ser``) is always one of its \
+      resources
+    * a test starts only after every test it ``depends_on`` has finished
+
+    The tests are put in dependency order once, when the scheduler is \
+    constructed, keeping the sequence order wherever the dependencies \
+    allow.
+
+    :param tests: the tests of the sequence
+    :param max_workers: the greatest number of tests to run at once
+    :param loglevel: the logging level
+    """
+
+    def __init__(self, tests: List[Test], max_workers: int, loglevel=logging.INFO):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(loglevel)
+
+        self._max_workers = max_workers
+        self._tests = tests
+        self._order = _dependency_order(tests)
+
+        self._resources = []
+        for test in tests:
+            resources = getattr(test, "resources", None)
+            if resources is None:
+                self._resources.append(None)
+                continue
+            resources = set(resources)
+            if getattr(test, "ser", None) is not None:
+                resources.add(("ser", id(test.ser)))
+            if getattr(test, "shared", None) is not None:
+                resources.add(("ser", id(test.shared.ser)))
+            self._resources.append(frozenset(resources))
+
+    @property
+    def order(self):
+        """
+        Returns the indices of the tests in the order they are considered
+
+        :return: list of indices into the sequence
+        """
+        return list(self._order)
+
+    def run(self, execute: callable, should_stop: callable):
+        """
+        Runs every test, blocking until they have all finished.
+
+        :param execute: function to call with the index and the test to \
+        run; returns False if no further tests should be started
+        :param should_stop: function returning True once no further tests \
+        should be started, e.g. on abort
+        :return: None
+        """
+        pending = list(self._order)
+        running = {}
+        held = set()
+        finished = set()
+        exclusive = False
+        stopping = False
+
+        with ThreadPoolExecutor(max_workers=self._max_workers,
+                                thread_name_prefix="test") as pool:
+            while pending or running:
+                if stopping or should_stop():
+                    pending = []
+
+                claimed = set()
+                for i in list(pending):
+                    if exclusive or len(running) >= self._max_workers:
+                        break
+
+                    test = self._tests[i]
+                    resources = self._resources[i]
+                    ready = all(d in finished for d in _depends_on(test))
+
+                    if resources is None:
+                        # waits for everything before it, and holds back everything after it
+                        if ready and not running and i == pending[0]:
+                            exclusive = True
+                        else:
+                            break
+                    elif not ready or resources & held or resources & claimed:
+                        # keep later users of the same resources behind this one
+                        claimed |= resources
+                        continue
+                    else:
+                        held |= resources
+
+                    pending.remove(i)
+                    # carry the log context of the sequence over to the worker
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, execute, i, test)] = i
+
+                if not running:
+                    if pending:
+                        self._logger.error(
+                            "no test can be started, %d left unrun", len(pending))
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    if self._resources[i] is None:
+                        exclusive = False
+                    else:
+                        held -= self._resources[i]
+                    finished.add(self._tests[i].moniker)
+
+                    try:
+                        if future.result() is False:
+                            stopping = True
+                    except Exception as e:
+                        self._logger.critical(
+                            f'critical error while scheduling "{self._tests[i]}": {e}')
+                        stopping = True
+
+
+def _depends_on(test):
+    return getattr(test, "depends_on", None) or ()
+
+
+def _dependency_order(tests):
+    """
+    Orders the tests so that each comes after the tests it depends on, \
+    otherwise keeping the sequence order.
+
+    :return: list of indices into ``tests``
+    """
+    index = {test.moniker: i for i, test in enumerate(tests)}
+    for test in tests:
+        unknown = [d for d in _depends_on(test) if d not in index]
+        if unknown:
+            raise ValueError(
+                f'"{test.moniker}" depends on unknown tests {unknown}')
+
+    order = []
+    placed = set()
+    visiting = set()
+
+    def place(i):
+        if i in placed:
+            return
+        if i in visiting:
+            raise ValueError(
+                f'circular dependency involving "{tests[i].moniker}"')
+        visiting.add(i)
+        for moniker in _depends_on(tests[i]):
+            place(index[moniker])
+        visiting.discard(i)
+        placed.add(i)
+        order.append(i)
+
+    for i in range(len(tests)):
+        place(i)
+
+    return order
@@ -0,0 +1,79 @@
+import logging
+from threading import Lock
+
+
+class SharedCommand:
+
+    """
+    A command whose response is evaluated by several tests, such as a \
+    diagnostic dump.  The command is sent once per run, by whichever \
+    member test executes first, and every other member evaluates its \
+    own criteria against the same response.
+
+    Pass the instance as the ``shared`` argument of each member ``Test``.
+
+    :param ser: the connection to send the command on
+    :param cmd: the command, as a `str` or encoded `bytes`
+    :param loglevel: the logging level to apply such as `logging.INFO`
+    """
+
+    def __init__(self, ser, cmd, loglevel=logging.INFO):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._logger.setLevel(loglevel)
+
+        self.ser = ser
+        self.cmd = cmd.decode("utf-8") if isinstance(cmd, bytes) else cmd
+        # encoded once, rather than on every run
+        self._data = cmd if isinstance(cmd, bytes) else cmd.encode("utf-8")
+
+        self._lock = Lock()
+        self._response = None
+
+        # seconds spent in each phase of fetching the response
+        self.timing = {}
+
+    def response(self):
+        """
+        Returns the response to the command, sending it only if it has \
+        not yet been sent this run.
+
+        :return: the response
+        """
+        with self._lock:
+            if self._response is None:
+                self._logger.info('sending shared command "%s"', self.cmd.strip())
+                self._response = self.ser.sendRec(self._data)
+                self.timing = dict(getattr(self.ser, "last_timing", {}))
+            return self._response
+
+    async def response_async(self):
+        """
+        Event loop counterpart of ``response()``, for asynchronous \
+        connections.
+
+        :return: the response
+        """
+        if self._response is None:
+            self._logger.info('sending shared command "%s"', self.cmd.strip())
+            self._response = await self.ser.sendRec(self._data)
+            self.timing = dict(getattr(self.ser, "last_timing", {}))
+        return self._response
+
+    @property
+    def fetched(self):
+        """
+        Returns `True` once the command has been sent this run
+
+        :return: `True` if the response is available, else `False`
+        """
+        return self._response is not None
+
+    def reset(self):
+        """
+        Forgets the response, so that the next run sends the command again
+
+        :return: None
+        """
+        with self._lock:
+            self._response = None
+            self.timing = {}
@@ -0,0 +1,151 @@
+import atexit
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import json
+import logging
+from queue import SimpleQueue
+
+# fields describing what is being tested, copied onto every log record
+_CONTEXT_FIELDS = ("pid", "manufacturer", "run_id", "moniker")
+_RECORD_FIELDS = _CONTEXT_FIELDS + ("duration",)
+
+_log_context = ContextVar("mats_log_context", default={})
+
+# the listener started by the last configure_logging()
+_listener = None
+
+
+def set_log_context(**fields):
+    """
+    Sets fields such as the device PID, manufacturer, run id or test \
+    moniker to be included in every record logged from the current thread \
+    (or asyncio task).  Fields given as ``None`` are removed.
+
+    :param fields: the fields to update
+    :return: None
+    """
+    context = dict(_log_context.get())
+    for key, value in fields.items():
+        if value is None:
+            context.pop(key, None)
+        else:
+            context[key] = value
+    _log_context.set(context)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Copies the log context onto each record in the thread that logged it.
+    """
+
+    def filter(self, record):
+        for key, value in _log_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+
+    """
+    Formats each record as a single line of JSON, including any context \
+    fields (pid, manufacturer, run_id, moniker, duration) present.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in _RECORD_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(
+    path: str = "log.json",
+    level=logging.INFO,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    console: bool = True,
+):
+    """
+    Sends all logging through a queue to a background thread, which \
+    writes JSON lines to a rotating ``path`` and, optionally, coloured \
+    text to the console.  Any handlers already on the root logger are \
+    replaced.
+
+    :param path: the file to write JSON lines to
+    :param level: the root logging level
+    :param max_bytes: the size at which the file is rotated
+    :param backup_count: the number of rotated files to keep
+    :param console: if `True`, also log to the console
+    :return: the running ``QueueListener``, stopped automatically at exit \
+    or when logging is configured again; it may also be stopped sooner
+    """
+    global _listener
+
+    # only needed once logging is configured, and slow to import
+    from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+    file_handler = RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonLinesFormatter())
+    handlers = [file_handler]
+
+    if console:
+        console_handler = logging.StreamHandler()
+        try:
+            import coloredlogs
+
+            console_handler.setFormatter(coloredlogs.ColoredFormatter())
+        except ImportError:
+            console_handler.setFormatter(logging.Formatter(
+                "%(asctime)s %(name)s %(levelname)s %(message)s"))
+        handlers.append(console_handler)
+
+    queue = SimpleQueue()
+    queue_handler = QueueHandler(queue)
+    queue_handler.addFilter(_ContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    listener = QueueListener(queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    # the previous listener writes out what was queued for it before the handlers changed
+    _stop_listener()
+    _listener = listener
+    atexit.unregister(_stop_listener)
+    atexit.register(_stop_listener)
+
+    return listener
+
+
+def _stop_listener():
+    """
+    Stops the listener of the current configuration and closes its \
+    handlers.  Does nothing if there is none, and doesn't stop one its \
+    caller has stopped already.
+    """
+    global _listener
+
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    # QueueListener.stop() can only be called once, after which it has no thread
+    if listener._thread is not None:
+        listener.stop()
+    for handler in listener.handlers:
+        handler.close()
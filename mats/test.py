@@ -1,8 +1,15 @@
 import logging
 from numbers import Number
-from typing import Optional, Union
+import sys
+from time import perf_counter
+from types import MappingProxyType
+from typing import Optional, Sequence, Union
 
-from sigfig import round
+from mats.matchers import compile_matchers
+
+# shared by every test until it has data of its own, rather than an empty dict each;
+# read-only, since each run replaces it rather than adding to it
+_EMPTY = MappingProxyType({})
 
 
 class Test:
@@ -16,47 +23,112 @@ class Test:
 
     :param moniker: a shortcut name for this particular test
     :param min_value: the minimum value that is to be considered a pass, \
-    if defined
+    if defined.  When ``execute()`` returns a NumPy array, every element is \
+    checked against it, or against its own element of a sequence of \
+    minimums; `None` elements are not limited
     :param max_value: the maximum value that is to be considered a pass, \
-    if defined
+    if defined; likewise for arrays
     :param pass_if: the value that must be present in order to pass, if defined
     :param significant_figures: the number of significant figures appropriate to the measurement
+    :param matchers: a matcher, or list of matchers, applied to the response; \
+    see ``mats.matchers.compile_matcher()`` for the accepted configurations
+    :param shared: a ``SharedCommand`` whose response this test evaluates \
+    in place of sending its own command
+    :param resources: names of the instruments or channels the test uses, \
+    such as "dmm" or "psu:1"; when the sequence runs tests concurrently, \
+    tests sharing a resource never overlap and a test declaring none runs \
+    on its own
+    :param depends_on: monikers of the tests which must finish before this \
+    one starts
+    :param mask: for array values, a ``bool`` per element, `False` where \
+    the element is not checked against the limits
     :param loglevel: the logging level to apply such as `logging.INFO`
     """
 
+    # slots rather than a __dict__ per instance, as a soak sequence may hold
+    # tens of thousands of tests; subclasses which don't declare their own
+    # __slots__ still get a __dict__ for their attributes
+    __slots__ = (
+        # the definition of the test
+        "_logger", "_pass_if", "_min", "_max", "_matchers", "_limit_vectors", "_significant_figures",
+        "moniker", "description", "shared", "resources", "depends_on", "runStatus",
+        "_observer", "saved_data",
+        # the state of the current run, see ``reset()``
+        "_status", "_test_is_passing", "aborted", "value", "fields", "timing",
+        "_started", "_pending_response", "got_resp",
+    )
+
     def __init__(
         self,
         moniker: str,
         description: str,
-        min_value: Optional[Number] = None,
-        max_value: Optional[Number] = None,
+        min_value: Optional[Union[Number, Sequence[Optional[Number]]]] = None,
+        max_value: Optional[Union[Number, Sequence[Optional[Number]]]] = None,
         pass_if: Optional[Union[str, bool, int]] = None,
         significant_figures=4,
+        matchers=None,
+        shared=None,
+        resources=None,
+        depends_on=None,
+        mask: Optional[Sequence[bool]] = None,
         loglevel=logging.INFO,
     ):
         self._logger = logging.getLogger(self.__class__.__name__)
-        self._logger.setLevel(loglevel)
+        # setting the level clears the cache of every logger, which adds up over thousands of tests
+        if self._logger.level != loglevel:
+            self._logger.setLevel(loglevel)
 
-        criteria = {}
-        if pass_if is not None:
-            criteria["pass_if"] = pass_if
-        if min_value is not None:
-            criteria["min"] = min_value
-        if max_value is not None:
-            criteria["max"] = max_value
+        # kept apart rather than as a criteria dict per test, see ``criteria``
+        self._pass_if = pass_if
+        self._min = min_value
+        self._max = max_value
+
+        # compiled once here rather than on every response; most tests have none
+        self._matchers = tuple(compile_matchers(matchers))
 
         self.moniker = moniker
         self.description = description
-        self.__criteria = criteria if criteria else None
+        self.shared = shared
+        self.resources = frozenset(resources) if resources is not None else None
+        self.depends_on = tuple(depends_on) if depends_on is not None else ()
         self._significant_figures = significant_figures
 
+        # limits per element, converted once for comparing with array values
+        self._limit_vectors = None
+        if mask is not None or _is_sequence(min_value) or _is_sequence(max_value):
+            import numpy as np
+
+            from mats.arrays import limit_vector
+
+            self._limit_vectors = (
+                limit_vector(min_value),
+                limit_vector(max_value),
+                None if mask is None else np.asarray(mask, dtype=bool),
+            )
+
+        # called whenever the status or verdict changes, see ``TestSequence.subscribe()``
+        self._observer = None
+
         self._test_is_passing = None
         self.value = None
+        # the response to the command, for tests which send one
+        self.got_resp = None
         self.aborted = False
-        self.status = "waiting"
+        self._status = "waiting"
         self.runStatus = True
 
-        self.saved_data = {}
+        self.saved_data = _EMPTY
+
+        # values extracted from the response by the matchers
+        self.fields = _EMPTY
+
+        self._started = None
+
+        # seconds spent in each phase of the last execution
+        self.timing = _EMPTY
+
+        # set by a pipelining ``TestSequence`` when the command was sent ahead of time
+        self._pending_response = None
 
     @property
     def is_passing(self):
@@ -67,6 +139,26 @@ class Test:
         """
         return self._test_is_passing
 
+    @property
+    def status(self):
+        """
+        Returns the test status, one of "waiting", "running", "aborted", \
+        "skipped" or "complete"
+
+        :return: the status as a `str`
+        """
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        if status != self._status:
+            self._status = status
+            self._notify()
+
+    def _notify(self):
+        if self._observer is not None:
+            self._observer(self)
+
     @property
     def criteria(self):
         """
@@ -74,7 +166,33 @@ class Test:
 
         :return: test criteria as a `dict`
         """
-        return self.__criteria
+        criteria = {}
+        if self._pass_if is not None:
+            criteria["pass_if"] = self._pass_if
+        if self._min is not None:
+            criteria["min"] = self._min
+        if self._max is not None:
+            criteria["max"] = self._max
+        if self._matchers:
+            criteria["match"] = "; ".join(m.describe() for m in self._matchers)
+        return criteria if criteria else None
+
+    @property
+    def limits(self):
+        """
+        Returns the numeric limits of the test, those of its value and of \
+        each field extracted by its matchers; limits per element of an \
+        array are not included
+
+        :return: ``dict`` of field name, or `None` for the value itself, \
+        to (min, max), either of which may be `None`
+        """
+        limits = {}
+        if self._limit_vectors is None and (self._min is not None or self._max is not None):
+            limits[None] = (self._min, self._max)
+        for matcher in self._matchers:
+            limits.update(matcher.limits())
+        return limits
 
     @property
     def get_run_status(self):
@@ -104,62 +222,184 @@ class Test:
             self._logger.warning("aborted, not executing")
             return
 
-        self._logger.info(f'executing test "{self.moniker}"')
+        self._logger.info('executing test "%s"', self.moniker)
+        self._started = perf_counter()
+        self.timing = {}
+        self._test_is_passing = True
 
         # execute the test and perform appropriate rounding
         value = self.execute(is_passing=is_passing)
-        if isinstance(value, Number):
+        executed = perf_counter()
+
+        value = self._evaluate(value)
+        self.timing["execute"] = executed - self._started
+        self.timing["evaluate"] = perf_counter() - executed
+
+        return value
+
+    async def _execute_async(self, is_passing):
+        """
+        Pre-execution method used for logging and housekeeping when the \
+        test is driven from an event loop.
+
+        :param is_passing: True if the test sequence is passing up to this \
+        point, else False
+        :return:
+        """
+        self.status = "running" if not self.aborted else "aborted"
+        if self.aborted:
+            self._logger.warning("aborted, not executing")
+            return
+
+        self._logger.info('executing test "%s"', self.moniker)
+        self._started = perf_counter()
+        self.timing = {}
+        self._test_is_passing = True
+
+        value = await self.execute_async(is_passing=is_passing)
+        executed = perf_counter()
+
+        value = self._evaluate(value)
+        self.timing["execute"] = executed - self._started
+        self.timing["evaluate"] = perf_counter() - executed
+
+        return value
+
+    def _evaluate(self, value):
+        """
+        Rounds the value returned by the test and checks it against the \
+        test criteria.
+
+        :param value: the value returned by ``execute()``
+        :return: the rounded value
+        """
+        if _is_array(value):
+            from mats.arrays import round_significant
+
+            value = round_significant(value, self._significant_figures)
+        elif isinstance(value, Number):
+            # imported on first use, so that importing mats stays cheap
+            from sigfig import round
+
             try:
                 value = round(value, self._significant_figures)
             except ValueError:
                 self._logger.debug(
-                    f'could not apply significant digits to "{value}"')
+                    'could not apply significant digits to "%s"', value)
         self.value = value
 
-        if self.__criteria is not None:
-            if self.__criteria.get("pass_if") is not None:
-                if self.value != self.__criteria["pass_if"]:
+        if _is_array(self.value):
+            self._check_array()
+        else:
+            if self._pass_if is not None:
+                if self.value != self._pass_if:
                     self._logger.warning(
-                        f'"{self.value}" != pass_if requirement '
-                        f'"{self.__criteria["pass_if"]}", failing'
+                        '"%s" != pass_if requirement "%s", failing',
+                        self.value, self._pass_if
                     )
                     self.fail()
                 else:
                     self._logger.info(
-                        f'"{self.value}" == pass_if requirement '
-                        f'"{self.__criteria["pass_if"]}"'
+                        '"%s" == pass_if requirement "%s"',
+                        self.value, self._pass_if
                     )
 
-            if self.__criteria.get("min") is not None:
-                if self.value < self.__criteria["min"]:
+            if self._min is not None:
+                if self.value < self._min:
                     self._logger.warning(
-                        f'"{self.value}" is below the minimum '
-                        f'"{self.__criteria["min"]}", failing'
+                        '"%s" is below the minimum "%s", failing',
+                        self.value, self._min
                     )
                     self.fail()
                 else:
                     self._logger.info(
-                        f'"{self.value}" is above the minimum '
-                        f'"{self.__criteria["min"]}"'
+                        '"%s" is above the minimum "%s"',
+                        self.value, self._min
                     )
 
-            if self.__criteria.get("max") is not None:
-                if self.value > self.__criteria["max"]:
+            if self._max is not None:
+                if self.value > self._max:
                     self._logger.warning(
-                        f'"{self.value}" is above the maximum '
-                        f'"{self.__criteria["max"]}"'
+                        '"%s" is above the maximum "%s"',
+                        self.value, self._max
                     )
                     self.fail()
                 else:
                     self._logger.info(
-                        f'"{self.value}" is below the maximum '
-                        f'"{self.__criteria["max"]}"'
+                        '"%s" is below the maximum "%s"',
+                        self.value, self._max
                     )
 
+        if self._matchers:
+            self._match(self.value)
+
         self.status = "running" if not self.aborted else "aborted"
 
         return self.value
 
+    def _check_array(self):
+        """
+        Checks every element of an array value against the test criteria, \
+        failing the test if any element is out of its limits.
+
+        :return: None
+        """
+        from mats.arrays import check_limits
+
+        if self._pass_if is not None:
+            self._logger.warning(
+                'an array can\'t be compared with pass_if requirement "%s", failing',
+                self._pass_if
+            )
+            self.fail()
+
+        if self._limit_vectors is not None:
+            low, high, mask = self._limit_vectors
+        else:
+            low, high, mask = self._min, self._max, None
+
+        try:
+            below, above = check_limits(self.value, low, high, mask)
+        except ValueError as e:
+            self._logger.warning("%s, failing", e)
+            self.fail()
+            return
+
+        if len(below):
+            self._logger.warning(
+                "%d elements are below the minimum, at %s, failing",
+                len(below), below.tolist()
+            )
+            self.fail()
+        if len(above):
+            self._logger.warning(
+                "%d elements are above the maximum, at %s, failing",
+                len(above), above.tolist()
+            )
+            self.fail()
+        if not len(below) and not len(above):
+            self._logger.info("%d elements within limits", self.value.size)
+
+    def _match(self, value):
+        """
+        Applies each matcher to the value, collecting the extracted \
+        fields and failing the test if any criterion is not met.
+
+        :param value: the value returned by ``execute()``
+        :return: None
+        """
+        response = value if isinstance(value, str) else str(value)
+        self.fields = {}
+        for matcher in self._matchers:
+            passed, fields, reasons = matcher.match(response)
+            self.fields.update(fields)
+            if passed:
+                self._logger.info('"%s" matched', matcher.describe())
+            else:
+                for reason in reasons:
+                    self._logger.warning('%s, failing', reason)
+                self.fail()
+
     def _teardown(self, is_passing):
         """
         Pre-execution method used for logging and housekeeping.
@@ -173,17 +413,36 @@ class Test:
             self._logger.warning("aborted, not executing")
             return
 
-        self._logger.info(f'tearing down "{self.moniker}"')
+        self._logger.info('tearing down "%s"', self.moniker)
 
+        tearing_down = perf_counter()
         self.teardown(is_passing)
+        self.timing["teardown"] = perf_counter() - tearing_down
         self.status = "complete"
 
+        if self._started is not None:
+            duration = perf_counter() - self._started
+            self._logger.info(
+                '"%s" complete in %.3fs', self.moniker, duration,
+                extra={"duration": duration})
+
     def reset(self):
         """
-        Reset the test status
+        Reset the test status, clearing any abort left over from the \
+        previous run
         :return: None
         """
         self.status = "waiting"
+        self.aborted = False
+        self._test_is_passing = None
+        self._started = None
+        self.value = None
+        self.got_resp = None
+        self.timing = _EMPTY
+        self.fields = _EMPTY
+        self._pending_response = None
+        if self.shared is not None:
+            self.shared.reset()
 
     def save_dict(self, data: dict):
         """
@@ -195,13 +454,24 @@ class Test:
         """
         self.saved_data = data.copy()
 
+    def skip(self):
+        """
+        Marks the test as skipped by the sequence, without a verdict.
+
+        :return: None
+        """
+        self._test_is_passing = None
+        self.status = "skipped"
+
     def fail(self):
         """
         When called, will cause the test to fail.
 
         :return: None
         """
-        self._test_is_passing = False
+        if self._test_is_passing is not False:
+            self._test_is_passing = False
+            self._notify()
 
     def execute(self, is_passing):
         """
@@ -210,9 +480,22 @@ class Test:
         :return: value to be appended to the sequence dictionary
         """
         # pass commands and expected response to parser.py
-        self.got_resp = self.ser.sendRec(self.cmd)
+        if self._pending_response is not None:
+            # the command was already queued by the sequence, just collect the response
+            self.got_resp = self._pending_response.result()
+            self.timing.update(getattr(self._pending_response, "timing", {}))
+            self._pending_response = None
+        elif self.shared is not None:
+            # only the first member of the group to execute pays for the round trip
+            fetched = self.shared.fetched
+            self.got_resp = self.shared.response()
+            if not fetched:
+                self.timing.update(self.shared.timing)
+        else:
+            self.got_resp = self.ser.sendRec(self.cmd)
+            self.timing.update(getattr(self.ser, "last_timing", {}))
         # should return a (key, value) which are the results of the test
-        print("got_resp: " + self.got_resp)
+        self._logger.debug("got_resp: %r", self.got_resp)
 
         '''
         NOTICE THAT YOU TAKE GOT_RESP AND TURN INTO STRING!!
@@ -220,6 +503,39 @@ class Test:
 
         return str(self.got_resp)
 
+    async def execute_async(self, is_passing):
+        """
+        Event loop counterpart of ``execute()``.  When the connection is \
+        asynchronous the command is awaited on it; an overridden \
+        ``execute()`` is run in the default executor instead.
+
+        :param is_passing: True if the test sequence is passing up to this \
+        point, else False
+        :return: value to be appended to the sequence dictionary
+        """
+        import asyncio
+        import inspect
+
+        # an overridden execute() may not use a connection at all
+        ser = None
+        if type(self).execute is Test.execute:
+            ser = self.shared.ser if self.shared is not None else self.ser
+        if ser is None or not inspect.iscoroutinefunction(ser.sendRec):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.execute, is_passing)
+
+        if self.shared is not None:
+            fetched = self.shared.fetched
+            self.got_resp = await self.shared.response_async()
+            if not fetched:
+                self.timing.update(self.shared.timing)
+        else:
+            self.got_resp = await self.ser.sendRec(self.cmd)
+            self.timing.update(self.ser.last_timing)
+        self._logger.debug("got_resp: %r", self.got_resp)
+
+        return str(self.got_resp)
+
     def teardown(self, is_passing):
         """
         Abstract method intended to be overridden by subclass
@@ -229,3 +545,16 @@ class Test:
         :return: None
         """
         pass
+
+
+def _is_array(value):
+    """
+    True if the value is a NumPy array; NumPy isn't imported for this, since \
+    if it isn't loaded the value can't be an array
+    """
+    numpy = sys.modules.get("numpy")
+    return numpy is not None and isinstance(value, numpy.ndarray)
+
+
+def _is_sequence(limit):
+    return isinstance(limit, (list, tuple)) or _is_array(limit)
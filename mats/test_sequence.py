@@ -1,29 +1,66 @@
 import atexit
 from datetime import datetime
+from enum import Enum
 import logging
-from threading import Thread
+from threading import Condition, Thread, current_thread
+from time import perf_counter
 import traceback
-from time import sleep
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
+import uuid
 
+from mats.metrics import Metrics
+from mats.result_sink import ResultSink
+from mats.structured_log import set_log_context
 from mats.test import Test
 
-from py.serial_connection import SerialConnection
+# the serial modules are imported where they are used, so that a sequence
+# which never opens a port does not pay for importing pyserial
+if TYPE_CHECKING:
+    from mats.history import ResultHistory
+    from py.capture import CaptureWriter
+    from py.connection_manager import ConnectionManager
 
-# State Machine - Using strings b/c we can relatively easily look
-# for valid substrings to give more information in a concise way.
-# For instance, one may be looking for the substring 'ready', but
-# another function may look for the substring 'abort'.
-# valid states:
-#  - ready
-#  - starting
-#  - setting up
-#  - executing tests
-#  - tearing down
-#  - complete / ready
-#  - aborting
-#  - aborted / ready
-#  - exiting
+
+class SequenceState(Enum):
+
+    """
+    The states of a ``TestSequence``.  The values are the human-readable \
+    descriptions of each state.
+    """
+
+    READY = "ready"
+    STARTING = "starting"
+    SETTING_UP = "setting up"
+    EXECUTING_TESTS = "executing tests"
+    TEARING_DOWN = "tearing down"
+    COMPLETE = "complete / ready"
+    ABORTING = "aborting"
+    ABORTED = "aborted / ready"
+    EXITING = "exiting"
+
+
+# the states in which another run of the sequence may be started
+_READY_STATES = frozenset(
+    (SequenceState.READY, SequenceState.COMPLETE, SequenceState.ABORTED))
+
+_ABORT_STATES = frozenset((SequenceState.ABORTING, SequenceState.ABORTED))
+
+# valid transitions; any state may move to EXITING
+_TRANSITIONS = {
+    SequenceState.READY: {SequenceState.STARTING},
+    SequenceState.STARTING: {SequenceState.SETTING_UP, SequenceState.ABORTING},
+    SequenceState.SETTING_UP: {
+        SequenceState.EXECUTING_TESTS,
+        SequenceState.TEARING_DOWN,
+        SequenceState.ABORTING,
+    },
+    SequenceState.EXECUTING_TESTS: {SequenceState.TEARING_DOWN, SequenceState.ABORTING},
+    SequenceState.TEARING_DOWN: {SequenceState.COMPLETE, SequenceState.ABORTING},
+    SequenceState.COMPLETE: {SequenceState.STARTING},
+    SequenceState.ABORTING: {SequenceState.ABORTED},
+    SequenceState.ABORTED: {SequenceState.STARTING},
+    SequenceState.EXITING: set(),
+}
 
 
 class TestSequence:
@@ -35,7 +72,9 @@ class TestSequence:
     objects and appropriately passing them through the automated testing \
     process.
 
-    :param sequence: a list of Tests
+    :param sequence: a list of Tests; a test listed ahead of a test it \
+    ``depends_on`` is moved after it, otherwise keeping the order of the \
+    list
     :param archive_manager: an instance of ``ArchiveManager`` which will \
     contain the path and data_format-specific information
     :param auto_run: an integer that determines how many times a test \
@@ -47,6 +86,37 @@ class TestSequence:
     even if there was a problem; common to have safety issues addressed here
     :param on_close: function to call when the functionality is complete; \
     for instance, when a GUI closes, test hardware may need to be de-allocated
+    :param pipeline_window: if set, up to this many test commands are sent \
+    ahead on the serial link and their responses collected as each test \
+    executes; requires a connection with a terminator and firmware that \
+    answers commands in order.  Commands are not sent ahead past a test \
+    which sends its own, such as a member of a shared group
+    :param on_state_change: function to call on every state transition; \
+    it will be passed the old and the new ``SequenceState``
+    :param result_sink: a ``ResultSink`` to which the results of each run \
+    are handed for storage
+    :param metrics: a ``Metrics`` instance in which the timing of each run \
+    is recorded
+    :param connections: a started ``ConnectionManager``; if given, \
+    "Connect Device" takes an already open connection from it rather \
+    than searching for and opening the port
+    :param ser: the connection the tests were built with; "Connect \
+    Device" hands it back to ``connections`` before taking the next
+    :param fail_fast: if True, the sequence stops at the first failing test
+    :param max_failures: if set, the sequence stops once this many tests \
+    have failed; the tests not yet run are marked "skipped"
+    :param skip_dependents: if True, a test is skipped when any test it \
+    ``depends_on`` failed or was itself skipped for that reason
+    :param retest_failures: if True, a run following a failed run executes \
+    only the tests which failed, skipping the rest
+    :param max_workers: if greater than one, up to this many tests run at \
+    once, as their ``resources`` and ``depends_on`` allow; see \
+    ``TestScheduler``.  Pipelining is not used when tests run concurrently
+    :param capture: a ``CaptureWriter`` into which the bytes exchanged with \
+    the device are recorded; each run gets its own capture file, indexed \
+    by test moniker.  The connection must record to the same writer
+    :param history: a ``ResultHistory`` to which the values and verdicts \
+    of each run are appended, for yield and capability analysis
     :param loglevel: the logging level
     """
 
@@ -58,6 +128,19 @@ class TestSequence:
         callback: Optional[callable] = None,
         teardown: Optional[callable] = None,
         on_close: Optional[callable] = None,
+        pipeline_window: Optional[int] = None,
+        on_state_change: Optional[callable] = None,
+        result_sink: Optional[ResultSink] = None,
+        metrics: Optional[Metrics] = None,
+        connections: Optional["ConnectionManager"] = None,
+        ser=None,
+        fail_fast: bool = False,
+        max_failures: Optional[int] = None,
+        skip_dependents: bool = False,
+        retest_failures: bool = False,
+        max_workers: Optional[int] = None,
+        capture: Optional["CaptureWriter"] = None,
+        history: Optional["ResultHistory"] = None,
         loglevel=logging.INFO,
     ):
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -73,12 +156,64 @@ class TestSequence:
         if not TestSequence.__validate_sequence(sequence):
             raise ValueError("test monikers are not uniquely identified")
 
+        # however the tests run, they follow their dependencies; unknown
+        # and circular dependencies raise here rather than going unnoticed
+        if any(getattr(test, "depends_on", None) for test in sequence):
+            from mats.scheduler import _dependency_order
+
+            order = _dependency_order(sequence)
+            if order != sorted(order):
+                self._logger.info("tests reordered to follow their dependencies")
+                sequence[:] = [sequence[i] for i in order]
+
         self._sequence = sequence
+        # the sequence doesn't change once built, so neither do these; the
+        # display reads them far more often than the sequence runs
+        self._tests = tuple(sequence)
+        self._test_names = tuple(test.moniker for test in sequence)
+        self._index = {moniker: i for i, moniker in enumerate(self._test_names)}
+
+        self._subscribers = []
+        # one observer for every test, rather than one bound to each index
+        observer = self._publish_test
+        for test in self._sequence:
+            test._observer = observer
+
         self._callback = callback
         self._teardown = teardown
         self._on_close = on_close
         self._auto_run = auto_run
-        self._state = "ready" if not auto_run else "starting"
+        self._pipeline_window = pipeline_window
+        self._on_state_change = on_state_change
+        self._result_sink = result_sink
+        self._metrics = metrics
+        self._finished_run_id = None
+        self._connections = connections
+        self.ser = ser
+        self._capture = capture
+        self._history = history
+        if history is not None:
+            history.set_limits(self._sequence)
+
+        # early termination policies
+        self._max_failures = 1 if fail_fast else max_failures
+        self._skip_dependents = skip_dependents
+        self._retest_failures = retest_failures
+        self._retest = None
+        self._unmet = set()
+
+        self._scheduler = None
+        if max_workers is not None and max_workers > 1:
+            from mats.scheduler import TestScheduler
+
+            self._scheduler = TestScheduler(self._sequence, max_workers, loglevel=loglevel)
+            if pipeline_window:
+                self._logger.warning(
+                    "tests run concurrently, pipelining disabled")
+
+        # the worker starts the first run straight away when auto-running
+        self._condition = Condition()
+        self._state = SequenceState.READY
 
         self._devPid = device_info.pid
         self._devMan = device_info.manufacturer
@@ -95,9 +230,101 @@ class TestSequence:
         if self._teardown is not None:
             atexit.register(self._teardown_function)
 
+        self._start_worker()
+
+    def _start_worker(self):
+        """
+        Starts the background thread which waits for and executes each \
+        run of the sequence.
+        """
         self._thread = Thread(target=self._run_sequence, daemon=True)
         self._thread.start()
-    
+
+    @property
+    def state(self):
+        """
+        Returns the current state of the test sequence
+
+        :return: the ``SequenceState``
+        """
+        return self._state
+
+    def _transition(self, new_state: SequenceState):
+        """
+        Moves the sequence to ``new_state``, waking anything waiting on \
+        the state and notifying the ``on_state_change`` hook.
+
+        Once aborting or exiting, transitions which would resume normal \
+        execution are ignored rather than treated as errors, since they \
+        lose the race against ``abort()``/``close()``.
+
+        :param new_state: the ``SequenceState`` to move to
+        :return: True if the state changed, else False
+        """
+        with self._condition:
+            old_state = self._state
+            if new_state == old_state:
+                return False
+
+            if new_state != SequenceState.EXITING and new_state not in _TRANSITIONS[old_state]:
+                if old_state in (SequenceState.ABORTING, SequenceState.EXITING):
+                    return False
+                raise ValueError(
+                    f'invalid state transition "{old_state.value}" -> "{new_state.value}"'
+                )
+
+            self._state = new_state
+            self._condition.notify_all()
+
+        self._logger.debug('state "%s" -> "%s"', old_state.value, new_state.value)
+        self._publish("state", new_state)
+
+        if self._on_state_change is not None:
+            try:
+                self._on_state_change(old_state, new_state)
+            except Exception as e:
+                self._logger.warning(
+                    f"an exception occurred during the state change hook: {e}"
+                )
+
+        return True
+
+    def subscribe(self, listener: callable):
+        """
+        Registers a function to be called whenever the sequence changes \
+        state, or a test changes status or verdict.  It is passed the kind \
+        of event and its subject: ``("state", SequenceState)`` or \
+        ``("test", index of the test)``.
+
+        Listeners are called from the thread executing the sequence, so \
+        they should only hand the event off, e.g. onto a ``queue.Queue``.
+
+        :param listener: the function to call
+        :return: None
+        """
+        self._subscribers.append(listener)
+
+    def unsubscribe(self, listener: callable):
+        """
+        Removes a function previously registered with ``subscribe()``
+
+        :param listener: the function to remove
+        :return: None
+        """
+        self._subscribers.remove(listener)
+
+    def _publish_test(self, test: Test):
+        self._publish("test", self._index[test.moniker])
+
+    def _publish(self, kind, subject):
+        for listener in self._subscribers:
+            try:
+                listener(kind, subject)
+            except Exception as e:
+                self._logger.warning(
+                    f"an exception occurred in an event listener: {e}"
+                )
+
     def getPid(self):
         return self._devPid
     
@@ -109,18 +336,18 @@ class TestSequence:
         """
         Returns instances of all tests contained within the ``TestSequence``
 
-        :return: all tests as a list
+        :return: all tests as a tuple
         """
-        return [test for test in self._sequence]
+        return self._tests
 
     @property
     def test_names(self):
         """
         Returns the names of the tests contained within the ``TestSequence``
 
-        :return: the names of the tests as a list
+        :return: the names of the tests as a tuple
         """
-        return [test.moniker for test in self._sequence]
+        return self._test_names
 
     @property
     def ready(self):
@@ -130,7 +357,7 @@ class TestSequence:
 
         :return: True or False
         """
-        return "ready" in self._state
+        return self._state in _READY_STATES
 
     @property
     def is_passing(self):
@@ -148,7 +375,7 @@ class TestSequence:
 
         :return: True or False
         """
-        return "abort" in self._state
+        return self._state in _ABORT_STATES
 
     @property
     def failed_tests(self):
@@ -167,10 +394,7 @@ class TestSequence:
 
         :return: tuple containing (current_test_number, total_tests)
         """
-        return (
-            self._current_test_number,
-            len([test.moniker for test in self._sequence]),
-        )
+        return self._current_test_number, len(self._tests)
 
     @property
     def in_progress(self):
@@ -179,13 +403,21 @@ class TestSequence:
 
         :return: True if the test sequence is currently in progress, else False
         """
-        return "ready" not in self._state
+        return self._state not in _READY_STATES
 
     def close(self):
         """
         Allows higher level code to call the close functionality.
+
+        The run in progress, if any, is finished first, so that its \
+        results are handed to the result sink before ``on_close`` is called.
         """
-        self._state = "exiting"
+        self._transition(SequenceState.EXITING)
+
+        thread = getattr(self, "_thread", None)
+        if thread is not None and thread is not current_thread():
+            thread.join()
+
         if self._on_close is not None:
             self._on_close()
 
@@ -204,9 +436,9 @@ class TestSequence:
 
         :return: None
         """
-        if "ready" not in self._state:
-            self._state = "aborting"
-            [test.abort() for test in self._sequence]
+        with self._condition:
+            if self.in_progress and self._transition(SequenceState.ABORTING):
+                [test.abort() for test in self._sequence]
 
     def start(self):
         """
@@ -215,13 +447,14 @@ class TestSequence:
 
         :return: None
         """
-        if self.in_progress:
-            self._logger.warning(
-                "cannot begin another test when test is " "currently in progress"
-            )
-            return
+        with self._condition:
+            if self.in_progress:
+                self._logger.warning(
+                    "cannot begin another test when test is " "currently in progress"
+                )
+                return
 
-        self._state = "starting"
+            self._transition(SequenceState.STARTING)
 
     def _teardown_function(self):
         self._logger.info(
@@ -241,7 +474,7 @@ class TestSequence:
         `Test` in preparation for the next single execution \
         of the sequence.
         """
-        if ("complete / ready" in self._state or "aborted / ready" in self._state):
+        if self._state in (SequenceState.COMPLETE, SequenceState.ABORTED):
             for test in self._sequence:
                 test.reset()
 
@@ -251,18 +484,19 @@ class TestSequence:
 
         :return: None
         """
-        while self._state != "exiting":
+        while self._state != SequenceState.EXITING:
             # wait at the ready (unless in auto-run mode)
-            while "ready" in self._state:
-                if self._auto_run and "abort" not in self._state:
-                    self._logger.info(
-                        '"auto_run" flag is set, ' "beginning test sequence"
-                    )
-                    self.start()
-                else:
-                    sleep(0.1)
-
-            if self._state == "exiting":
+            with self._condition:
+                while self.ready:
+                    if self._auto_run and not self.is_aborted:
+                        self._logger.info(
+                            '"auto_run" flag is set, ' "beginning test sequence"
+                        )
+                        self.start()
+                    else:
+                        self._condition.wait()
+
+            if self._state == SequenceState.EXITING:
                 self._sequence_teardown()
                 return
 
@@ -273,102 +507,377 @@ class TestSequence:
             if self._auto_run:
                 self._auto_run -= 1
 
-            if "abort" in self._state:
-                self._state = "aborted / ready"
-            else:
-                self._state = "complete / ready"
+            with self._condition:
+                if self.is_aborted:
+                    self._transition(SequenceState.ABORTED)
+                else:
+                    self._transition(SequenceState.COMPLETE)
 
     def _sequence_setup(self):
-        if "abort" in self._state:
+        if not self._transition(SequenceState.SETTING_UP):
             return
 
-        self._state = "setting up"
+        started = perf_counter()
         self._logger.info("-" * 80)
+
+        # only the failures of the previous run are retested, until a run passes
+        self._retest = None
+        if self._retest_failures and self._test_data.get("pass") is False:
+            self._retest = set(self._test_data["failed"])
+            self._logger.info("retesting %d failed tests", len(self._retest))
+        self._unmet = set()
+
         self._test_data = {
+            "run_id": str(uuid.uuid4()),
             "datetime": str(datetime.now()),
             "pass": True,
             "failed": [],
+            "skipped": [],
+            "timing": {"per_test": {}},
         }
 
+        set_log_context(
+            pid=self._devPid,
+            manufacturer=self._devMan,
+            run_id=self._test_data["run_id"],
+        )
+
+        if self._capture is not None:
+            self._capture.begin_run(
+                self._test_data["run_id"],
+                {"pid": self._devPid, "manufacturer": self._devMan},
+            )
+
         self._current_test_number = 0
 
         for test in self._sequence:
             test.reset()
 
+        self._test_data["timing"]["setup"] = perf_counter() - started
+
     def _sequence_executing_tests(self):
-        if "abort" in self._state:
+        if not self._transition(SequenceState.EXECUTING_TESTS):
             return
 
+        started = perf_counter()
+        pipelining = bool(self._pipeline_window) and self._scheduler is None
+        pipeline = None
+        queued = 0
+
         # begin the test sequence
-        for i, test in enumerate(self._sequence):
-            self._current_test_number = i
+        if self._scheduler is not None:
+            self._scheduler.run(self._run_test, lambda: self.is_aborted)
+        else:
+            for i, test in enumerate(self._sequence):
+                if test.get_run_status and not self.is_aborted:
+                    if pipeline is not None and not self._is_pipelinable(test, pipeline):
+                        # the test sends its own command, and the reader
+                        # thread would take the response to it
+                        pipeline.close()
+                        pipeline = None
+                    if pipeline is None and pipelining and self._is_pipelinable(test):
+                        pipeline = self._open_pipeline(test)
+                        pipelining = pipeline is not None
+
+                if pipeline is not None and not self.is_aborted:
+                    queued = self._queue_ahead(pipeline, i, queued)
+
+                if not self._run_test(i, test):
+                    break
+
+        if pipeline is not None:
+            pipeline.close()
+
+        self._end_tests(started)
+
+    def _run_test(self, i, test):
+        """
+        Executes and tears down one test of the sequence, recording its \
+        outcome.
 
-            if test.get_run_status == False:
-                self._logger.info(
-                    f"test " f"{i} not selected to be run, moving on"
-                )
-                continue
+        :param i: the index of the test in the sequence
+        :param test: the test
+        :return: False if the sequence should not continue, else True
+        """
+        begun = self._begin_test(i, test)
+        if not begun:
+            return begun is not None
 
-            if "abort" in self._state:
-                self._logger.warning(
-                    f"abort detected on test " f"{i}, exiting test sequence"
-                )
-                break
+        try:
+            test._execute(is_passing=self.is_passing)
+        except Exception as e:
+            self._test_error(test, "execution", e)
 
-            self.current_test = test.moniker
+        return self._finish_test(test)
 
-            if test.aborted:
-                self.abort()
-                break
+    def _begin_test(self, i, test):
+        """
+        Applies the selection, abort and skipping policies to a test about \
+        to execute, and marks its start.  Shared by every way of running \
+        the sequence.
+
+        :param i: the index of the test in the sequence
+        :param test: the test
+        :return: True to execute the test, False to move on to the next \
+        one, or None to stop the sequence
+        """
+        self._current_test_number = i
 
-            try:
-                test._execute(is_passing=self.is_passing)
-            except Exception as e:
-                self._logger.critical(
-                    f"critical error during " f'execution of "{test}": {e}'
-                )
-                self._logger.critical(str(traceback.format_exc()))
-                self.abort()
-                test.fail()
+        if test.get_run_status == False:
+            self._logger.info(
+                "test %d not selected to be run, moving on", i
+            )
+            return False
 
-            if test.aborted:
-                self.abort()
-                test.fail()
-                break
+        if self.is_aborted:
+            self._logger.warning(
+                "abort detected on test %d, exiting test sequence", i
+            )
+            return None
 
-            try:
-                test._teardown(is_passing=self.is_passing)
-            except Exception as e:
-                self._logger.critical(
-                    f"critical error during " f'teardown of "{test}": {e}'
-                )
-                self._logger.critical(str(traceback.format_exc()))
-                self.abort()
-                test.fail()
+        reason = self._skip_reason(test)
+        if reason is not None:
+            self._skip(test, reason)
+            return False
 
-            if test.aborted:
-                self.abort()
-                break
+        self.current_test = test.moniker
+        set_log_context(moniker=test.moniker)
+
+        if test.aborted:
+            self.abort()
+            return None
 
-            if not test._test_is_passing:
-                self._test_data["pass"] = False
-                self._test_data["failed"].append(test.moniker)
+        if self._capture is not None:
+            self._capture.start_test(test.moniker)
 
-        if "abort" in self._state:
+        return True
+
+    def _finish_test(self, test):
+        """
+        Tears down a test which has executed and records its outcome.  \
+        Shared by every way of running the sequence.
+
+        :param test: the test
+        :return: False if the sequence should not continue, else True
+        """
+        if test.aborted:
+            self.abort()
+            test.fail()
+            return False
+
+        try:
+            test._teardown(is_passing=self.is_passing)
+        except Exception as e:
+            self._test_error(test, "teardown", e)
+
+        if test.aborted:
+            self.abort()
+            return False
+
+        # each execution replaces the timing of the test, so it needn't be copied
+        self._test_data["timing"]["per_test"][test.moniker] = test.timing
+
+        if self._capture is not None:
+            self._capture.end_test(test.moniker, test._test_is_passing)
+
+        if not test._test_is_passing:
+            self._test_data["pass"] = False
+            self._test_data["failed"].append(test.moniker)
+            self._unmet.add(test.moniker)
+
+        return not self._failure_limit_reached()
+
+    def _test_error(self, test, phase, e):
+        """
+        Aborts the sequence after an exception in a test.
+        """
+        self._logger.critical(
+            f"critical error during " f'{phase} of "{test}": {e}'
+        )
+        self._logger.critical(str(traceback.format_exc()))
+        self.abort()
+        test.fail()
+
+    def _end_tests(self, started):
+        """
+        Finishes the tests of a run, however they were executed.
+
+        :param started: the ``perf_counter()`` at which they started
+        """
+        if not self.is_aborted:
+            self._skip_remaining()
+
+        set_log_context(moniker=None)
+
+        self._test_data["timing"]["tests"] = perf_counter() - started
+
+        if self.is_aborted:
             self._test_data["pass"] = None
 
+    def _skip_reason(self, test: Test):
+        """
+        Applies the skipping policies to a test about to execute.
+
+        :param test: the test
+        :return: why the test should be skipped, or None to execute it
+        """
+        if self._retest is not None and test.moniker not in self._retest:
+            return "passed in the previous run"
+
+        if self._skip_dependents:
+            unmet = [d for d in getattr(test, "depends_on", ()) if d in self._unmet]
+            if unmet:
+                self._unmet.add(test.moniker)
+                return f"prerequisites {unmet} did not pass"
+
+        return None
+
+    def _skip(self, test: Test, reason: str):
+        self._logger.info('skipping "%s": %s', test.moniker, reason)
+        test.skip()
+        self._test_data["skipped"].append(test.moniker)
+
+    def _failure_limit_reached(self):
+        """
+        Returns True once enough tests have failed to stop the sequence
+        """
+        if self._max_failures is None or len(self._test_data["failed"]) < self._max_failures:
+            return False
+
+        self._logger.warning(
+            "%d tests failed, stopping the test sequence", len(self._test_data["failed"]))
+        return True
+
+    def _skip_remaining(self):
+        """
+        Marks the selected tests which did not get to run as skipped, \
+        after the sequence stopped early.
+        """
+        for test in self._sequence:
+            if test.get_run_status and test.status == "waiting":
+                self._skip(test, "the test sequence stopped early")
+
+    def _open_pipeline(self, test: Test):
+        """
+        Creates a ``CommandPipeline`` on the serial connection of a \
+        pipelinable test.
+
+        :param test: the test
+        :return: the pipeline, or None if the connection can't be pipelined
+        """
+        from py.command_pipeline import CommandPipeline
+
+        try:
+            return CommandPipeline(test.ser)
+        except ValueError as e:
+            self._logger.warning(
+                f"pipelining disabled: {e}")
+            return None
+
+    def _queue_ahead(self, pipeline, current, queued):
+        """
+        Sends the commands of the upcoming tests so that no more than \
+        ``pipeline_window`` tests are ahead of the one executing.
+
+        Nothing is sent past a selected test which sends its own command, \
+        so that the device still receives the commands in the order of \
+        the sequence; the pipeline is closed before that test executes.  \
+        Nor is anything sent for a test which the skipping policies may \
+        yet skip: one left out of a retest, one whose prerequisites have \
+        not all finished, or one past enough unfinished tests to reach \
+        the failure limit if they failed, so with ``fail_fast`` only the \
+        command of the executing test is sent.
+
+        :param pipeline: the ``CommandPipeline`` to send on
+        :param current: the index of the test about to execute
+        :param queued: the index of the next test not yet considered
+        :return: the new value of ``queued``
+        """
+        queued = max(queued, current)
+        # the tests sent ahead which have yet to finish, any of which may fail
+        unfinished = sum(1 for test in self._sequence[current:queued] if test._pending_response is not None)
+        ahead = {test.moniker for test in self._sequence[current:queued]}
+
+        while queued < len(self._sequence) and queued - current < self._pipeline_window:
+            if self.is_aborted:
+                break
+
+            test = self._sequence[queued]
+            if test.get_run_status:
+                if not self._is_pipelinable(test, pipeline):
+                    break
+
+                skipped = self._may_skip(test, ahead)
+                if skipped is None:
+                    break
+                if not skipped:
+                    if self._max_failures is not None and \
+                            len(self._test_data["failed"]) + unfinished >= self._max_failures:
+                        break
+                    test._pending_response = pipeline.submit(test.cmd)
+                    unfinished += 1
+            ahead.add(test.moniker)
+            queued += 1
+
+        return queued
+
+    def _may_skip(self, test: Test, ahead):
+        """
+        Applies the skipping policies to a test ahead of the one executing, \
+        without recording anything, as ``_skip_reason()`` does once the \
+        test is reached.
+
+        :param test: the test
+        :param ahead: the monikers of the tests from the executing one up \
+        to this one, which have yet to finish
+        :return: True if the test will be skipped, False if not, or None \
+        if that depends on tests which have yet to finish
+        """
+        if self._retest is not None and test.moniker not in self._retest:
+            return True
+
+        if self._skip_dependents:
+            prerequisites = getattr(test, "depends_on", ())
+            if any(d in self._unmet for d in prerequisites):
+                return True
+            if any(d in ahead for d in prerequisites):
+                return None
+
+        return False
+
+    @staticmethod
+    def _is_pipelinable(test: Test, pipeline=None):
+        """
+        Only tests which use the default ``execute()`` send their \
+        command in a way the sequence can do on their behalf.
+        """
+        if type(test).execute is not Test.execute:
+            return False
+        if getattr(test, "shared", None) is not None:
+            # the response is fetched once for the whole group
+            return False
+        if getattr(test, "cmd", None) is None or getattr(test, "ser", None) is None:
+            return False
+        return pipeline is None or test.ser is pipeline._conn
+
     def _sequence_teardown(self):
         """
         Finishes up a test sequence by saving data, executing teardown \
         sequence, along with user callbacks.
         :return:
         """
-        if "abort" not in self._state:
-            self._state = "tearing down"
+        if not self.is_aborted:
+            self._transition(SequenceState.TEARING_DOWN)
+
+        # the teardown on exit repeats the last run's data, which is already finished with
+        run_id = self._test_data.get("run_id")
+        finishing_run = run_id is not None and run_id != self._finished_run_id
+        self._finished_run_id = run_id
 
         self._logger.info("test sequence complete")
-        self._logger.debug(f"test results: {self._test_data}")
+        self._logger.debug("test results: %s", self._test_data)
 
+        started = perf_counter()
         if self._teardown is not None:
             try:
                 self._teardown()
@@ -379,9 +888,13 @@ class TestSequence:
                     f"during sequence teardown: {e}"
                 )
 
+        if finishing_run:
+            self._test_data["timing"]["teardown"] = perf_counter() - started
+
+        started = perf_counter()
         if self._callback is not None:
             self._logger.info(
-                f"executing user-supplied callback function " f'"{self._callback}"'
+                'executing user-supplied callback function "%s"', self._callback
             )
             try:
                 self._callback(self._test_data)
@@ -390,11 +903,98 @@ class TestSequence:
                     f"an exception occurred during the callback sequence: {e}"
                 )
 
+        if not finishing_run:
+            return
+
+        self._test_data["timing"]["callback"] = perf_counter() - started
+
+        if self._capture is not None:
+            self._write_output("capture", self._capture.end_run, self._test_data["pass"])
+
+        if self._metrics is not None:
+            self._write_output("metrics", self._metrics.record_run, self._test_data)
+
+        if self._result_sink is None and self._history is None:
+            return
+
+        results = self._test_results()
+        if self._result_sink is not None:
+            self._write_output(
+                "result sink",
+                self._result_sink.submit,
+                self._test_data,
+                results,
+                {"pid": self._devPid, "manufacturer": self._devMan},
+            )
+
+        if self._history is not None:
+            self._write_output("history", self._history.record_run, self._test_data, results)
+
+    def _write_output(self, name, write, *args):
+        """
+        Hands the finished run to one of its outputs.  An output which \
+        fails is logged rather than raised, so that the sequence still \
+        finishes its teardown and goes on to the next run.
+
+        :param name: the name of the output, for the log
+        :param write: the method of the output to call
+        :return: None
+        """
+        try:
+            write(*args)
+        except Exception as e:
+            self._logger.error(
+                f"an exception occurred while writing the run to the {name}: {e}"
+            )
+
+    def _test_results(self):
+        """
+        Collects the outcome of each test in the last run.
+
+        :return: list of ``dict`` with the keys "moniker", "value", \
+        "pass", "status" and "fields"
+        """
+        return [
+            {
+                "moniker": test.moniker,
+                "value": test.value,
+                "pass": test.is_passing,
+                "status": test.status,
+                "fields": test.fields,
+            }
+            for test in self._sequence
+        ]
+
     #method to connect device for connect button
     def _connect_device(self):
         #make sure tests aren't being run right now before running command
-        if (self._state == "complete / ready" or self._state == "aborted / ready"):
-            self.ser = SerialConnection()
+        if self.ready:
+            if self._connections is not None:
+                # hand the previous device back and take whichever is ready now
+                if self.ser is not None:
+                    self._connections.release(self.ser)
+                ser = self._connections.acquire(timeout=0)
+                if ser is None:
+                    self._logger.warning("no device is attached")
+                    return
+                self.ser = ser
+            else:
+                from py.serial_connection import SerialConnection
+
+                # the port may be the one about to be opened again
+                if self.ser is not None:
+                    self.ser.close()
+                    self.ser = None
+                try:
+                    self.ser = SerialConnection()
+                except OSError as e:
+                    self._logger.warning(f"no device is attached: {e}")
+                    return
+
+            self._devPid = self.ser.getPID()
+            self._devMan = self.ser.getManufacturer()
 
             for test in self._sequence:
-                test.ser = self.ser
\ No newline at end of file
+                test.ser = self.ser
+                if test.shared is not None:
+                    test.shared.ser = self.ser
\ No newline at end of file
@@ -1,14 +1,32 @@
 import logging
+from queue import Empty, SimpleQueue
 from tkinter import *
+from tkinter import ttk
 
 from mats.test import Test
-from mats.test_sequence import TestSequence
+from mats.test_sequence import SequenceState, TestSequence
 
 _light_green = "#66ff66"
 _light_red = "#ff6666"
 _light_yellow = "#ffff99"
+_light_grey = "#d9d9d9"
 _relief = "sunken"
 _label_padding = 5
+_pump_interval = 50
+
+_checked = "☑"
+_unchecked = "☐"
+_output_width = 60
+
+# values of the status filter and the row tags they show
+_filters = {
+    "all": None,
+    "waiting": {"waiting"},
+    "running": {"running"},
+    "pass": {"pass"},
+    "fail": {"fail", "aborted"},
+    "skipped": {"skipped"},
+}
 
 
 class MatsFrame(Frame):
@@ -17,15 +35,21 @@ class MatsFrame(Frame):
     The frame that interacts with the test sequence to display the \
     test results as the test is executing.
 
+    Tests are listed in a ``ttk.Treeview``, which only draws the rows \
+    that are visible, so the frame stays responsive for very large \
+    sequences.  Click the first column of a row to toggle whether that \
+    test runs, and double-click a row to see the full response.
+
     :param parent: the tk parent frame
     :param sequence: the instance of `TestSequence` to monitor
-    :param vertical: if `True`, will stack tests vertically; \
-        otherwise, horizontally; default is vertical, `True`
+    :param vertical: if `True`, the overall status is shown below the \
+        buttons; otherwise, beside the test list; default is `True`
     :param start_btn: if `True`, will populate a start button; \
         otherwise, will not; default is `True`
     :param abort_btn: if `True`, will populate an abort button; \
         otherwise, will not; default is `True`
-    :param wrap: the number above which will start the next row or column
+    :param wrap: ignored; retained for compatibility
+    :param height: the number of test rows visible at once
     :param loglevel: the logging level, for instance 'logging.INFO'
     """
 
@@ -37,6 +61,7 @@ class MatsFrame(Frame):
         start_btn: bool = True,
         abort_btn: bool = True,
         wrap: int = 6,
+        height: int = 20,
         loglevel=logging.INFO,
     ):
         self._logger = logging.getLogger(self.__class__.__name__)
@@ -46,15 +71,11 @@ class MatsFrame(Frame):
         super().__init__(self._parent)
 
         self._sequence = sequence
+        self._tests = self._sequence.tests
 
         devPid = self._sequence.getPid()
         devMan = self._sequence.getMan()
 
-        arrow = "\u2b9e"
-
-        row = 0
-        col = 0
-
         #place start and abort buttons
 
         btn_frame = Frame(self)
@@ -62,307 +83,293 @@ class MatsFrame(Frame):
         btn_frame.columnconfigure(0, weight=1)
         r = 0
 
-        Button(btn_frame, text="Start", command=sequence.start).grid(
-            row=r, column=0, sticky="news"
-        )
-        r += 1
-
-        Button(btn_frame, text="ABORT", command=sequence.abort, fg="red").grid(
-            row=r, column=0, sticky="news"
-        )
-        
-        Label(self, text = "Device Information:\nPID: " + devPid + "\nManufacturer: " + devMan, anchor = "w").grid(
-            row = 0, column = 1)
-
-        #create label frame
-        status_frame = Frame(self)
-        Label(self, text=arrow, justify="center", anchor="center").grid(
-            row=0, column=1, sticky="news"
-        )
-        status_frame.grid(row=0, column=2)
-
-        col += 1
-
-        # take list of all tests in sequence and create a label, description label and checkbox for each
-        self._test_status_frames = []
-        self._test_status_checkbox = []
-        self._test_status_description = []
-        self._test_serial_output = []
-        for test in self._sequence.tests:
-            self._test_status_frames.append(
-                _TestLabel(
-                    status_frame, test, loglevel=self._logger.getEffectiveLevel()
-                )
-            )
-            self._test_status_checkbox.append(
-                _TestCheck(
-                    status_frame, self._sequence, test, loglevel=self._logger.getEffectiveLevel()
-                )
-            )
-            self._test_status_description.append(
-                _TestDesc(
-                    status_frame, test, loglevel=self._logger.getEffectiveLevel()
-                )
-            )
-            self._test_serial_output.append(
-                _TestOutput(
-                    status_frame, test, loglevel=self._logger.getEffectiveLevel()
-                )
+        if start_btn:
+            Button(btn_frame, text="Start", command=sequence.start).grid(
+                row=r, column=0, sticky="news"
             )
+            r += 1
 
-        # take each checkbutton, label and descrption label and place on the grid
-        row, col = 0, 0
-        max_row = row
-        max_col = col
-        # for each test
-        for tl, tcb, tdl, tso in zip(self._test_status_frames, self._test_status_checkbox, self._test_status_description, self._test_serial_output):
-            # put on the grid, then increment row to place next label
-            if vertical:
-                tcb.grid(row=row, column=col, sticky="news")
-                tl.grid(row=row, column=col + 1, sticky="news")
-                tdl.grid(row=row, column=col + 2, sticky="news")
-                tso.grid(row=row, column=col + 3, sticky="news")
-
-                row += 1
-                row %= wrap
-                if row == 0:
-                    col += 1
-            else:
-                tl.grid(row=row, column=col, sticky="news")
-
-                col += 1
-                col %= wrap
-                if col == 0:
-                    row += 1
-
-            max_row = max(row, max_row)
-            max_col = max(col, max_col)
-
-        col += 1
+        if abort_btn:
+            Button(btn_frame, text="ABORT", command=sequence.abort, fg="red").grid(
+                row=r, column=0, sticky="news"
+            )
+            r += 1
 
-        #add select/deselect all tests button that will toggle all checkbuttons
-        selectButton = Button(btn_frame, text="Select/Deselect All Tests", command=self._updateAllStates).grid(row=row, column=col, sticky="news")
+        #add select/deselect all tests button that will toggle all tests
+        Button(btn_frame, text="Select/Deselect All Tests", command=self._updateAllStates).grid(
+            row=r, column=0, sticky="news")
+        r += 1
 
         #add reset button to reset all tests
-        resetButton = Button(btn_frame, text="Reset All Tests", command=lambda: [self._resetAllStates(), sequence._reset_sequence()]).grid(
-            row=row + 1, column=col, sticky="news")
+        Button(btn_frame, text="Reset All Tests", command=lambda: [self._resetAllStates(), sequence._reset_sequence()]).grid(
+            row=r, column=0, sticky="news")
+        r += 1
 
-        connectButton = Button(btn_frame, text = "Connect Device", command = sequence._connect_device).grid(
-            row = row + 2, column = col, sticky = "news")
+        Button(btn_frame, text = "Connect Device", command = sequence._connect_device).grid(
+            row = r, column = 0, sticky = "news")
+        r += 1
+
+        Label(btn_frame, text = "Device Information:\nPID: " + devPid + "\nManufacturer: " + devMan, anchor = "w").grid(
+            row = r, column = 0, sticky = "news")
+
+        # filter by status and search by moniker
+        list_frame = Frame(self)
+        list_frame.grid(row=0, column=1, sticky="news")
+        list_frame.rowconfigure(1, weight=1)
+        list_frame.columnconfigure(3, weight=1)
+        self.columnconfigure(1, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self._status_filter = StringVar(list_frame, value="all")
+        self._search = StringVar(list_frame)
+        Label(list_frame, text="Show:").grid(row=0, column=0, sticky="w")
+        ttk.Combobox(
+            list_frame,
+            textvariable=self._status_filter,
+            values=list(_filters),
+            state="readonly",
+            width=8,
+        ).grid(row=0, column=1, sticky="w")
+        Label(list_frame, text="Search:").grid(row=0, column=2, sticky="e")
+        Entry(list_frame, textvariable=self._search).grid(
+            row=0, column=3, sticky="ew")
+        self._status_filter.trace_add("write", lambda *_: self._apply_filter())
+        self._search.trace_add("write", lambda *_: self._apply_filter())
+
+        # the test list itself
+        self._tree = ttk.Treeview(
+            list_frame,
+            columns=("run", "criteria", "description", "output"),
+            height=height,
+            selectmode="browse",
+        )
+        self._tree.heading("#0", text="Test")
+        self._tree.heading("run", text="Run")
+        self._tree.heading("criteria", text="Criteria")
+        self._tree.heading("description", text="Description")
+        self._tree.heading("output", text="Output")
+        self._tree.column("run", width=40, stretch=False, anchor="center")
+        self._tree.tag_configure("running", background=_light_yellow)
+        self._tree.tag_configure("pass", background=_light_green)
+        self._tree.tag_configure("fail", background=_light_red)
+        self._tree.tag_configure("aborted", background=_light_red)
+        self._tree.tag_configure("skipped", background=_light_grey)
+
+        scrollbar = Scrollbar(list_frame, orient="vertical", command=self._tree.yview)
+        self._tree.configure(yscrollcommand=scrollbar.set)
+        self._tree.grid(row=1, column=0, columnspan=4, sticky="news")
+        scrollbar.grid(row=1, column=4, sticky="ns")
+
+        self._tree.bind("<Button-1>", self._on_click)
+        self._tree.bind("<Double-1>", self._on_double_click)
+
+        self._row_tags = []
+        self._hidden = set()
+        for i, test in enumerate(self._tests):
+            tag = _status_tag(test)
+            self._row_tags.append(tag)
+            self._tree.insert(
+                "",
+                "end",
+                iid=str(i),
+                text=test.moniker,
+                values=(
+                    _checked if test.get_run_status else _unchecked,
+                    _criteria_string(test),
+                    test.description,
+                    _output_string(test),
+                ),
+                tags=(tag,),
+            )
 
         self._complete_label = Label(
             self, text="-", anchor="center", justify="center")
         if vertical:
-            self._complete_label.grid(row=2, column=0, sticky="news")
+            self._complete_label.grid(row=1, column=0, sticky="news")
         else:
-            self._complete_label.grid(row=0, column=3, sticky="news")
+            self._complete_label.grid(row=0, column=2, sticky="news")
         self._complete_label.config(
             relief=_relief, padx=_label_padding, pady=_label_padding
         )
 
-        self._update()
-
-    # function to select/deselect all checkboxes
-    def _updateAllStates(self):
-        #make sure test sequence isn't running
-        if ("complete / ready" in self._sequence._state or "aborted / ready" in self._sequence._state):
-            # check to see if all the checkboxes are selected or not; default they are
-            allRun = True
-            # look through all checkbuttons; if one is off, then they are not all on
-            for checkbutton in self._test_status_checkbox:
-                if checkbutton._value.get() == 0:
-                    allRun = False
-                    break
-            # if they're all on, deselect all
-            if allRun == True:
-                for checkbutton in self._test_status_checkbox:
-                    checkbutton._value.set(0)
-                    checkbutton._test.set_run_status(False)
-            # otherwise select all
-            else:
-                for checkbutton in self._test_status_checkbox:
-                    checkbutton._value.set(1)
-                    checkbutton._test.set_run_status(True)
-        
-    #will reset checkbuttons if the state of the sequence is completed and read or aborted and ready
-    def _resetAllStates(self):
-        if (self._sequence._state == "complete / ready" or self._sequence._state == "aborted / ready"):
-            for checkbutton in self._test_status_checkbox:
-                checkbutton._value.set(1)
-                checkbutton._test.set_run_status(True)
-                checkbutton.config(state=NORMAL)
-
-    def _update(self):
-        if self._sequence.in_progress:
-            self._complete_label.config(
-                text="in progress", background=_light_yellow)
-        elif self._sequence.is_aborted:
-            self._complete_label.config(text="aborted", background=_light_red)
-        elif self._sequence.is_passing:
-            self._complete_label.config(text="pass", background=_light_green)
-        else:
-            self._complete_label.config(text="fail", background=_light_red)
+        # the sequence pushes changes onto the queue from its own thread;
+        # a single timer drains it and redraws only what changed
+        self._events = SimpleQueue()
+        self._sequence.subscribe(self._on_event)
 
-        self.after(100, self._update)
-
-
-class _TestCheck(Checkbutton):
-    """
-    Class for creating checkboxes beside tests; create check boxes, place them on grid in class above, add to another list sequence to be run;
-    can check for tests to be run at time of start button (command=). When button pressed, make the check boxes unclickable (state=DISABLED)
-    """
-
-    def __init__(self, parent, _sequence, test: Test, loglevel=logging.INFO):
-        self._logger = logging.getLogger(self.__class__.__name__)
-        self._logger.setLevel(loglevel)
-
-        self._parent = parent
-        super().__init__(self._parent, command=self._updateState)
-
-        self._value = IntVar(parent)
-        self.config(variable=self._value)
-
-        self._seq = _sequence
-        self._test = test
-        self._value.set(1)
         self._update()
+        self._pump()
 
-    def _updateState(self):
-        if self._test.get_run_status == True:
-            self._test.set_run_status(False)
-            self._value.set(0)
-        else:
-            self._test.set_run_status(True)
-            self._value.set(1)
-
-    def _update(self):
-        #receive or check status of program; if waiting, leave checkbox; if tests start, grey out checkbox
-        if self._seq.in_progress:
-            self.config(state=DISABLED)
+    def destroy(self):
+        self._sequence.unsubscribe(self._on_event)
+        super().destroy()
 
-        self.after(100, self._update)
+    def _on_event(self, kind, subject):
+        self._events.put((kind, subject))
 
-class _TestDesc(Label):
-    """
-    Single label for the description of the tests
-    """
-    def __init__(self, parent, test: Test, loglevel = logging.INFO):
-        self._logger = logging.getLogger(self.__class__.__name__)
-        self._logger.setLevel(loglevel)
+    def _pump(self):
+        """
+        Redraws the rows affected by the events published since the \
+        last time the queue was drained.
 
-        self._parent = parent
-        super().__init__(self._parent)
+        :return: None
+        """
+        state_changed = False
+        changed_tests = set()
+        while True:
+            try:
+                kind, subject = self._events.get_nowait()
+            except Empty:
+                break
+            if kind == "state":
+                state_changed = True
+            else:
+                changed_tests.add(subject)
 
-        self._test = test
-        
-        self._label_text = f"{self._test.description}"
+        refilter = False
+        for i in changed_tests:
+            refilter |= self._update_row(i)
 
-        self.config(
-            text=self._label_text,
-            relief=_relief,
-            padx=_label_padding,
-            pady=_label_padding,
-        )
+        if refilter:
+            self._apply_filter()
 
-class _TestLabel(Label):
+        if state_changed:
+            self._update()
 
-    """
-    A single instance of a test label frame.
-    """
+        self.after(_pump_interval, self._pump)
 
-    def __init__(self, parent, test: Test, loglevel=logging.INFO):
-        self._logger = logging.getLogger(self.__class__.__name__)
-        self._logger.setLevel(loglevel)
-
-        self._parent = parent
-        super().__init__(self._parent)
+    def _update_row(self, i):
+        """
+        Redraws a single test row.
 
-        self._test = test
-
-        criteria = self._test.criteria
-        criteria_list = []
-        criteria_string = ""
-        if criteria is not None:
-            for condition, value in criteria.items():
-                if (
-                    isinstance(value, bool)
-                    or isinstance(value, int)
-                    or isinstance(value, str)
-                ):
-                    cs = f"{condition}={value}"
-                else:
-                    cs = f"{condition}={value}"
-                criteria_list.append(cs)
-            criteria_string = ",".join(criteria_list)
-
-        self._label_text = f"{self._test.moniker}"
-        if criteria_string:
-            self._label_text += f"\n{criteria_string}"
-
-        self.config(
-            text=self._label_text,
-            relief=_relief,
-            padx=_label_padding,
-            pady=_label_padding,
+        :param i: the index of the test
+        :return: True if the row should now be shown or hidden by the filter
+        """
+        test = self._tests[i]
+        tag = _status_tag(test)
+        self._row_tags[i] = tag
+        self._tree.item(
+            str(i),
+            values=(
+                _checked if test.get_run_status else _unchecked,
+                _criteria_string(test),
+                test.description,
+                _output_string(test),
+            ),
+            tags=(tag,),
         )
 
-        self._label_bg_color = self.cget("background")
+        return self._is_visible(i) == (i in self._hidden)
 
-        self._update()
+    def _is_visible(self, i):
+        shown = _filters[self._status_filter.get()]
+        if shown is not None and self._row_tags[i] not in shown:
+            return False
 
-    def _update(self):
+        search = self._search.get().strip().lower()
+        return not search or search in self._tests[i].moniker.lower()
+
+    def _apply_filter(self):
         """
-        Updates the test label display based on the status of the Test
+        Shows only the rows matching the status filter and search text, \
+        in sequence order.
 
         :return: None
         """
-        color = self._label_bg_color
-
-        if self._test.status == "waiting":
-            color = self._label_bg_color
-        elif self._test.status == "running":
-            color = _light_yellow
-        elif self._test.status == "aborted":
-            color = _light_red
-        elif not self._test.is_passing:
-            color = _light_red
-        elif self._test.is_passing:
-            color = _light_green
-
-        self.config(background=color,)
+        position = 0
+        for i in range(len(self._tests)):
+            if self._is_visible(i):
+                self._tree.move(str(i), "", position)
+                self._hidden.discard(i)
+                position += 1
+            elif i not in self._hidden:
+                self._tree.detach(str(i))
+                self._hidden.add(i)
+
+    def _on_click(self, event):
+        # toggles the run status when the "Run" column is clicked
+        if self._tree.identify_column(event.x) != "#1":
+            return
+        row = self._tree.identify_row(event.y)
+        if not row or self._sequence.in_progress:
+            return
+
+        test = self._tests[int(row)]
+        test.set_run_status(not test.get_run_status)
+        self._update_row(int(row))
+
+    def _on_double_click(self, event):
+        # shows the full response of the test in its own window
+        row = self._tree.identify_row(event.y)
+        if not row:
+            return
+
+        test = self._tests[int(row)]
+        window = Toplevel(self)
+        window.title(test.moniker)
+        text = Text(window, wrap="none")
+        text.insert("1.0", str(getattr(test, "got_resp", "")))
+        text.config(state=DISABLED)
+        text.pack(fill="both", expand=True)
+
+    # function to select/deselect all tests
+    def _updateAllStates(self):
+        #make sure test sequence isn't running
+        if self._sequence.state in (SequenceState.COMPLETE, SequenceState.ABORTED):
+            # if they're all on, deselect all; otherwise select all
+            allRun = all(test.get_run_status for test in self._tests)
+            for i, test in enumerate(self._tests):
+                test.set_run_status(not allRun)
+                self._update_row(i)
+
+    #will reset all tests to run if the state of the sequence is completed and ready or aborted and ready
+    def _resetAllStates(self):
+        if self._sequence.state in (SequenceState.COMPLETE, SequenceState.ABORTED):
+            for i, test in enumerate(self._tests):
+                test.set_run_status(True)
+                self._update_row(i)
 
-        self.after(100, self._update)
+    def _update(self):
+        if self._sequence.in_progress:
+            self._complete_label.config(
+                text="in progress", background=_light_yellow)
+        elif self._sequence.is_aborted:
+            self._complete_label.config(text="aborted", background=_light_red)
+        elif self._sequence.is_passing:
+            self._complete_label.config(text="pass", background=_light_green)
+        else:
+            self._complete_label.config(text="fail", background=_light_red)
 
 
-class _TestOutput(Label):
+def _status_tag(test: Test):
     """
-    Single label for the description of the tests
+    Returns the row tag matching the status of the Test
     """
-    def __init__(self, parent, test: Test, loglevel = logging.INFO):
-        self._logger = logging.getLogger(self.__class__.__name__)
-        self._logger.setLevel(loglevel)
-
-        self._parent = parent
-        super().__init__(self._parent)
-
-        self._test = test
-
-        self.config(text = "output")
-
-        self.config(
-            relief=_relief,
-            padx=_label_padding,
-            pady=_label_padding,
-        )
-
-        self._update()
-    
-    def _update(self):
-        """
-        Updates the label based on the status of the Test
-        """
-
-        if (self._test.status == "complete"):
-            self.config(text = str(self._test.got_resp))
-        
-        self.after(100, self._update)
\ No newline at end of file
+    if test.status == "waiting":
+        return "waiting"
+    elif test.status == "running":
+        return "running"
+    elif test.status == "aborted":
+        return "aborted"
+    elif test.status == "skipped":
+        return "skipped"
+    elif not test.is_passing:
+        return "fail"
+    return "pass"
+
+
+def _criteria_string(test: Test):
+    criteria = test.criteria
+    if criteria is None:
+        return ""
+    return ",".join(f"{condition}={value}" for condition, value in criteria.items())
+
+
+def _output_string(test: Test):
+    # the first line of the response, shortened to fit the column
+    if test.status != "complete":
+        return ""
+    output = str(getattr(test, "got_resp", "")).strip().split("\n", 1)[0]
+    if len(output) > _output_width:
+        output = output[:_output_width - 1] + "…"
+    return output
@@ -0,0 +1,182 @@
+"""
+   asyncio counterpart of SerialConnection
+   lets one event loop drive many serial devices without a thread per port
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+import asyncio
+import logging
+import sys
+from time import perf_counter
+
+import serial
+import serial.tools.list_ports
+
+from py.capture import RX, TX
+from py.serial_connection import _compile_terminator, _encode, _frame_end
+
+
+class AsyncSerialConnection():
+    """
+    Opens the serial device non-blocking and collects incoming bytes from the event loop
+    On POSIX the port's file descriptor is watched with `loop.add_reader()`; elsewhere the port is polled
+
+    :param port: the device path to open, e.g. `/dev/ttyUSB3`
+    :param terminator: marks the end of a response; a `str`, `bytes` or compiled regex; if \
+    neither this nor `expected_bytes` is given, responses are read until the deadline passes
+    :param expected_bytes: return as soon as this many bytes have arrived
+    :param deadline: the maximum number of seconds to wait for a response
+    :param poll: polling interval, in seconds, where the file descriptor can't be watched
+    :param capture: a `CaptureWriter` (see py/capture.py) to record every chunk sent and received to
+    """
+
+    def __init__(self, port, terminator=None, expected_bytes=None, deadline=1.0, poll=0.005, capture=None):
+        self.port = port
+        self.capture = capture
+        self._terminator = _compile_terminator(terminator)
+        self._expected_bytes = expected_bytes
+        self._deadline = deadline
+        self._poll = poll
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._rx_buffer = bytearray()
+        self._rx_event = None
+        self._lock = None
+        self._loop = None
+        self._poller = None
+
+        self.devPid = None
+        self.devMan = None
+        for a in serial.tools.list_ports.comports(True):
+            if a.device == port:
+                self.devPid = a.pid
+                self.devMan = a.manufacturer
+                break
+
+        self.ser = None
+        # seconds from the start of the last sendRec() to the write completing, the first byte and the full response
+        self.last_timing = {}
+        self._first_byte = None
+
+    async def open(self):
+        """
+        opens the port and returns the banner the device prints on connection
+        """
+        self._loop = asyncio.get_running_loop()
+        self._rx_event = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+        self.ser = serial.Serial(port=self.port, baudrate=115200, timeout=0)
+
+        if sys.platform != "win32":
+            self._loop.add_reader(self.ser.fileno(), self._on_readable)
+        else:
+            self._poller = self._loop.create_task(self._poll_port())
+
+        await asyncio.sleep(self._deadline)
+        banner = bytes(self._rx_buffer).decode()
+        self._rx_buffer.clear()
+        print(banner)
+        return banner
+
+    #getter for the device PID
+    def getPID(self):
+        return str(self.devPid)
+
+    #getter fromt the device manufacturer
+    def getManufacturer(self):
+        return self.devMan
+
+    async def sendRec(self, userIn, terminator=None, expected_bytes=None, deadline=None):
+        """
+        writes the command to the serial device and waits for the framed response without blocking the event loop
+        commands on the same connection are serialized, so concurrent callers can share it safely
+        """
+        match = self._terminator if terminator is None else _compile_terminator(terminator)
+        if expected_bytes is None:
+            expected_bytes = self._expected_bytes
+        if deadline is None:
+            deadline = self._deadline
+
+        async with self._lock:
+            start = perf_counter()
+            self._first_byte = None
+            data = _encode(userIn)
+            self.ser.write(data)
+            written = perf_counter()
+            if self.capture is not None:
+                self.capture.record(TX, data)
+            read = (await self._read_framed(match, expected_bytes, deadline)).decode()
+            self.last_timing = {
+                "write": written - start,
+                "first_byte": None if self._first_byte is None else self._first_byte - start,
+                "response": perf_counter() - start,
+            }
+
+        self._logger.debug("response: %r", read)
+        return read
+
+    async def _read_framed(self, match, expected_bytes, deadline):
+        """
+        waits until the terminator or the expected number of bytes has arrived
+        anything received after the end of the frame is kept for the next read
+        if the deadline passes first, whatever was received is returned
+        """
+        end_time = self._loop.time() + deadline
+        framed = match is not None or expected_bytes is not None
+        if self._rx_buffer:
+            self._first_byte = perf_counter()
+
+        while True:
+            if framed:
+                end = _frame_end(self._rx_buffer, match, expected_bytes)
+                if end is not None:
+                    frame = bytes(self._rx_buffer[:end])
+                    del self._rx_buffer[:end]
+                    return frame
+
+            remaining = end_time - self._loop.time()
+            if remaining <= 0:
+                break
+
+            self._rx_event.clear()
+            try:
+                await asyncio.wait_for(self._rx_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+        if framed:
+            self._logger.warning("no terminator received within %.3fs", deadline)
+        frame = bytes(self._rx_buffer)
+        self._rx_buffer.clear()
+        return frame
+
+    def _on_readable(self):
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if data:
+            if self._first_byte is None:
+                self._first_byte = perf_counter()
+            if self.capture is not None:
+                self.capture.record(RX, data)
+            self._rx_buffer += data
+            self._rx_event.set()
+
+    async def _poll_port(self):
+        while True:
+            if self.ser.in_waiting:
+                self._on_readable()
+            await asyncio.sleep(self._poll)
+
+    def close(self):
+        """
+        stops watching the port and closes it
+        """
+        if self.ser is None:
+            return
+        if self._poller is not None:
+            self._poller.cancel()
+        elif self._loop is not None:
+            self._loop.remove_reader(self.ser.fileno())
+        self.ser.close()
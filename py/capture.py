@@ -0,0 +1,256 @@
+"""
+   Records every chunk of bytes sent to and received from a device, with its
+   monotonic timestamp, to one append-only binary file per run
+   a small index beside each file locates the exchange of each test, so it
+   can be read back through a memory map without scanning the capture
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+import json
+import mmap
+import os
+from queue import Empty, SimpleQueue
+import struct
+from threading import Thread
+from time import monotonic
+
+# what a chunk of bytes was
+TX = 0
+RX = 1
+
+# each capture file starts with this
+MAGIC = b"MATSCAP1"
+
+# every record: monotonic timestamp, direction and length, then the bytes themselves
+RECORD = struct.Struct("<dBI")
+
+_BEGIN, _END_RUN, _START, _STOP, _DATA, _CLOSE = range(6)
+
+
+class CaptureWriter():
+    """
+    Writes captures from a background thread, so that recording a chunk only costs the
+    test thread a timestamp and a queue put
+
+    each run is written to `<directory>/<run_id>.cap`; when the run ends its index
+    (run id, device, and for each test moniker the start and end offsets and the verdict)
+    is written to `<directory>/<run_id>.idx` as JSON
+
+    :param directory: where to write the captures; created if missing
+    :param flush_interval: the most seconds a record waits in memory before reaching the file
+    :param buffer_size: bytes buffered before they are written out
+    """
+
+    def __init__(self, directory="captures", flush_interval=0.1, buffer_size=64 * 1024):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._flush_interval = flush_interval
+        self._buffer_size = buffer_size
+        self._queue = SimpleQueue()
+
+        self._file = None
+        self._index = None
+
+        self._thread = Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def record(self, direction, data):
+        """
+        records a chunk sent (TX) or received (RX) during the current run
+        """
+        if data:
+            self._queue.put((_DATA, monotonic(), direction, bytes(data)))
+
+    def begin_run(self, run_id, device=None):
+        """
+        starts a new capture file; any run still open is ended first
+
+        :param run_id: names the files of the run
+        :param device: `dict` describing the device under test, stored in the index
+        """
+        self._queue.put((_BEGIN, run_id, device))
+
+    def start_test(self, moniker):
+        """
+        marks where the exchange of a test begins
+        """
+        self._queue.put((_START, moniker, monotonic()))
+
+    def end_test(self, moniker, verdict=None):
+        """
+        marks where the exchange of a test ends, with its verdict (True, False or None)
+        """
+        self._queue.put((_STOP, moniker, verdict))
+
+    def end_run(self, verdict=None):
+        """
+        closes the capture file of the run and writes its index
+
+        :param verdict: the verdict of the run as a whole
+        """
+        self._queue.put((_END_RUN, verdict))
+
+    def close(self):
+        """
+        ends the open run and waits for everything recorded to be written
+        """
+        self._queue.put((_CLOSE,))
+        self._thread.join()
+
+    def _write(self):
+        buffer = bytearray()
+        offset = 0
+
+        while True:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except Empty:
+                item = None
+
+            kind = None if item is None else item[0]
+
+            if kind == _DATA and self._file is not None:
+                _, timestamp, direction, data = item
+                buffer += RECORD.pack(timestamp, direction, len(data))
+                buffer += data
+                offset += RECORD.size + len(data)
+            elif kind == _START and self._index is not None:
+                _, moniker, timestamp = item
+                self._index["tests"][moniker] = {"start": offset, "end": None, "time": timestamp, "pass": None}
+            elif kind == _STOP and self._index is not None:
+                _, moniker, verdict = item
+                test = self._index["tests"].get(moniker)
+                if test is not None:
+                    test["end"] = offset
+                    test["pass"] = verdict
+
+            # nothing new for a while, too much buffered, or the file is about to change
+            if buffer and (item is None or len(buffer) >= self._buffer_size or kind in (_BEGIN, _END_RUN, _CLOSE)):
+                self._file.write(buffer)
+                self._file.flush()
+                buffer.clear()
+
+            if kind in (_BEGIN, _END_RUN, _CLOSE):
+                self._finish_run(None if kind != _END_RUN else item[1], offset)
+
+            if kind == _BEGIN:
+                _, run_id, device = item
+                self._file = open(os.path.join(self.directory, f"{run_id}.cap"), "wb")
+                self._file.write(MAGIC)
+                offset = len(MAGIC)
+                self._index = {"run_id": run_id, "device": device, "pass": None, "tests": {}}
+            elif kind == _CLOSE:
+                return
+
+    def _finish_run(self, verdict, offset):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        self._index["pass"] = verdict
+        self._index["size"] = offset
+        for test in self._index["tests"].values():
+            if test["end"] is None:
+                test["end"] = offset
+
+        path = os.path.join(self.directory, f"{self._index['run_id']}.idx")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._index, f)
+        os.replace(path + ".tmp", path)
+        self._index = None
+
+
+class CaptureReader():
+    """
+    Reads back one run written by CaptureWriter, through a memory map
+
+    :param path: the `.cap` file, or the run's `.idx` file
+    """
+
+    def __init__(self, path):
+        base = os.path.splitext(path)[0]
+        with open(base + ".idx") as f:
+            self.index = json.load(f)
+
+        self._file = open(base + ".cap", "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # an empty file can't be mapped
+            self._map = b""
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(base + ".cap is not a capture file")
+
+    @property
+    def run_id(self):
+        return self.index["run_id"]
+
+    @property
+    def device(self):
+        return self.index["device"]
+
+    @property
+    def monikers(self):
+        """
+        the monikers of the tests in the run, in the order they started
+        """
+        return list(self.index["tests"])
+
+    def records(self, moniker=None):
+        """
+        yields (timestamp, direction, data) for every record of the run, or of one test
+        """
+        if moniker is None:
+            start, end = len(MAGIC), len(self._map)
+        else:
+            test = self.index["tests"][moniker]
+            start, end = test["start"], test["end"]
+
+        position = start
+        while position + RECORD.size <= end:
+            timestamp, direction, length = RECORD.unpack_from(self._map, position)
+            position += RECORD.size
+            yield timestamp, direction, bytes(self._map[position:position + length])
+            position += length
+
+    def exchange(self, moniker):
+        """
+        returns everything sent and everything received during a test, as (tx, rx) bytes
+        """
+        sent = bytearray()
+        received = bytearray()
+        for _, direction, data in self.records(moniker):
+            (sent if direction == TX else received).extend(data)
+        return bytes(sent), bytes(received)
+
+    def verdict(self, moniker=None):
+        """
+        the verdict recorded for a test, or for the run
+        """
+        if moniker is None:
+            return self.index["pass"]
+        return self.index["tests"][moniker]["pass"]
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def find_runs(directory="captures"):
+    """
+    returns the paths of the indexes of every complete run captured in the directory, oldest first
+    """
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".idx")]
+    return sorted(paths, key=os.path.getmtime)
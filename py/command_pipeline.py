@@ -0,0 +1,135 @@
+"""
+   Keeps several commands in flight on one serial connection
+   and hands each framed response back to the command that caused it
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+from collections import deque
+from concurrent.futures import Future, wait
+import logging
+from threading import Lock, Thread
+from time import monotonic, perf_counter
+
+from py.capture import RX, TX
+from py.serial_connection import _encode, _frame_end
+
+
+class CommandPipeline():
+    """
+    Writes commands to a SerialConnection without waiting for the previous response
+    A reader thread splits the incoming stream on the connection terminator and resolves the
+    oldest outstanding command with each frame, so the device must answer commands in the order they were sent
+
+    :param connection: the SerialConnection to pipeline; it must have a terminator or expected_bytes set
+    :param deadline: the maximum number of seconds to wait for each response, defaults to the connection deadline
+    :param poll: how often, in seconds, the reader thread checks for responses that missed their deadline
+    """
+
+    def __init__(self, connection, deadline=None, poll=0.05):
+        if connection._terminator is None and connection._expected_bytes is None:
+            raise ValueError("pipelining requires a terminator or expected_bytes to split responses on")
+
+        self._conn = connection
+        self._deadline = connection._deadline if deadline is None else deadline
+        self._poll = poll
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._lock = Lock()
+        self._pending = deque()
+        self._head_since = None
+        self._running = True
+
+        self._saved_timeout = self._conn.ser.timeout
+        self._conn.ser.timeout = self._poll
+
+        self._reader = Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    @property
+    def in_flight(self):
+        """
+        the number of commands written that have not been answered yet
+        """
+        return len(self._pending)
+
+    def submit(self, userIn):
+        """
+        writes the command to the serial device and returns a `Future` that resolves to the decoded response
+        its `timing` holds the seconds from the submission to the write completing, the first byte and the full
+        response, as `SerialConnection.last_timing` does
+        """
+        future = Future()
+        with self._lock:
+            if not self._pending:
+                self._head_since = monotonic()
+            self._pending.append(future)
+            future.started = perf_counter()
+            data = _encode(userIn)
+            self._conn.ser.write(data)
+            if self._conn.capture is not None:
+                self._conn.capture.record(TX, data)
+            future.timing = {"write": perf_counter() - future.started}
+        return future
+
+    def close(self):
+        """
+        waits for the outstanding responses so they don't leak into the next read, then stops the reader thread
+        any bytes received past the last frame are handed back to the connection
+        """
+        with self._lock:
+            outstanding = list(self._pending)
+        wait(outstanding, timeout=self._deadline * (len(outstanding) + 1))
+
+        self._running = False
+        self._reader.join()
+        self._conn.ser.timeout = self._saved_timeout
+
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+
+    def _read_responses(self):
+        """
+        reader thread: collects bytes from the serial device and resolves one pending command per frame
+        """
+        buf = self._conn._rx_buffer
+        match = self._conn._terminator
+        expected_bytes = self._conn._expected_bytes
+
+        while self._running:
+            chunk = self._conn.ser.read(max(1, self._conn.ser.in_waiting))
+            received = perf_counter()
+            if chunk and self._conn.capture is not None:
+                self._conn.capture.record(RX, chunk)
+            buf += chunk
+
+            end = _frame_end(buf, match, expected_bytes)
+            while end is not None and self._pending:
+                self._resolve(bytes(buf[:end]), received)
+                del buf[:end]
+                end = _frame_end(buf, match, expected_bytes)
+
+            if buf:
+                # the start of the next response has arrived
+                with self._lock:
+                    if self._pending:
+                        future = self._pending[0]
+                        future.timing.setdefault("first_byte", received - future.started)
+
+            if self._pending and monotonic() - self._head_since > self._deadline:
+                self._logger.warning("no terminator received within %.3fs", self._deadline)
+                self._resolve(bytes(buf), received)
+                buf.clear()
+
+        self._conn._rx_buffer = buf
+
+    def _resolve(self, frame, received):
+        with self._lock:
+            future = self._pending.popleft()
+            self._head_since = monotonic()
+        # the response time of a pipelined command includes the time spent queued behind the others
+        future.timing.setdefault("first_byte", received - future.started if frame else None)
+        future.timing["response"] = perf_counter() - future.started
+        future.set_result(frame.decode())
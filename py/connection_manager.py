@@ -0,0 +1,250 @@
+"""
+   Keeps the serial connections to the attached devices open between runs
+   watches for devices being plugged in and unplugged and opens them ahead of time,
+   so that a ready connection can be handed out as soon as it is asked for
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+from itertools import count
+from threading import Condition, Thread
+from time import monotonic
+
+import serial.tools.list_ports
+
+from py.serial_connection import SerialConnection
+
+
+class DeviceRule():
+    """
+    Describes the devices to connect to; a field left as None matches anything
+
+    :param vid: the USB vendor ID
+    :param pid: the USB product ID
+    :param serial_number: the USB serial number, or a prefix of it ending in "*"
+    :param manufacturer: the USB manufacturer string
+    """
+
+    def __init__(self, vid=None, pid=None, serial_number=None, manufacturer=None):
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.manufacturer = manufacturer
+
+    def matches(self, port_info):
+        """
+        true if the pyserial `ListPortInfo` describes a device this rule accepts
+        """
+        if self.vid is not None and port_info.vid != self.vid:
+            return False
+        if self.pid is not None and port_info.pid != self.pid:
+            return False
+        if self.manufacturer is not None and port_info.manufacturer != self.manufacturer:
+            return False
+        if self.serial_number is not None:
+            found = port_info.serial_number or ''
+            if self.serial_number.endswith('*'):
+                return found.startswith(self.serial_number[:-1])
+            return found == self.serial_number
+        return True
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        builds a rule from a `dict` such as {"vid": "0x0403", "pid": 24577, "manufacturer": "FTDI"}
+        IDs may be given as numbers or as strings in any base Python accepts
+        """
+        ids = {key: int(config[key], 0) if isinstance(config.get(key), str) else config.get(key)
+               for key in ('vid', 'pid')}
+        return cls(serial_number=config.get('serial_number'), manufacturer=config.get('manufacturer'), **ids)
+
+
+# the test fixture, as SerialConnection looks for it
+FIXTURE_RULE = DeviceRule(pid=24577, manufacturer='FTDI')
+
+
+class ConnectionManager():
+    """
+    Opens a SerialConnection to every attached device matching the rules and keeps it open
+    A monitor thread polls the comports every `poll` seconds: connections to new devices are
+    opened (and their banner read) in the background, connections to unplugged devices are closed
+
+    :param rules: the DeviceRules to match devices against; the test fixture by default
+    :param connection_kwargs: keyword arguments for each SerialConnection, e.g. the terminator
+    :param poll: seconds between scans of the comports
+    :param on_attach: called with each new SerialConnection once it is ready
+    :param on_detach: called with the device path of each device unplugged
+    """
+
+    def __init__(self, rules=None, connection_kwargs=None, poll=1.0, on_attach=None, on_detach=None):
+        self._rules = list(rules) if rules is not None else [FIXTURE_RULE]
+        self._connection_kwargs = connection_kwargs or {}
+        self._poll = poll
+        self._on_attach = on_attach
+        self._on_detach = on_detach
+
+        self._changed = Condition()
+        self._connections = {}
+        self._in_use = set()
+        # when each port was last released, so that the free ports are handed out in turn
+        self._released = {}
+        self._releases = count(1)
+        self._failed = set()
+        self._running = False
+        self._monitor = None
+
+    def start(self):
+        """
+        scans once, then keeps watching for devices in the background
+        """
+        self.scan()
+        if self._monitor is None:
+            self._running = True
+            self._monitor = Thread(target=self._watch, daemon=True)
+            self._monitor.start()
+        return self
+
+    def _watch(self):
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: not self._running, self._poll)
+                if not self._running:
+                    return
+            try:
+                self.scan()
+            except Exception as e:
+                print("CONNECTION MANAGER: scan failed: " + str(e))
+
+    def scan(self):
+        """
+        compares the attached devices with the open connections, opening and closing connections to match
+        """
+        attached = {a.device: a for a in serial.tools.list_ports.comports(True)
+                    if any(rule.matches(a) for rule in self._rules)}
+
+        with self._changed:
+            gone = [port for port in self._connections if port not in attached]
+            new = [a for port, a in attached.items()
+                   if port not in self._connections and port not in self._failed]
+            # a device that failed to open is retried once it has been unplugged
+            self._failed &= set(attached)
+            removed = [self._connections.pop(port) for port in gone]
+            self._in_use -= set(gone)
+            for port in gone:
+                self._released.pop(port, None)
+
+        for ser in removed:
+            print("\nSERIAL: " + ser.port + " unplugged")
+            try:
+                ser.close()
+            except Exception:
+                pass
+            if self._on_detach is not None:
+                self._on_detach(ser.port)
+
+        for port_info in new:
+            self._attach(port_info)
+
+    def _attach(self, port_info):
+        try:
+            ser = SerialConnection(port_info=port_info, **self._connection_kwargs)
+        except Exception as e:
+            print("\nSERIAL ERROR: could not open " + port_info.device + ": " + str(e))
+            with self._changed:
+                self._failed.add(port_info.device)
+            return
+
+        print("\nSERIAL: " + port_info.device + " ready")
+        with self._changed:
+            self._connections[port_info.device] = ser
+            self._changed.notify_all()
+        if self._on_attach is not None:
+            self._on_attach(ser)
+
+    @property
+    def ports(self):
+        """
+        the device paths of the open connections
+        """
+        with self._changed:
+            return sorted(self._connections)
+
+    def is_attached(self, ser):
+        """
+        true if the connection is still open and its device still plugged in
+        """
+        with self._changed:
+            return self._connections.get(getattr(ser, 'port', None)) is ser
+
+    def acquire(self, port=None, timeout=None):
+        """
+        hands out a ready connection that isn't in use, waiting up to `timeout` seconds
+        (forever if None) for a matching device to be plugged in
+        the free connection released longest ago is chosen, so one just handed back (such as a faulty DUT)
+        is only handed out again once no other device is free
+
+        :param port: the device path wanted; any free device if not given
+        :return: the SerialConnection, or None if none became available in time
+        """
+        def free():
+            ports = [port] if port is not None else sorted(self._connections)
+            return [p for p in ports if p in self._connections and p not in self._in_use]
+
+        end_time = None if timeout is None else monotonic() + timeout
+        with self._changed:
+            while True:
+                if not free() and self._monitor is None:
+                    # nothing else will scan, so look for the device here
+                    self._changed.release()
+                    try:
+                        self.scan()
+                    finally:
+                        self._changed.acquire()
+                if free():
+                    break
+
+                remaining = None if end_time is None else end_time - monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if self._monitor is None:
+                    self._changed.wait(self._poll if remaining is None else min(self._poll, remaining))
+                else:
+                    self._changed.wait(remaining)
+
+            chosen = min(free(), key=lambda p: self._released.get(p, 0))
+            self._in_use.add(chosen)
+            return self._connections[chosen]
+
+    def release(self, ser):
+        """
+        returns a connection from acquire(), leaving it open for the next user
+        """
+        with self._changed:
+            port = getattr(ser, 'port', None)
+            if port in self._in_use:
+                self._in_use.discard(port)
+                self._released[port] = next(self._releases)
+            self._changed.notify_all()
+
+    def close(self):
+        """
+        stops watching and closes every connection
+        """
+        with self._changed:
+            self._running = False
+            self._changed.notify_all()
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._in_use.clear()
+            self._released.clear()
+
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+
+        for ser in connections:
+            try:
+                ser.close()
+            except Exception:
+                pass
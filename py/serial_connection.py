@@ -8,47 +8,135 @@
  """
 
 #!/usr/bin/env python3
+import logging
+import re
+from time import monotonic, perf_counter
+
 import serial
 import serial.tools.list_ports
 
+from py.capture import RX, TX
+
+# the port timeout while waiting for a framed response: how long a read blocks with nothing arriving, and
+# so the most a read can overrun the deadline by; set once, since changing it reconfigures the port
+_POLL = 0.05
+
 
 class SerialConnection():
     """
     Initialize a serial connection through searching for specific PID and MID 
     Prompt the user for input and write that input to the serial device
     Take the output from the command and parse it out and display to the user 
+
+    :param terminator: marks the end of a response; a `str`, `bytes` or \
+    compiled regex (e.g. the \\x03 terminator or the shell prompt); if \
+    neither this nor `expected_bytes` is given, responses are read until \
+    the port times out
+    :param expected_bytes: return as soon as this many bytes have arrived
+    :param deadline: the maximum number of seconds to wait for a response
+    :param port: the device path to open, e.g. `/dev/ttyUSB3`; if not \
+    given, the first matching device found is used
+    :raises serial.SerialException: if no device is found or the port \
+    can't be opened
+    :param transport: an already open `Transport` (see py/transport.py), \
+    such as a `SimulatedSerial`, to use instead of a serial port
+    :param port_info: the pyserial `ListPortInfo` of the device to open, \
+    when it is already known (see py/connection_manager.py); skips \
+    enumerating the comports again
+    :param capture: a `CaptureWriter` (see py/capture.py) to record every \
+    chunk sent and received to
     """
 
-    def __init__(self):
+    def __init__(self, terminator=None, expected_bytes=None, deadline=1.0, port=None, transport=None,
+                 port_info=None, capture=None):
         """
         Looks through the list of comports compares all items in the list to the desired PID and Manufacturer ID
         Then if a device match is found it assigns the variable dev to the device path
         It then checks if dev contains no device then it will spit out an error
         If no errors arise then will perform the set up of the serial connection using the dev variable
         """
+        self._terminator = _compile_terminator(terminator)
+        self._expected_bytes = expected_bytes
+        self._deadline = deadline
+        self._rx_buffer = bytearray()
+        self.capture = capture
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        # seconds from the start of the last sendRec() to the write completing, the first byte and the full response
+        self.last_timing = {}
+        self._first_byte = None
+
+        if transport is not None:
+            self.port = transport.port
+            self.devPid = transport.pid
+            self.devMan = transport.manufacturer
+            self.ser = transport
+            self.ser.timeout = self._deadline
+            print(self.ser.readall().decode())
+            self._set_poll_timeout()
+            return
 
         dev = ''
-        for a in serial.tools.list_ports.comports(True):
-            print(a.manufacturer)
-            print(a.pid)
-            if a.pid == 24577 and a.manufacturer == 'FTDI':
-                dev = a.device
-                self.devPid = a.pid
-                self.devMan = a.manufacturer
-                print(dev)
-                print("\nSERIAL: Found Sense at " + dev)
-                break
+        if port_info is not None:
+            dev = port_info.device
+            self.devPid = port_info.pid
+            self.devMan = port_info.manufacturer
+        elif port is not None:
+            # a port asked for by name is opened even if it isn't enumerated, such as a pty;
+            # if it doesn't exist, opening it raises
+            dev = port
+            self.devPid = None
+            self.devMan = None
+            for a in serial.tools.list_ports.comports(True):
+                if a.device == port:
+                    self.devPid = a.pid
+                    self.devMan = a.manufacturer
+                    break
+        else:
+            for a in serial.tools.list_ports.comports(True):
+                print(a.manufacturer)
+                print(a.pid)
+                if _is_fixture(a):
+                    dev = a.device
+                    self.devPid = a.pid
+                    self.devMan = a.manufacturer
+                    print(dev)
+                    print("\nSERIAL: Found Sense at " + dev)
+                    break
 
         if dev == '':
             print(
-                "\n\SERIAL ERROR: Could not locate scanner, is it plugged in? Exiting... \n\n")
-            exit()
-    
+                "\nSERIAL ERROR: Could not locate scanner, is it plugged in?\n\n")
+            raise serial.SerialException("could not locate scanner, is it plugged in?")
+
         else:
+            self.port = dev
             self.ser = serial.Serial(
-                port=dev, baudrate=115200, timeout=1)
+                port=dev, baudrate=115200, timeout=self._deadline)
             read = self.ser.readall().decode()
             print(read)
+            self._set_poll_timeout()
+
+    def _set_poll_timeout(self):
+        """
+        a connection which frames its responses polls the port rather than waiting out the deadline on each read;
+        one which doesn't keeps the deadline as its timeout, since it reads until the port times out
+        """
+        if self._terminator is not None or self._expected_bytes is not None:
+            self.ser.timeout = min(_POLL, self._deadline)
+
+    @staticmethod
+    def find_ports():
+        """
+        Returns the device paths of every attached device with the desired PID and Manufacturer ID
+        """
+        return [a.device for a in serial.tools.list_ports.comports(True) if _is_fixture(a)]
+
+    def close(self):
+        """
+        closes the serial port
+        """
+        self.ser.close()
 
     #getter for the device PID
     def getPID(self):
@@ -58,19 +146,89 @@ class SerialConnection():
     def getManufacturer(self):
         return self.devMan
 
-    def sendRec(self, userIn):
+    def sendRec(self, userIn, terminator=None, expected_bytes=None, deadline=None):
         """
         takes the user input received in the displayInfo() function and writes that input to the serial device 
         then takes that input and splits it on the provided terminator and will just print the outcome of the command that was provided 
 
+        the `terminator`, `expected_bytes` and `deadline` arguments override the connection defaults for this command only
+        the command may be a `str` or already encoded `bytes`
         """
-        self.ser.write(bytes(userIn, 'utf-8'))
+        match = self._terminator if terminator is None else _compile_terminator(terminator)
+        if expected_bytes is None:
+            expected_bytes = self._expected_bytes
+        if deadline is None:
+            deadline = self._deadline
+
+        start = perf_counter()
+        self._first_byte = None
+        data = _encode(userIn)
+        self.ser.write(data)
+        written = perf_counter()
+        if self.capture is not None:
+            self.capture.record(TX, data)
         # splits the output of the user submitted command on the \x03 terminator
         global read
-        read = self.ser.readall().decode()
-        print(read)
+        if match is None and expected_bytes is None:
+            received = self.ser.readall()
+            if self.capture is not None:
+                self.capture.record(RX, received)
+            read = received.decode()
+        else:
+            read = self._read_framed(match, expected_bytes, deadline).decode()
+        done = perf_counter()
+
+        self.last_timing = {
+            "write": written - start,
+            "first_byte": None if self._first_byte is None else self._first_byte - start,
+            "response": done - start,
+        }
+        self._logger.debug("response: %r", read)
         return read
 
+    def _read_framed(self, match, expected_bytes, deadline):
+        """
+        reads from the serial device until the terminator or the expected number of bytes has arrived
+        anything received after the end of the frame is kept for the next read
+        if the deadline passes first, whatever was received is returned
+        """
+        end_time = monotonic() + deadline
+        buf = self._rx_buffer
+        if buf:
+            self._first_byte = perf_counter()
+
+        # the port timeout is only shortened to keep the last read within the deadline, and put back afterwards
+        saved_timeout, shortened = None, False
+        try:
+            while True:
+                end = _frame_end(buf, match, expected_bytes)
+                if end is not None:
+                    frame = bytes(buf[:end])
+                    self._rx_buffer = buf[end:]
+                    return frame
+
+                remaining = end_time - monotonic()
+                if remaining <= 0:
+                    break
+                waiting = self.ser.in_waiting
+                if not waiting and (self.ser.timeout is None or self.ser.timeout > remaining):
+                    if not shortened:
+                        saved_timeout, shortened = self.ser.timeout, True
+                    self.ser.timeout = remaining
+                chunk = self.ser.read(max(1, waiting))
+                if chunk and self._first_byte is None:
+                    self._first_byte = perf_counter()
+                if chunk and self.capture is not None:
+                    self.capture.record(RX, chunk)
+                buf += chunk
+        finally:
+            if shortened:
+                self.ser.timeout = saved_timeout
+
+        self._logger.warning("no terminator received within %.3fs", deadline)
+        self._rx_buffer = bytearray()
+        return bytes(buf)
+
     def displayInfo(self):
         """
         Prompts the user for their command to send to the serial device 
@@ -88,6 +246,56 @@ class SerialConnection():
                 print("response: %s " % read)
 
 
+def _encode(userIn):
+    """
+    the bytes to write for a command; commands may be given already encoded, to save encoding them on every run
+    """
+    if isinstance(userIn, (bytes, bytearray)):
+        return userIn
+    return bytes(userIn, 'utf-8')
+
+
+def _is_fixture(port_info):
+    """
+    true if the comport is one of our fixtures
+    """
+    return port_info.pid == 24577 and port_info.manufacturer == 'FTDI'
+
+
+def _compile_terminator(terminator):
+    """
+    converts a terminator given as a `str`, `bytes` or regex into either `bytes` or a compiled `bytes` regex
+    """
+    if terminator is None or isinstance(terminator, bytes):
+        return terminator
+    if isinstance(terminator, str):
+        return terminator.encode('utf-8')
+    if isinstance(terminator, re.Pattern):
+        if isinstance(terminator.pattern, str):
+            return re.compile(terminator.pattern.encode('utf-8'), terminator.flags & ~re.UNICODE)
+        return terminator
+    raise TypeError("terminator must be str, bytes or a compiled regex, not %r" % type(terminator))
+
+
+def _frame_end(buf, match, expected_bytes):
+    """
+    returns the index just past the end of the first complete frame in `buf`, or `None` if there isn't one yet
+    """
+    if isinstance(match, bytes):
+        index = buf.find(match)
+        if index >= 0:
+            return index + len(match)
+    elif match is not None:
+        found = match.search(buf)
+        if found is not None:
+            return found.end()
+
+    if expected_bytes is not None and len(buf) >= expected_bytes:
+        return expected_bytes
+
+    return None
+
+
 if __name__ == "__main__":
     ser = SerialConnection()
     ser.displayInfo()
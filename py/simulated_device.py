@@ -0,0 +1,256 @@
+"""
+   Software stand-ins for the firmware in safeEnviroment/
+   lets the harness be exercised and benchmarked without a fixture
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+import os
+from queue import Empty, Queue
+import random
+from threading import Condition, Thread
+from time import monotonic, sleep
+
+from py.transport import Transport
+
+# what the sketches in safeEnviroment/ print on start up
+POSIX_SHELL_BANNER = ("SIMPLY EMBEDDED POSIX SHELL\n"
+                      "Try help to view available commands")
+
+RUN_SCRIPT_BANNER = ("Sense Tech Lanyard Application v2.1.0 "
+                     "SDK Version: SIM-NONE "
+                     "FreeRTOS Version: V10.3.1 "
+                     "LVGL Version: 7.9.0 "
+                     "LWIP Version: 2.2.0d "
+                     "MBED TLS Version: 2.16.6 "
+                     "CRYPTOAUTHLIB Version: 3.3.2 "
+                     "Bootargs: 2"
+                     "Initializing Watchdog "
+                     "Serial number: 0000-0101-00000000 "
+                     "IOT hubname: IOTHub-clrjgnjed5mjk.azure-devices.net "
+                     "Profile ID: 0 ")
+
+RUN_SCRIPT_TEST_LIST = ("UNIT TEST LIST\n"
+                        "Test 1: sec_element_init\n"
+                        "Test 2: sec_element_random_num_gen_test\n"
+                        "Test 3: json_decode_id_unit_test\n"
+                        "Test 4: json_decode_nested_object_test\n"
+                        "Test 5: json_encode_decode_string_property\n"
+                        "Test 6: json_encode_decode_int_property\n"
+                        "Test 7: json_encode_decode_multiple_properties\n"
+                        "Test 8: json_encode_decode_object\n"
+                        "Test 9: All Tests")
+
+
+def posix_shell(command):
+    """
+    posixShellEmulation.ino: echoes whatever follows "echo"
+    """
+    if command[:4] == "echo":
+        return command[5:]
+    return ""
+
+
+def run_script(command):
+    """
+    runScript.ino: prints the unit test list on "--tests"
+    """
+    if command == "--tests":
+        return RUN_SCRIPT_TEST_LIST
+    if command == "--exit":
+        return "closing port"
+    return ""
+
+
+PROFILES = {
+    "posix_shell": (POSIX_SHELL_BANNER, posix_shell),
+    "run_script": (RUN_SCRIPT_BANNER, run_script),
+}
+
+
+class SimulatedDevice():
+    """
+    Emulates the firmware on the other end of the serial link, including the wire
+    Like the sketches, a command is whatever arrives before the line goes quiet for `command_gap` seconds
+
+    :param profile: "posix_shell", "run_script", or a function taking the command and returning the response
+    :param banner: what to print on start up; defaults to the banner of the profile
+    :param latency: seconds between receiving a command and starting to answer
+    :param jitter: up to this many seconds are randomly added to or taken from the latency
+    :param baudrate: if given, responses are delivered no faster than this line rate (10 bits per byte)
+    :param drop_rate: the probability that any one byte of a response is lost
+    :param terminator: appended to every response, so that responses can be framed
+    :param command_terminator: if given, commands are split on it instead of on idle gaps
+    :param command_gap: seconds of silence that end a command
+    :param seed: seeds the random number generator, for reproducible jitter and drops
+    """
+
+    def __init__(self, profile="posix_shell", banner=None, latency=0.0, jitter=0.0, baudrate=None,
+                 drop_rate=0.0, terminator="", command_terminator=None, command_gap=0.003, seed=None):
+        if callable(profile):
+            self._banner, self._handle = "", profile
+        else:
+            self._banner, self._handle = PROFILES[profile]
+        if banner is not None:
+            self._banner = banner
+
+        self._latency = latency
+        self._jitter = jitter
+        self._baudrate = baudrate
+        self._drop_rate = drop_rate
+        self._terminator = terminator
+        self._command_terminator = command_terminator
+        self._command_gap = command_gap
+        self._random = random.Random(seed)
+
+        self._input = Queue()
+        self._output = None
+        self.commands = 0
+
+    def start(self, output):
+        """
+        powers the device up: prints the banner to `output` and starts answering commands
+        `output` is called with each chunk of bytes the device sends
+        """
+        self._output = output
+        self._send(self._banner.encode('utf-8'))
+        Thread(target=self._run, daemon=True).start()
+
+    def receive(self, data):
+        """
+        bytes arriving from the host
+        """
+        self._input.put(data)
+
+    def _run(self):
+        pending = bytearray()
+        while True:
+            if self._command_terminator is None:
+                pending += self._input.get()
+                # collect until the line goes quiet, as Serial.readString() does
+                while True:
+                    try:
+                        pending += self._input.get(timeout=self._command_gap)
+                    except Empty:
+                        break
+                commands = [bytes(pending)]
+                pending.clear()
+            else:
+                pending += self._input.get()
+                separator = self._command_terminator.encode('utf-8')
+                *commands, rest = bytes(pending).split(separator)
+                pending[:] = rest
+
+            for command in commands:
+                self._answer(command.decode('utf-8', 'replace'))
+
+    def _answer(self, command):
+        self.commands += 1
+        delay = self._latency + self._random.uniform(-self._jitter, self._jitter)
+        if delay > 0:
+            sleep(delay)
+
+        response = (self._handle(command) + self._terminator).encode('utf-8')
+        if self._drop_rate:
+            response = bytes(b for b in response if self._random.random() >= self._drop_rate)
+        self._send(response)
+
+    def _send(self, data):
+        if not data:
+            return
+        if self._baudrate is None:
+            self._output(data)
+            return
+
+        # trickle the response out at the line rate
+        chunk = 16
+        for start in range(0, len(data), chunk):
+            piece = data[start:start + chunk]
+            sleep(len(piece) * 10 / self._baudrate)
+            self._output(piece)
+
+
+class SimulatedSerial(Transport):
+    """
+    An in-memory Transport connected to a SimulatedDevice, usable anywhere a pyserial port is
+
+    :param device: the SimulatedDevice to talk to; a posix shell by default
+    :param timeout: the read timeout in seconds, as for pyserial
+    :param port: the name reported for the port
+    """
+
+    pid = 24577
+    manufacturer = 'FTDI'
+
+    def __init__(self, device=None, timeout=1.0, port="sim://0"):
+        super().__init__(timeout)
+        self.port = port
+        self.device = device if device is not None else SimulatedDevice()
+
+        self._rx = bytearray()
+        self._rx_ready = Condition()
+        self.is_open = True
+        self.device.start(self._deliver)
+
+    def _deliver(self, data):
+        with self._rx_ready:
+            self._rx += data
+            self._rx_ready.notify_all()
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def write(self, data):
+        self.device.receive(bytes(data))
+        return len(data)
+
+    def read(self, size=1):
+        end_time = None if self._timeout is None else monotonic() + self._timeout
+        with self._rx_ready:
+            while len(self._rx) < size:
+                remaining = None if end_time is None else end_time - monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._rx_ready.wait(remaining)
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+        return data
+
+    def reset_input_buffer(self):
+        with self._rx_ready:
+            self._rx.clear()
+
+    def close(self):
+        self.is_open = False
+
+
+def serve_pty(device=None):
+    """
+    Connects a SimulatedDevice to a pseudo-terminal, so that anything which opens
+    a real serial port (pyserial, AsyncSerialConnection) can talk to it; POSIX only
+
+    :param device: the SimulatedDevice to serve; a posix shell by default
+    :return: the device path of the pseudo-terminal to open
+    """
+    import tty
+
+    device = device if device is not None else SimulatedDevice()
+    master, slave = os.openpty()
+    tty.setraw(slave)
+
+    def forward():
+        while True:
+            try:
+                data = os.read(master, 4096)
+            except OSError:
+                return
+            device.receive(data)
+
+    device.start(lambda data: os.write(master, data))
+    Thread(target=forward, daemon=True).start()
+
+    # keep the slave open so the master doesn't see a hang-up between connections
+    device._slave = slave
+    return os.ttyname(slave)
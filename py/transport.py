@@ -0,0 +1,67 @@
+"""
+   The interface SerialConnection expects from the object it talks through
+   pyserial's Serial already provides it; other backends subclass Transport
+
+  Copyright (c) 2022 Simply Embedded Inc.
+  All Rights Reserved.
+ """
+
+
+class Transport():
+    """
+    A byte stream to a device with pyserial's read semantics
+    `read()` waits up to `timeout` seconds for `size` bytes and returns whatever has arrived by then
+
+    the attributes `port`, `pid` and `manufacturer` describe the device, where known
+    """
+
+    port = None
+    pid = None
+    manufacturer = None
+
+    def __init__(self, timeout=1.0):
+        self._timeout = timeout
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout
+
+    @property
+    def in_waiting(self):
+        """
+        the number of bytes that can be read without waiting
+        """
+        raise NotImplementedError
+
+    def write(self, data):
+        """
+        sends the bytes to the device and returns how many were sent
+        """
+        raise NotImplementedError
+
+    def read(self, size=1):
+        """
+        returns up to `size` bytes, waiting at most `timeout` seconds for them
+        """
+        raise NotImplementedError
+
+    def readall(self):
+        """
+        reads until nothing more arrives within `timeout` seconds
+        """
+        data = bytearray()
+        while True:
+            chunk = self.read(max(1, self.in_waiting))
+            if not chunk:
+                return bytes(data)
+            data += chunk
+
+    def close(self):
+        """
+        releases the device
+        """
+        pass
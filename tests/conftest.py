@@ -0,0 +1,73 @@
+import os
+import sys
+from threading import Event
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pytest ships a "py" module of its own, which hides the py/ package of this
+# repository once it has been imported
+import py  # noqa: E402
+
+py.__path__ = [os.path.join(ROOT, "py")]
+
+from mats.test_sequence import TestSequence  # noqa: E402
+from py.serial_connection import SerialConnection  # noqa: E402
+from py.simulated_device import SimulatedDevice, SimulatedSerial  # noqa: E402
+
+
+@pytest.fixture
+def connect():
+    """
+    Returns a function which opens a ``SerialConnection`` to a \
+    ``SimulatedDevice`` answering each line with the ``profile``, framed \
+    by the \\x03 terminator.
+    """
+    connections = []
+
+    def connect(profile="posix_shell", deadline=0.5, **kwargs):
+        device = SimulatedDevice(profile, banner="", terminator="\x03", command_terminator="\n", **kwargs)
+        ser = SerialConnection(terminator="\x03", deadline=deadline, transport=SimulatedSerial(device))
+        connections.append(ser)
+        return ser
+
+    yield connect
+
+    for ser in connections:
+        ser.close()
+
+
+@pytest.fixture
+def run_sequence():
+    """
+    Returns a function which runs a ``TestSequence`` of the tests \
+    ``runs`` times and returns it, along with the test data of the last run.
+    """
+    sequences = []
+
+    def run_sequence(tests, runs=1, timeout=10, **kwargs):
+        finished = Event()
+        results = []
+
+        def callback(data):
+            results.append(dict(data))
+            if len(results) == runs:
+                finished.set()
+
+        sequence = TestSequence(
+            device_info=SimulatedSerial,
+            sequence=tests,
+            auto_run=runs,
+            callback=callback,
+            **kwargs,
+        )
+        sequences.append(sequence)
+        assert finished.wait(timeout), "the sequence did not finish"
+        return sequence, results[-1]
+
+    yield run_sequence
+
+    for sequence in sequences:
+        sequence.close()
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from mats.arrays import check_limits, decode_array, encode_array, parse_array, round_significant
+from mats.matchers import compile_matcher
+from tests.test_sequence import ValueTest
+
+
+def test_parse_array():
+    assert parse_array("-71, -68.5,-70").tolist() == [-71.0, -68.5, -70.0]
+    assert parse_array("1 2 3", sep=" ", dtype=int).tolist() == [1, 2, 3]
+    # zero-padded counts are decimal
+    assert parse_array("007, 010", dtype=np.int64).tolist() == [7, 10]
+    assert parse_array("  ").size == 0
+    with pytest.raises(ValueError):
+        parse_array("1, two")
+    with pytest.raises(ValueError):
+        parse_array("0x10", dtype=int)
+
+
+def test_check_limits():
+    values = np.array([1.0, 5.0, 9.0, 12.0])
+    below, above = check_limits(values, 2, 10)
+    assert below.tolist() == [0]
+    assert above.tolist() == [3]
+
+    # per element, None not limited
+    below, above = check_limits(values, [None, 6, None, None], [None, None, None, 11])
+    assert below.tolist() == [1]
+    assert above.tolist() == [3]
+
+    below, above = check_limits(values, 2, 10, mask=[False, True, True, False])
+    assert below.size == above.size == 0
+
+    with pytest.raises(ValueError, match="4 elements do not match the 3 of the minimum"):
+        check_limits(values, [1, 2, 3])
+
+
+def test_round_significant():
+    values = np.array([3.14159, -0.0012345, 0.0, np.nan, np.inf, 123456.0])
+    rounded = round_significant(values, 3)
+    np.testing.assert_array_equal(rounded, [3.14, -0.00123, 0.0, np.nan, np.inf, 123000.0])
+
+    counts = np.array([1023, 4095])
+    assert round_significant(counts, 2) is counts
+
+
+def test_encode_decode():
+    values = np.arange(12, dtype=np.int16).reshape(3, 4)
+    encoded = encode_array(values)
+    assert encoded["shape"] == [3, 4]
+    decoded = decode_array(encoded)
+    np.testing.assert_array_equal(decoded, values)
+    assert decoded.dtype == values.dtype
+    assert not decode_array(encoded, copy=False).flags.writeable
+
+
+def test_test_limits_per_element():
+    test = ValueTest("sweep", np.array([-71.0, -90.0, -40.0]), pass_if=None,
+                     min_value=[-80, -80, None], max_value=-50, mask=[True, False, True])
+    test._execute(is_passing=True)
+    # the masked element is not checked, the last is above the maximum
+    assert test.is_passing is False
+    assert test.limits == {}
+
+    test = ValueTest("sweep", np.array([-71.0, -90.0, -60.0]), pass_if=None,
+                     min_value=[-80, -80, None], max_value=-50, mask=[True, False, True])
+    test._execute(is_passing=True)
+    assert test.is_passing is not False
+
+
+def test_test_limits_mismatch_fails():
+    test = ValueTest("sweep", np.array([1.0, 2.0]), pass_if=None, min_value=[0, 0, 0])
+    test._execute(is_passing=True)
+    assert test.is_passing is False
+
+
+def test_array_matcher():
+    matcher = compile_matcher({"array": {"name": "rssi", "after": "RSSI:", "length": 3, "min": -80,
+                                         "max": [None, None, -60]}})
+
+    passed, fields, reasons = matcher.match("RSSI: -71,-68,-70\r\n\x03")
+    assert passed is True and reasons == []
+    assert fields["rssi"].tolist() == [-71, -68, -70]
+
+    passed, _, reasons = matcher.match("RSSI: -71,-85,-50\x03")
+    assert passed is False
+    assert reasons == ["rssi[1] are below the minimum", "rssi[2] are above the maximum"]
+
+    passed, _, reasons = matcher.match("RSSI: -71,-68\x03")
+    assert reasons == ['"rssi" has 2 elements, not 3']
+    assert matcher.match("no sweep")[0] is False
@@ -0,0 +1,29 @@
+from py.capture import RX, TX, CaptureReader, CaptureWriter, find_runs
+
+
+def test_capture_round_trip(tmp_path):
+    writer = CaptureWriter(str(tmp_path), flush_interval=0.01)
+    writer.begin_run("run1", device={"port": "/dev/ttyX"})
+    writer.record(RX, b"banner")
+    writer.start_test("a")
+    writer.record(TX, b"echo a\n")
+    writer.record(RX, b"a")
+    writer.record(RX, b"\x03")
+    writer.end_test("a", True)
+    writer.start_test("b")
+    writer.record(TX, b"echo b\n")
+    writer.record(RX, b"x\x03")
+    writer.end_test("b", False)
+    writer.end_run(False)
+    writer.close()
+
+    (path,) = find_runs(str(tmp_path))
+    with CaptureReader(path) as reader:
+        assert reader.run_id == "run1"
+        assert reader.device == {"port": "/dev/ttyX"}
+        assert reader.monikers == ["a", "b"]
+        assert reader.exchange("a") == (b"echo a\n", b"a\x03")
+        assert reader.exchange("b") == (b"echo b\n", b"x\x03")
+        assert reader.verdict() is False
+        assert reader.verdict("a") is True
+        assert [direction for _, direction, _ in reader.records()] == [RX, TX, RX, RX, TX, RX]
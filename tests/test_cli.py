@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from mats import cli
+from py.simulated_device import SimulatedDevice, serve_pty
+
+
+@pytest.fixture
+def config(tmp_path):
+    """
+    Returns a function which writes a configuration of echo tests and \
+    returns its path.
+    """
+    def config(cli_tests, **settings):
+        path = tmp_path / "test_config.json"
+        path.write_text(json.dumps({"terminator": "\x03", "deadline": 0.5, "cli_tests": cli_tests, **settings}))
+        return str(path)
+
+    return config
+
+
+@pytest.fixture
+def device():
+    return serve_pty(SimulatedDevice(banner="", terminator="\x03", command_terminator="\n"))
+
+
+def test_missing_device_is_an_error(config, capsys):
+    status = cli.main(["run", config([["echo a\n", "a\x03", ""]]), "--devices", "/dev/ttyBOGUS", "--no-cache"])
+
+    assert status == cli.EXIT_ERROR
+    out = capsys.readouterr().out
+    assert "/dev/ttyBOGUS  ABORT" in out
+    assert "/dev/ttyBOGUS: 0 passed, 0 failed, 1 aborted" in out
+
+
+def test_passing_run(config, device, capsys):
+    path = config([["echo a\n", "a\x03", ""], ["echo b\n", "b\x03", ""]])
+    assert cli.main(["run", path, "--devices", device, "--repeat", "2", "--no-cache"]) == cli.EXIT_PASS
+
+    # a line per run and the summary, without the responses
+    lines = [line for line in capsys.readouterr().out.splitlines() if line]
+    assert len(lines) == 3
+    assert all(line.startswith(device) for line in lines)
+    assert "PASS" in lines[0]
+
+
+def test_failing_run(config, device, tmp_path):
+    path = config([["echo a\n", "a\x03", ""], ["echo b\n", "not b\x03", ""]])
+    output = tmp_path / "results.jsonl"
+
+    status = cli.main(["run", path, "--devices", device, "--output", str(output), "--no-cache"])
+
+    assert status == cli.EXIT_FAIL
+    (result,) = [json.loads(line) for line in output.read_text().splitlines()]
+    assert result["failed"] == ["echo b\n"]
+
+
+def test_invalid_configuration(config):
+    path = config([["echo a\n"]])
+    assert cli.main(["run", path, "--devices", "/dev/ttyBOGUS", "--no-cache"]) == cli.EXIT_ERROR
+
+
+def test_exit_status():
+    assert cli.exit_status({}) == cli.EXIT_ERROR
+    assert cli.exit_status({"a": [{"pass": True}], "b": [{"pass": True}]}) == cli.EXIT_PASS
+    assert cli.exit_status({"a": [{"pass": True}], "b": [{"pass": False}]}) == cli.EXIT_FAIL
+    assert cli.exit_status({"a": [{"pass": False}], "b": [{"pass": None}]}) == cli.EXIT_ERROR
@@ -0,0 +1,88 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+import serial.tools.list_ports
+
+from mats import test_sequence
+from mats.config import build_tests
+from mats.fixture_runner import DeviceInfo
+from py.connection_manager import ConnectionManager
+from py.simulated_device import SimulatedDevice, serve_pty
+
+
+@pytest.fixture
+def attach(monkeypatch):
+    """
+    Returns a function which attaches simulated fixtures over ptys and \
+    lists them as comports.
+    """
+    attached = []
+    monkeypatch.setattr(serial.tools.list_ports, "comports", lambda include_links=False: list(attached))
+
+    def attach(count):
+        for _ in range(count):
+            port = serve_pty(SimulatedDevice(banner="", terminator="\x03", command_terminator="\n"))
+            attached.append(SimpleNamespace(device=port, vid=0x0403, pid=24577, manufacturer="FTDI",
+                                            serial_number=str(len(attached))))
+        return [a.device for a in attached]
+
+    return attach
+
+
+@pytest.fixture
+def manager():
+    manager = ConnectionManager(connection_kwargs={"terminator": "\x03", "deadline": 0.1})
+    yield manager
+    manager.close()
+
+
+def test_acquire_rotates_through_free_ports(attach, manager):
+    ports = attach(3)
+
+    first = manager.acquire(timeout=2)
+    assert sorted(manager.ports) == sorted(ports)
+    manager.release(first)
+
+    second = manager.acquire(timeout=0)
+    assert second.port != first.port
+    manager.release(second)
+
+    third = manager.acquire(timeout=0)
+    assert third.port not in (first.port, second.port)
+    manager.release(third)
+
+    # the one released longest ago comes round again
+    assert manager.acquire(timeout=0) is first
+
+
+def test_acquire_single_port(attach, manager):
+    attach(1)
+    ser = manager.acquire(timeout=2)
+    assert manager.acquire(timeout=0) is None
+    manager.release(ser)
+    assert manager.acquire(timeout=0) is ser
+
+
+def test_connect_device(attach, manager):
+    attach(2)
+    ser = manager.acquire(timeout=2)
+    tests = build_tests({
+        "cli_tests": [["echo a\n", "a\x03", ""]],
+        "cli_groups": [{"cmd": "echo g\n", "tests": [["g", "g", ""]]}],
+    }, ser, loglevel=logging.WARNING)
+
+    sequence = test_sequence.TestSequence(
+        device_info=DeviceInfo(ser.getPID(), ser.getManufacturer()), sequence=tests,
+        connections=manager, ser=ser, loglevel=logging.WARNING)
+    try:
+        sequence._connect_device()
+        assert sequence.ser is not ser
+        assert all(test.ser is sequence.ser for test in tests)
+        assert tests[1].shared.ser is sequence.ser
+
+        # and back again, the only other free device
+        sequence._connect_device()
+        assert sequence.ser is ser
+    finally:
+        sequence.close()
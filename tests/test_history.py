@@ -0,0 +1,110 @@
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from mats.history import FAIL, NOT_RUN, PASS, ResultHistory
+
+START = datetime(2026, 1, 1, 8, 0, 0)
+
+
+def _record(history, minutes, passing, value, serial=None):
+    started = START + timedelta(minutes=minutes)
+    fields = {"serial": serial} if serial is not None else {}
+    history.record_run(
+        {"datetime": str(started), "pass": passing},
+        [{"moniker": "vbat", "value": value, "pass": passing, "fields": fields}],
+    )
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = ResultHistory(str(tmp_path / "history"), unit_field="serial", grow=4)
+    yield history
+    history.close()
+
+
+def test_window_by_time_with_runs_out_of_order(history):
+    # two devices sharing the history finish their runs out of the order they started
+    for minutes, value in [(0, 3.0), (10, 3.1), (5, 3.2), (20, 3.3), (15, 3.4), (1, 3.5)]:
+        _record(history, minutes, True, value)
+
+    since = START + timedelta(minutes=5)
+    until = START + timedelta(minutes=15)
+    assert sorted(history.values("vbat", since=since, until=until)) == [3.1, 3.2, 3.4]
+    assert len(history.times(since=since)) == 4
+    assert len(history.times(until=START + timedelta(minutes=1))) == 2
+    assert history.summary(since=since, until=until)["runs"] == 3
+
+    # the last runs recorded, whenever they started
+    assert list(history.values("vbat", last=2)) == [3.4, 3.5]
+    assert list(history.values("vbat", since=since, last=2)) == [3.3, 3.4]
+
+
+def test_first_pass_yield(history):
+    _record(history, 0, False, 2.9, serial="A")
+    _record(history, 3, True, 3.3, serial="A")
+    _record(history, 1, True, 3.3, serial="B")
+    # recorded after its retest, but started first
+    _record(history, 4, True, 3.3, serial="C")
+    _record(history, 2, False, 2.8, serial="C")
+    _record(history, 5, None, np.nan, serial="D")
+
+    assert history.first_pass_yield() == pytest.approx(1 / 3)
+    assert history.first_pass_yield(since=START + timedelta(minutes=3)) == 1.0
+    assert history.first_pass_yield(until=START - timedelta(minutes=1)) is None
+
+
+def test_verdicts_and_pareto(history):
+    _record(history, 0, True, 3.3)
+    _record(history, 1, False, 2.5)
+    _record(history, 2, False, 2.6)
+    _record(history, 3, None, None)
+
+    assert list(history.verdicts()) == [PASS, FAIL, FAIL, NOT_RUN]
+    assert list(history.verdicts("missing")) == [NOT_RUN] * 4
+    assert history.pareto() == [("vbat", 2)]
+    assert history.pareto(last=1) == []
+
+
+def test_statistics(history):
+    for minutes, value in enumerate([3.2, 3.3, 3.4, 3.3, 3.3]):
+        _record(history, minutes, True, value)
+
+    stats = history.statistics("vbat", min_value=3.0, max_value=3.6)
+    assert stats["count"] == 5
+    assert stats["mean"] == pytest.approx(3.3)
+    std = np.std([3.2, 3.3, 3.4, 3.3, 3.3], ddof=1)
+    assert stats["cpk"] == pytest.approx(0.3 / (3 * std))
+    assert history.statistics("vbat")["cpk"] is None
+
+
+def test_reopen(tmp_path):
+    directory = str(tmp_path / "history")
+    history = ResultHistory(directory, grow=2)
+    for minutes in range(5):
+        _record(history, minutes, True, 3.0 + minutes)
+    history.close()
+
+    history = ResultHistory(directory)
+    assert len(history) == 5
+    assert list(history.values("vbat")) == [3.0, 4.0, 5.0, 6.0, 7.0]
+    history.close()
+
+
+def test_failing_outputs_dont_stop_the_sequence(history, run_sequence, monkeypatch):
+    from mats.metrics import Metrics
+    from tests.test_sequence import ValueTest
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    metrics = Metrics()
+    monkeypatch.setattr(history, "record_run", fail)
+    monkeypatch.setattr(metrics, "record_run", fail)
+
+    sequence, data = run_sequence([ValueTest("a")], runs=3, timeout=5, history=history, metrics=metrics,
+                                  loglevel=logging.CRITICAL)
+    assert data["pass"] is True
+    assert not sequence.in_progress
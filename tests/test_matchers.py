@@ -0,0 +1,107 @@
+import json
+import pickle
+
+import pytest
+
+from mats.config import ConfigError, load_config
+from mats.matchers import compile_matcher, compile_matchers
+
+
+@pytest.mark.parametrize("spec, response", [
+    ({"regex": r"count=(?P<count>\d+)", "fields": {"count": {"equals": 3}}}, "count=3"),
+    ({"regex": r"count=(?P<count>\d+)", "fields": {"count": {"equals": 7, "type": "int"}}}, "count=007"),
+    ({"regex": r"count=(?P<count>\d+)", "fields": {"count": {"equals": "3", "type": "int"}}}, "count=3"),
+    ({"regex": r"v=(?P<v>[\d.]+)", "fields": {"v": {"equals": 3.3}}}, "v=3.30"),
+    ({"regex": r"mode=(?P<mode>\w+)", "fields": {"mode": {"equals": "run"}}}, "mode=run"),
+    ({"regex": r"id=(?P<id>\w+)", "fields": {"id": {"type": "hex", "equals": 255}}}, "id=0xFF"),
+    ({"regex": r"id=(?P<id>\w+)", "fields": {"id": {"type": "hex", "equals": "ff"}}}, "id=FF"),
+])
+def test_field_equals(spec, response):
+    passed, _, reasons = compile_matcher(spec).match(response)
+    assert passed, reasons
+
+
+def test_field_equals_fails():
+    passed, fields, reasons = compile_matcher(
+        {"regex": r"count=(?P<count>\d+)", "fields": {"count": {"equals": 3}}}).match("count=4")
+    assert not passed
+    assert fields == {"count": 4}
+    assert reasons == ['count="4" != "3"']
+
+
+def test_field_limits():
+    matcher = compile_matcher({"regex": r"V=(?P<volts>[\d.]+)", "fields": {"volts": {"min": 3.2, "max": 3.4}}})
+
+    assert matcher.match("V=3.30") == (True, {"volts": 3.3}, [])
+    passed, _, reasons = matcher.match("V=3.50")
+    assert not passed and "above the maximum" in reasons[0]
+    assert matcher.match("no reading")[0] is False
+    assert matcher.limits() == {"volts": (3.2, 3.4)}
+
+
+def test_int_field_is_decimal():
+    matcher = compile_matcher({"regex": r"n=(?P<n>\w+)", "fields": {"n": {"type": "int", "min": 0}}})
+    assert matcher.match("n=010") == (True, {"n": 10}, [])
+    passed, _, reasons = matcher.match("n=0x10")
+    assert not passed and reasons == ['n="0x10" is not a valid number']
+
+
+def test_invalid_fields():
+    with pytest.raises(ValueError):
+        compile_matcher({"regex": r"(?P<n>\d+)", "fields": {"n": {"type": "decimal"}}})
+    with pytest.raises(ValueError):
+        compile_matcher({"regex": r"(?P<n>\d+)", "fields": {"n": {"type": "int", "equals": "three"}}})
+    with pytest.raises(ValueError):
+        compile_matcher({"regex": r"(?P<n>\d+)", "fields": {"m": {"min": 1}}})
+
+
+def test_number_contains_startswith():
+    number, contains, startswith = compile_matchers([
+        {"number": {"name": "temp", "after": "Temp:", "max": 85}},
+        "OK",
+        {"startswith": "UNIT TEST LIST"},
+    ])
+
+    assert number.match("Temp: 41.5C") == (True, {"temp": 41.5}, [])
+    assert number.match("Temp: 90C")[0] is False
+    assert contains.match("status OK\x03")[0] is True
+    assert contains.match("status ERR\x03")[0] is False
+    assert startswith.match("UNIT TEST LIST\nTest 1")[0] is True
+
+
+def test_compiled_matchers_pickle():
+    matchers = compile_matchers([
+        {"regex": r"id=(?P<id>\w+)", "fields": {"id": {"type": "hex", "equals": 255}}},
+        {"regex": r"n=(?P<n>\d+)", "fields": {"n": {"type": "int"}}},
+    ])
+    loaded = pickle.loads(pickle.dumps(matchers))
+    assert loaded[0].match("id=ff")[0] is True
+    assert loaded[1].match("n=08") == (True, {"n": 8}, [])
+
+
+def test_config_cache(tmp_path):
+    path = tmp_path / "test_config.json"
+    path.write_text(json.dumps({
+        "terminator": "\x03",
+        "cli_tests": [["count\n", None, "count", {"regex": r"count=(?P<count>\d+)",
+                                                     "fields": {"count": {"equals": 3}}}]],
+    }))
+
+    compiled = load_config(str(path))
+    assert list((tmp_path / "__pycache__").iterdir())
+    cached = load_config(str(path))
+
+    (_, _, _, _, (matcher,)), = cached.tests
+    assert matcher.match("count=3")[0] is True
+    assert cached.settings == compiled.settings
+
+
+def test_config_errors(tmp_path):
+    path = tmp_path / "test_config.json"
+    path.write_text(json.dumps({"cli_tests": [["a\n", None, "", {"regex": "(?P<n>"}]]}))
+    with pytest.raises(ConfigError, match=r"cli_tests\[0\]"):
+        load_config(str(path), cache=False)
+
+    path.write_text(json.dumps({"cli_tests": [["a\n", "", ""], ["a\n", "", ""]]}))
+    with pytest.raises(ConfigError, match="more than once"):
+        load_config(str(path), cache=False)
@@ -0,0 +1,104 @@
+import logging
+
+from mats import test
+from mats.config import CommandTest, build_tests
+from py.command_pipeline import CommandPipeline
+
+
+class EchoTest(test.Test):
+
+    """
+    Sends its command itself, as a test with its own ``execute()`` does.
+    """
+
+    def __init__(self, ser, text):
+        super().__init__(moniker=text, description="", pass_if=text + "\x03", loglevel=logging.WARNING)
+        self.ser = ser
+        self.text = text
+
+    def execute(self, is_passing):
+        return self.ser.sendRec(f"echo {self.text}\n")
+
+
+def _echo(ser, text):
+    return CommandTest(ser, f"echo {text}\n", text + "\x03", "", moniker=text, loglevel=logging.WARNING)
+
+
+def test_pipeline_pairs_responses_in_order(connect):
+    ser = connect()
+    pipeline = CommandPipeline(ser)
+    futures = [pipeline.submit(f"echo c{i}\n") for i in range(20)]
+    assert [future.result(timeout=2) for future in futures] == [f"c{i}\x03" for i in range(20)]
+    pipeline.close()
+
+    # the port is handed back once the pipeline is closed
+    assert ser.sendRec("echo after\n") == "after\x03"
+
+
+def test_pipelined_and_direct_tests_mixed(connect, run_sequence):
+    ser = connect()
+    shared = build_tests({"cli_groups": [{"cmd": "echo g\n", "tests": [
+        ["g1", {"regex": "^g\x03$"}, ""],
+        ["g2", "g", ""],
+    ]}]}, ser, loglevel=logging.WARNING)
+
+    tests = [_echo(ser, f"a{i}") for i in range(3)]
+    tests += shared[:1]
+    tests += [_echo(ser, f"a{i}") for i in range(3, 6)]
+    tests += [EchoTest(ser, "custom")]
+    tests += [_echo(ser, f"a{i}") for i in range(6, 9)]
+    tests += shared[1:]
+
+    _, data = run_sequence(tests, pipeline_window=4, loglevel=logging.WARNING)
+
+    assert data["failed"] == []
+    assert data["pass"] is True
+    assert tests[3].got_resp == "g\x03"
+    assert tests[7].value == "custom\x03"
+
+
+def test_pipelining_repeated_runs(connect, run_sequence):
+    ser = connect()
+    tests = [_echo(ser, f"a{i}") for i in range(10)] + [EchoTest(ser, "custom")]
+    sequence, data = run_sequence(tests, pipeline_window=3, loglevel=logging.WARNING)
+    assert data["pass"] is True
+    assert not ser._rx_buffer
+
+
+def test_no_commands_for_skipped_tests(connect, run_sequence):
+    ser = connect()
+    tests = [_echo(ser, f"a{i}") for i in range(10)]
+    tests[1] = CommandTest(ser, "echo a1\n", "not a1\x03", "", moniker="a1", loglevel=logging.WARNING)
+
+    _, data = run_sequence(tests, runs=2, pipeline_window=8, fail_fast=True, retest_failures=True,
+                           loglevel=logging.WARNING)
+
+    assert data["failed"] == ["a1"]
+    # a0 and a1 in the first run, then a1 alone
+    assert ser.ser.device.commands == 3
+
+
+def test_look_ahead_within_the_failure_limit(connect, run_sequence):
+    ser = connect()
+    tests = [_echo(ser, f"a{i}") for i in range(10)]
+    for i in (1, 2):
+        tests[i] = CommandTest(ser, f"echo a{i}\n", "bad\x03", "", moniker=f"a{i}", loglevel=logging.WARNING)
+
+    _, data = run_sequence(tests, pipeline_window=8, max_failures=2, loglevel=logging.WARNING)
+
+    assert data["failed"] == ["a1", "a2"]
+    assert ser.ser.device.commands == 3
+
+
+def test_look_ahead_stops_at_dependents(connect, run_sequence):
+    ser = connect()
+    tests = [_echo(ser, f"a{i}") for i in range(6)]
+    tests[0] = CommandTest(ser, "echo a0\n", "bad\x03", "", moniker="a0", loglevel=logging.WARNING)
+    for i in (2, 4):
+        tests[i].depends_on = ("a0",)
+
+    _, data = run_sequence(tests, pipeline_window=8, skip_dependents=True, loglevel=logging.WARNING)
+
+    assert data["failed"] == ["a0"]
+    assert data["skipped"] == ["a2", "a4"]
+    assert ser.ser.device.commands == 4
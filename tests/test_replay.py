@@ -0,0 +1,57 @@
+import json
+
+from mats import cli
+from mats.replay import ReplayConnection, replay, summary
+from py.capture import RX, TX, CaptureReader, CaptureWriter, find_runs
+from py.simulated_device import SimulatedDevice, serve_pty
+
+
+def test_replay_pipelined_responses(tmp_path):
+    # the responses to pipelined commands arrive after every command was sent
+    writer = CaptureWriter(str(tmp_path))
+    writer.begin_run("run1")
+    writer.start_test("a")
+    writer.record(TX, b"echo a\n")
+    writer.record(TX, b"echo b\n")
+    writer.record(TX, b"echo a\n")
+    writer.record(RX, b"1\x032\x03")
+    writer.record(RX, b"3\x03")
+    writer.end_run(True)
+    writer.close()
+
+    ser = ReplayConnection(terminator="\x03")
+    with CaptureReader(str(tmp_path / "run1.idx")) as reader:
+        ser.load(reader)
+    assert [ser.sendRec("echo a\n"), ser.sendRec("echo a\n"), ser.sendRec("echo b\n")] == ["1\x03", "3\x03", "2\x03"]
+
+
+def _config(path, cli_tests):
+    path.write_text(json.dumps({"terminator": "\x03", "deadline": 0.5, "cli_tests": cli_tests}))
+    return str(path)
+
+
+def test_capture_and_replay(tmp_path):
+    device = serve_pty(SimulatedDevice(banner="", terminator="\x03", command_terminator="\n"))
+    captures = str(tmp_path / "captures")
+    recorded = _config(tmp_path / "recorded.json", [["echo a\n", "a\x03", ""], ["echo 7\n", None, "",
+                                                    {"number": {"name": "n", "max": 10}}]])
+
+    assert cli.main(["run", recorded, "--devices", device, "--repeat", "2", "--capture", captures,
+                     "--no-cache"]) == cli.EXIT_PASS
+    assert len(find_runs(captures)) == 2
+
+    results = replay(recorded, [captures], max_workers=1)
+    assert [r["replayed"] for r in results] == [True, True]
+    assert not any(r["changed"] or r["errors"] or r["missing"] for r in results)
+
+    # tightening a limit fails the runs which passed
+    tightened = _config(tmp_path / "tightened.json", [["echo a\n", "a\x03", ""], ["echo 7\n", None, "",
+                                                      {"number": {"name": "n", "max": 5}}]])
+    results = replay(tightened, [captures], max_workers=1)
+    assert [r["changed"] for r in results] == [{"echo 7\n": [True, False]}] * 2
+    totals = summary(results)
+    assert len(totals["now_failing"]) == 2
+    assert totals["monikers"] == {"echo 7\n": {"now_failing": 2, "now_passing": 0}}
+
+    assert cli.main(["replay", recorded, captures, "--workers", "1", "--no-cache"]) == cli.EXIT_PASS
+    assert cli.main(["replay", tightened, captures, "--workers", "1", "--no-cache"]) == cli.EXIT_FAIL
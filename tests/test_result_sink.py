@@ -0,0 +1,49 @@
+import json
+import logging
+import sqlite3
+
+import numpy as np
+
+from mats import test
+from mats.arrays import decode_array
+from mats.result_sink import SQLiteResultSink
+from tests.test_sequence import ValueTest
+
+
+class SweepTest(test.Test):
+
+    def __init__(self):
+        super().__init__(moniker="sweep", description="", min_value=-90, loglevel=logging.WARNING)
+
+    def execute(self, is_passing):
+        return np.array([-71.0, -68.0, -70.0])
+
+
+def _rows(path, query):
+    with sqlite3.connect(path) as db:
+        return db.execute(query).fetchall()
+
+
+def test_queued_runs_are_written_on_close(tmp_path, run_sequence):
+    path = str(tmp_path / "results.db")
+    # a long flush interval, so that the runs are still queued when the sequence closes
+    sink = SQLiteResultSink(path, flush_interval=60, loglevel=logging.WARNING)
+
+    sequence, _ = run_sequence([ValueTest("a"), ValueTest("b", "bad")], runs=3, result_sink=sink,
+                               on_close=sink.close, loglevel=logging.WARNING)
+    sequence.close()
+
+    assert _rows(path, "SELECT COUNT(*), SUM(pass) FROM runs") == [(3, 0)]
+    assert _rows(path, "SELECT moniker, value, pass FROM results WHERE moniker = 'b' LIMIT 1") == [("b", "bad", 0)]
+
+
+def test_arrays_are_stored_as_raw_bytes(tmp_path, run_sequence):
+    path = str(tmp_path / "results.db")
+    sink = SQLiteResultSink(path, loglevel=logging.WARNING)
+
+    sequence, data = run_sequence([SweepTest()], result_sink=sink, on_close=sink.close, loglevel=logging.WARNING)
+    sequence.close()
+
+    assert data["pass"] is True
+    ((value,),) = _rows(path, "SELECT value FROM results")
+    assert list(decode_array(json.loads(value))) == [-71.0, -68.0, -70.0]
@@ -0,0 +1,102 @@
+import logging
+from threading import Lock
+from time import perf_counter, sleep
+
+import pytest
+
+from mats.scheduler import TestScheduler as Scheduler
+from tests.test_sequence import ValueTest
+
+
+def _run(tests, max_workers=4, duration=0.05, result=True):
+    """
+    Runs the tests by a scheduler, each taking ``duration``, and returns \
+    the (start, end) of each by moniker.
+    """
+    intervals = {}
+    lock = Lock()
+
+    def execute(i, test):
+        started = perf_counter()
+        sleep(duration)
+        with lock:
+            intervals[test.moniker] = (started, perf_counter())
+        return result
+
+    Scheduler(tests, max_workers, loglevel=logging.WARNING).run(execute, lambda: False)
+    return intervals
+
+
+def _overlap(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+
+def test_dependency_order():
+    tests = [
+        ValueTest("report", depends_on=["rssi", "vbat"]),
+        ValueTest("rssi", depends_on=["radio"]),
+        ValueTest("radio"),
+        ValueTest("vbat"),
+    ]
+    assert Scheduler(tests, 2).order == [2, 1, 3, 0]
+
+    with pytest.raises(ValueError, match="unknown tests"):
+        Scheduler([ValueTest("a", depends_on=["b"])], 2)
+    with pytest.raises(ValueError, match="circular"):
+        Scheduler([ValueTest("a", depends_on=["b"]), ValueTest("b", depends_on=["a"])], 2)
+
+
+def test_resources():
+    intervals = _run([
+        ValueTest("dmm1", resources=["dmm"]),
+        ValueTest("psu", resources=["psu"]),
+        ValueTest("dmm2", resources=["dmm"]),
+        ValueTest("scope", resources=["scope"]),
+    ])
+
+    assert _overlap(intervals["dmm1"], intervals["psu"])
+    assert _overlap(intervals["dmm1"], intervals["scope"])
+    # tests sharing a resource run one at a time, in sequence order
+    assert intervals["dmm1"][1] <= intervals["dmm2"][0]
+
+
+def test_tests_without_resources_run_alone():
+    intervals = _run([
+        ValueTest("a", resources=["a"]),
+        ValueTest("alone"),
+        ValueTest("b", resources=["b"]),
+    ])
+    assert intervals["a"][1] <= intervals["alone"][0]
+    assert intervals["alone"][1] <= intervals["b"][0]
+
+
+def test_depends_on_and_max_workers():
+    intervals = _run([
+        ValueTest("a", resources=["a"]),
+        ValueTest("b", resources=["b"], depends_on=["a"]),
+        ValueTest("c", resources=["c"]),
+        ValueTest("d", resources=["d"]),
+    ], max_workers=2)
+
+    assert intervals["a"][1] <= intervals["b"][0]
+    starts = sorted(start for start, _ in intervals.values())
+    ends = sorted(end for _, end in intervals.values())
+    # no more than two at once
+    assert all(ends[i] <= starts[i + 2] for i in range(2))
+
+
+def test_stops_starting_tests():
+    intervals = _run([ValueTest("a"), ValueTest("b")], result=False)
+    assert list(intervals) == ["a"]
+
+
+def test_sequence_max_workers(run_sequence):
+    tests = [
+        ValueTest("a", resources=["dmm"]),
+        ValueTest("b", "bad", resources=["psu"]),
+        ValueTest("c", resources=["dmm"], depends_on=["b"]),
+    ]
+    _, data = run_sequence(tests, max_workers=2, loglevel=logging.WARNING)
+    assert data["pass"] is False
+    assert data["failed"] == ["b"]
+    assert [t.status for t in tests] == ["complete"] * 3
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+
+import pytest
+
+from mats import test
+from mats.async_sequence import AsyncTestSequence
+from mats.metrics import SEQUENCE, Metrics
+from py.simulated_device import SimulatedSerial
+
+
+class ValueTest(test.Test):
+
+    """
+    Returns a fixed value, or each of a list of values in turn, passing \
+    if it is "ok".
+    """
+
+    def __init__(self, moniker, value="ok", pass_if="ok", **kwargs):
+        super().__init__(moniker=moniker, description="", pass_if=pass_if, loglevel=logging.WARNING, **kwargs)
+        self.result = value
+
+    def execute(self, is_passing):
+        result = self.result.pop(0) if isinstance(self.result, list) else self.result
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture(params=["thread", "asyncio"])
+def run(request, run_sequence):
+    """
+    Returns a function which runs the tests once, by a ``TestSequence`` \
+    or an ``AsyncTestSequence``, and returns the test data of the run.
+    """
+    def run(tests, **kwargs):
+        kwargs.setdefault("loglevel", logging.WARNING)
+        if request.param == "thread":
+            return run_sequence(tests, **kwargs)[1]
+
+        sequence = AsyncTestSequence(device_info=SimulatedSerial, sequence=tests, **kwargs)
+        try:
+            return asyncio.run(sequence.run())
+        finally:
+            sequence.close()
+
+    return run
+
+
+def test_passing(run):
+    data = run([ValueTest("a"), ValueTest("b")])
+    assert data["pass"] is True
+    assert data["failed"] == data["skipped"] == []
+    assert set(data["timing"]["per_test"]) == {"a", "b"}
+
+
+def test_failing(run):
+    tests = [ValueTest("a"), ValueTest("b", "bad"), ValueTest("c")]
+    data = run(tests)
+    assert data["pass"] is False
+    assert data["failed"] == ["b"]
+    assert [t.status for t in tests] == ["complete"] * 3
+
+
+def test_fail_fast(run):
+    tests = [ValueTest("a", "bad"), ValueTest("b"), ValueTest("c")]
+    data = run(tests, fail_fast=True)
+    assert data["failed"] == ["a"]
+    assert data["skipped"] == ["b", "c"]
+    assert [t.status for t in tests] == ["complete", "skipped", "skipped"]
+
+
+def test_max_failures(run):
+    tests = [ValueTest("a", "bad"), ValueTest("b"), ValueTest("c", "bad"), ValueTest("d")]
+    data = run(tests, max_failures=2)
+    assert data["failed"] == ["a", "c"]
+    assert data["skipped"] == ["d"]
+
+
+def test_skip_dependents(run):
+    tests = [
+        ValueTest("power", "bad"),
+        ValueTest("radio", depends_on=["power"]),
+        ValueTest("rssi", depends_on=["radio"]),
+        ValueTest("led"),
+    ]
+    data = run(tests, skip_dependents=True)
+    assert data["failed"] == ["power"]
+    assert data["skipped"] == ["radio", "rssi"]
+    assert tests[3].is_passing is True
+
+
+def test_deselected_tests(run):
+    tests = [ValueTest("a"), ValueTest("b", "bad")]
+    tests[1].set_run_status(False)
+    data = run(tests)
+    assert data["pass"] is True
+    assert tests[1].status == "waiting"
+
+
+def test_exception_aborts(run):
+    tests = [ValueTest("a"), ValueTest("b", RuntimeError("instrument fault")), ValueTest("c")]
+    data = run(tests)
+    assert data["pass"] is None
+    assert tests[1].is_passing is False
+    assert tests[2].status != "complete"
+
+
+def test_metrics(run):
+    metrics = Metrics()
+    run([ValueTest("a"), ValueTest("b")], metrics=metrics)
+    summary = metrics.summary()
+    assert summary["a"]["execute"]["count"] == summary["b"]["execute"]["count"] == 1
+    assert summary[SEQUENCE]["tests"]["count"] == 1
+
+
+def test_retest_failures(run_sequence):
+    tests = [ValueTest("a"), ValueTest("b", "bad")]
+    _, data = run_sequence(tests, runs=2, retest_failures=True, loglevel=logging.WARNING)
+    assert data["failed"] == ["b"]
+    assert data["skipped"] == ["a"]
+
+
+def test_reset_clears_the_previous_run(connect):
+    from mats.config import build_tests
+
+    (command,) = build_tests({"cli_tests": [["echo a\n", "a\x03", ""]]}, connect(), loglevel=logging.WARNING)
+    command._execute(is_passing=True)
+    command._teardown(is_passing=True)
+    assert command.got_resp == command.value == "a\x03"
+
+    command.reset()
+    assert command.value is None
+    assert command.got_resp is None
+    assert command.is_passing is None
+    assert command.status == "waiting"
+
+
+def test_value_of_a_test_not_run_again(run_sequence):
+    # the second run stops before "b", so "b" must not keep its value from the first
+    tests = [ValueTest("a", ["ok", "bad"]), ValueTest("b")]
+    _, data = run_sequence(tests, runs=2, fail_fast=True, loglevel=logging.WARNING)
+    assert data["skipped"] == ["b"]
+    assert tests[1].value is None
+
+
+def test_dependencies_checked_without_concurrency(run):
+    with pytest.raises(ValueError, match="unknown tests"):
+        run([ValueTest("a", depends_on=["b"])])
+    with pytest.raises(ValueError, match="circular"):
+        run([ValueTest("a", depends_on=["b"]), ValueTest("b", depends_on=["a"])])
+
+
+def test_tests_run_after_their_dependencies(run):
+    tests = [ValueTest("radio", depends_on=["power"]), ValueTest("power", "bad"), ValueTest("led")]
+    data = run(tests, skip_dependents=True)
+    assert [t.moniker for t in tests] == ["power", "radio", "led"]
+    assert data["failed"] == ["power"]
+    assert data["skipped"] == ["radio"]
@@ -0,0 +1,48 @@
+from time import perf_counter
+
+from py.serial_connection import SerialConnection
+from py.simulated_device import SimulatedDevice, SimulatedSerial
+
+
+class CountingSerial(SimulatedSerial):
+
+    """
+    Counts the changes to its timeout, each of which reconfigures a real port.
+    """
+
+    changes = 0
+
+    @SimulatedSerial.timeout.setter
+    def timeout(self, timeout):
+        self.changes += 1
+        self._timeout = timeout
+
+
+def _connect(deadline=0.5, **kwargs):
+    device = SimulatedDevice(banner="", terminator="\x03", command_terminator="\n", **kwargs)
+    transport = CountingSerial(device)
+    return SerialConnection(terminator="\x03", deadline=deadline, transport=transport), transport
+
+
+def test_timeout_is_not_changed_per_read():
+    ser, transport = _connect(latency=0.002)
+    timeout = transport.timeout
+    changes = transport.changes
+
+    for i in range(50):
+        assert ser.sendRec(f"echo {i}\n") == f"{i}\x03"
+
+    assert transport.changes == changes
+    assert transport.timeout == timeout
+    ser.close()
+
+
+def test_timeout_restored_after_the_deadline():
+    ser, transport = _connect(deadline=0.3)
+    timeout = transport.timeout
+
+    started = perf_counter()
+    assert ser.sendRec("echo late\n", deadline=0.12, terminator="never") == "late\x03"
+    assert 0.12 <= perf_counter() - started < 0.3
+    assert transport.timeout == timeout
+    ser.close()
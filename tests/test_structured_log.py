@@ -0,0 +1,58 @@
+import atexit
+import json
+import logging
+
+import pytest
+
+from mats import structured_log
+from mats.structured_log import configure_logging
+from tests.test_sequence import ValueTest
+
+
+@pytest.fixture
+def root_logger():
+    """
+    Puts back the handlers and level of the root logger once the test has \
+    configured logging.
+    """
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    structured_log._stop_listener()
+    atexit.unregister(structured_log._stop_listener)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_json_lines_with_context(tmp_path, root_logger, run_sequence):
+    path = tmp_path / "log.json"
+    configure_logging(str(path), level=logging.INFO, console=False)
+
+    _, data = run_sequence([ValueTest("a"), ValueTest("b", "bad")])
+    structured_log._stop_listener()
+
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    (failure,) = [e for e in entries if e.get("moniker") == "b" and e["level"] == "WARNING"]
+    assert failure["logger"] == "ValueTest"
+    assert "pass_if" in failure["message"]
+    assert failure["run_id"] == data["run_id"]
+    assert failure["manufacturer"] == "FTDI"
+    assert failure["pid"] == 24577
+
+
+def test_reconfigure_and_stop(tmp_path, root_logger):
+    first = configure_logging(str(tmp_path / "first.json"), console=False)
+    second = configure_logging(str(tmp_path / "second.json"), console=False)
+    assert first._thread is None
+    assert second._thread is not None
+
+    logging.getLogger("reconfigured").warning("to the second file")
+    # stopped by its caller, then at exit
+    second.stop()
+    structured_log._stop_listener()
+
+    assert (tmp_path / "first.json").read_text() == ""
+    assert "to the second file" in (tmp_path / "second.json").read_text()
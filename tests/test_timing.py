@@ -0,0 +1,57 @@
+import asyncio
+
+from py.async_serial_connection import AsyncSerialConnection
+from py.command_pipeline import CommandPipeline
+from py.simulated_device import SimulatedDevice, serve_pty
+
+PHASES = ["write", "first_byte", "response"]
+
+
+def _check(timing):
+    assert list(timing) == PHASES
+    assert 0 <= timing["write"] <= timing["first_byte"] <= timing["response"]
+
+
+def test_serial_connection_timing(connect):
+    ser = connect(latency=0.01)
+    assert ser.sendRec("echo a\n") == "a\x03"
+    _check(ser.last_timing)
+    assert ser.last_timing["first_byte"] >= 0.01
+
+
+def test_pipeline_timing(connect):
+    pipeline = CommandPipeline(connect(latency=0.01))
+    futures = [pipeline.submit(f"echo c{i}\n") for i in range(5)]
+    for future in futures:
+        future.result(timeout=2)
+    pipeline.close()
+
+    for future in futures:
+        _check(future.timing)
+    # each response is queued behind the ones before it
+    assert futures[-1].timing["first_byte"] > futures[0].timing["first_byte"]
+
+
+def test_pipeline_timing_of_empty_response(connect):
+    pipeline = CommandPipeline(connect(), deadline=0.1)
+    future = pipeline.submit("ignored\n")
+    assert future.result(timeout=2) == "\x03"
+    pipeline.close()
+    _check(future.timing)
+
+
+def test_async_timing():
+    port = serve_pty(SimulatedDevice(banner="", terminator="\x03", command_terminator="\n", latency=0.01))
+
+    async def exchange():
+        ser = AsyncSerialConnection(port, terminator="\x03", deadline=0.2)
+        await ser.open()
+        try:
+            return await ser.sendRec("echo a\n"), ser.last_timing
+        finally:
+            ser.close()
+
+    response, timing = asyncio.run(exchange())
+    assert response == "a\x03"
+    _check(timing)
+    assert timing["first_byte"] >= 0.01